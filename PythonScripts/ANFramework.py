@@ -5,6 +5,7 @@ from abc import ABC, abstractmethod
 import pytz
 from datetime import datetime, time as time_type
 import time
+import threading
 
 
 class EnvironmentConfig:
@@ -54,11 +55,12 @@ class ConnectionProvider(ABC):
 class LocalConnectionProvider(ConnectionProvider):
     """Local connection provider with connection pool"""
 
-    def __init__(self, pool_size=20, max_overflow=10):
+    def __init__(self, pool_size=20, max_overflow=10, min_size=0):
         """
         Args:
             pool_size: Number of persistent connections
             max_overflow: Additional connections if pool exhausted
+            min_size: Connections opened in parallel in the background right away (see prewarm)
         """
         self.connection_string = EnvironmentConfig.get_connection_string()
         self.pool_size = pool_size
@@ -66,53 +68,127 @@ class LocalConnectionProvider(ConnectionProvider):
         self.pool = []  # Available connections
         self.active = []  # Active connections
         self.total_created = 0
+        self.warming = 0  # Connections being opened by prewarm()
+        self._generation = 0  # Bumped by close_all_connections(); older prewarm connections are dropped
+        self._condition = threading.Condition()
         print(f"Connection pool initialized (size: {pool_size}, max: {pool_size + max_overflow})")
+        if min_size:
+            self.prewarm(min_size)
+
+    def prewarm(self, count):
+        """
+        Open count connections in parallel background threads, so the ODBC
+        handshakes overlap each other and whatever the caller does meanwhile.
+        get_connection() waits for a warming connection instead of opening another.
+        Returns number of connections being opened.
+        """
+        with self._condition:
+            count = max(0, min(count, self.pool_size - self.total_created))
+            self.total_created += count
+            self.warming += count
+            generation = self._generation
+
+        def connect():
+            conn = None
+            try:
+                conn = self._connect()
+            except Exception as e:
+                print(f"[ConnectionPool] Prewarm connection failed: {e}")
+            with self._condition:
+                stale = generation != self._generation
+                if not stale:
+                    self.warming -= 1
+                    if conn is None:
+                        self.total_created -= 1
+                    else:
+                        self.pool.append(conn)
+                    self._condition.notify()
+            # Pool was closed while connecting: its counters no longer include this one
+            if stale and conn is not None:
+                conn.close()
+
+        for index in range(count):
+            threading.Thread(target=connect, name=f'pool-prewarm-{index}', daemon=True).start()
+        return count
+
+    def _connect(self):
+        """Open a new raw connection"""
+        return pyodbc.connect(self.connection_string)
 
     def get_connection(self, autocommit=False):
         """Get connection from pool"""
-        # 1. Try to get from pool
-        if self.pool:
-            conn = self.pool.pop()
-        # 2. Create new if within limit
-        elif self.total_created < self.pool_size + self.max_overflow:
-            conn = pyodbc.connect(self.connection_string)
-            self.total_created += 1
-        # 3. Pool exhausted
-        else:
-            raise RuntimeError(f"Connection pool exhausted. Active: {len(self.active)}, Pool: {len(self.pool)}, Total: {self.total_created}")
+        conn = None
+        with self._condition:
+            # 1. Wait for a connection still being opened by prewarm()
+            while not self.pool and self.warming:
+                self._condition.wait()
+            # 2. Try to get from pool
+            if self.pool:
+                conn = self.pool.pop()
+            # 3. Create new if within limit (slot reserved, connect outside the lock)
+            elif self.total_created < self.pool_size + self.max_overflow:
+                self.total_created += 1
+            # 4. Pool exhausted
+            else:
+                raise RuntimeError(f"Connection pool exhausted. Active: {len(self.active)}, Pool: {len(self.pool)}, Total: {self.total_created}")
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._condition:
+                    self.total_created -= 1
+                raise
 
         if autocommit:
             conn.autocommit = True
 
-        self.active.append(conn)
+        with self._condition:
+            self.active.append(conn)
         return conn
 
     def return_connection(self, conn):
         """Return connection to pool"""
-        if conn in self.active:
+        with self._condition:
+            if conn not in self.active:
+                return
             self.active.remove(conn)
-            # Reset connection state
-            try:
-                conn.rollback()
-            except:
-                pass
+
+        # Reset connection state outside the lock, a rollback is a server round trip
+        try:
+            conn.rollback()
+        except:
+            pass
+
+        with self._condition:
             # Return to pool if not full
-            if len(self.pool) < self.pool_size:
+            keep = len(self.pool) < self.pool_size
+            if keep:
                 self.pool.append(conn)
             else:
-                conn.close()
                 self.total_created -= 1
+            self._condition.notify()
+
+        if not keep:
+            conn.close()
 
     def close_all_connections(self):
         """Close all connections"""
-        for conn in self.active + self.pool:
+        with self._condition:
+            conns = self.active + self.pool
+            self.active = []
+            self.pool = []
+            # Prewarm threads still connecting close their connection when they finish
+            self._generation += 1
+            self.total_created = 0
+            self.warming = 0
+            self._condition.notify_all()
+
+        for conn in conns:
             try:
                 conn.close()
             except:
                 pass
-        self.active = []
-        self.pool = []
-        self.total_created = 0
 
     def get_stats(self):
         """Get pool statistics"""
@@ -120,6 +196,7 @@ class LocalConnectionProvider(ConnectionProvider):
             'pool': len(self.pool),
             'active': len(self.active),
             'total': self.total_created,
+            'warming': self.warming,
             'limit': self.pool_size + self.max_overflow
         }
 
@@ -1,10 +1,36 @@
 import pytz
-from datetime import datetime
+from datetime import datetime, time as dt_time
+from decimal import Decimal
 import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
 from abc import ABC, abstractmethod
 import pyodbc
 from dotenv import load_dotenv
 
+from market_snapshot import fetch_market_snapshot
+from metrics import REGISTRY
+from scheduler import DeadlineScheduler
+from config_watcher import ConfigWatcher
+from sp_create_signal import execute_signal_batch, reversal_signals, drop_signals
+
+
+def register_json_types(columns, row):
+    """
+    algo.fn_GetStrategyConfiguration row -> dict typed like the sp_strategyRegister
+    JSON: TIME -> 'HH:MM:SS', DECIMAL -> float, config_id -> configID
+    """
+    config = {}
+    for column, value in zip(columns, row):
+        if isinstance(value, dt_time):
+            value = value.strftime('%H:%M:%S')
+        elif isinstance(value, Decimal):
+            value = float(value)
+        config['configID' if column == 'config_id' else column] = value
+    return config
+
 
 class EnvironmentConfig:
     """Environment configuration loader"""
@@ -127,6 +153,366 @@ class LocalConnectionProvider(ConnectionProvider):
         self.close_all_connections()
 
 
+class PooledCursor:
+    """Cursor wrapper that marks its connection as having an open transaction"""
+
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self._connection = connection
+
+    def execute(self, sql, *args, **kwargs):
+        self._connection._mark_dirty()
+        with REGISTRY.db_call(sql):
+            self._cursor.execute(sql, *args, **kwargs)
+        return self
+
+    def executemany(self, sql, *args, **kwargs):
+        self._connection._mark_dirty()
+        with REGISTRY.db_call(sql):
+            self._cursor.executemany(sql, *args, **kwargs)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._cursor.close()
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name in ('_cursor', '_connection'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+
+class PooledConnection:
+    """
+    pyodbc connection wrapper owned by PooledConnectionProvider.
+    Tracks whether a transaction may be open, so the pool only
+    rolls back connections that actually executed something.
+    """
+
+    def __init__(self, raw_connection):
+        self._raw = raw_connection
+        self.in_transaction = False
+        self.last_used = time.monotonic()
+
+    def _mark_dirty(self):
+        if not self._raw.autocommit:
+            self.in_transaction = True
+
+    @property
+    def autocommit(self):
+        return self._raw.autocommit
+
+    @autocommit.setter
+    def autocommit(self, value):
+        self._raw.autocommit = value
+
+    def cursor(self):
+        return PooledCursor(self._raw.cursor(), self)
+
+    def execute(self, *args, **kwargs):
+        self._mark_dirty()
+        return self._raw.execute(*args, **kwargs)
+
+    def commit(self):
+        self._raw.commit()
+        self.in_transaction = False
+
+    def rollback(self):
+        self._raw.rollback()
+        self.in_transaction = False
+
+    def close(self):
+        try:
+            self._raw.close()
+        except Exception:
+            pass
+
+    def reset(self):
+        """Prepare connection for the next borrower. Returns False if it is unusable."""
+        try:
+            if self.in_transaction:
+                self.rollback()
+            if self._raw.autocommit:
+                self._raw.autocommit = False
+            return True
+        except Exception:
+            return False
+
+    def ping(self):
+        """Round trip to the server; False if the handle is dead"""
+        try:
+            cursor = self._raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class PooledConnectionProvider(ConnectionProvider):
+    """
+    Thread-safe connection pool.
+    get_connection() blocks up to acquire_timeout when the pool is exhausted,
+    idle connections are pinged in the background and dead ones are evicted.
+    """
+
+    def __init__(self, pool_size=20, max_overflow=10, acquire_timeout=30.0,
+                 health_check_interval=30.0, connection_string=None, min_size=0):
+        """
+        Args:
+            pool_size: Number of persistent connections
+            max_overflow: Additional connections if pool exhausted (closed on return)
+            acquire_timeout: Seconds to wait for a free connection before RuntimeError
+            health_check_interval: Seconds between liveness pings of idle connections (0 disables)
+            connection_string: ODBC connection string (default from environment)
+            min_size: Connections opened in parallel in the background right away (see prewarm)
+        """
+        self.connection_string = connection_string or EnvironmentConfig.get_connection_string()
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+
+        self._condition = threading.Condition()
+        self._idle = deque()  # PooledConnection, most recently used on the right
+        self._active = set()
+        self.total_created = 0
+        self.warming = 0  # connections being opened by prewarm()
+        self._generation = 0  # bumped by close_all_connections(); older prewarm/health-check connections are dropped
+        self.waits = 0
+        self.evicted = 0
+
+        self._health_stop = threading.Event()
+        self._health_thread = None
+        self._start_health_thread()
+
+        print(f"Connection pool initialized (size: {pool_size}, max: {pool_size + max_overflow}, "
+              f"timeout: {acquire_timeout}s)")
+        if min_size:
+            self.prewarm(min_size)
+
+    def prewarm(self, count):
+        """
+        Open count connections in parallel background threads, so the handshakes
+        overlap each other and the caller's startup work. get_connection() waits
+        for a warming connection instead of opening another one.
+        Returns number of connections being opened.
+        """
+        with self._condition:
+            count = max(0, min(count, self.pool_size - self.total_created))
+            self.total_created += count
+            self.warming += count
+            generation = self._generation
+
+        def connect():
+            conn = None
+            try:
+                with REGISTRY.timer('pool_connect_seconds'):
+                    conn = PooledConnection(self._connect())
+            except Exception as e:
+                print(f"[ConnectionPool] Prewarm connection failed: {e}")
+            with self._condition:
+                stale = generation != self._generation
+                if not stale:
+                    self.warming -= 1
+                    if conn is None:
+                        self.total_created -= 1
+                    else:
+                        self._idle.append(conn)
+                    self._condition.notify()
+            # pool was closed while connecting: its counters no longer include this one
+            if stale and conn is not None:
+                conn.close()
+
+        for index in range(count):
+            threading.Thread(target=connect, name=f'pool-prewarm-{index}', daemon=True).start()
+        return count
+
+    def _connect(self):
+        """Open a new raw connection; subclasses may connect to something else"""
+        return pyodbc.connect(self.connection_string)
+
+    def _start_health_thread(self):
+        if not self.health_check_interval or self._health_thread is not None:
+            return
+        self._health_stop = threading.Event()
+        self._health_thread = threading.Thread(target=self._health_loop, args=(self._health_stop,),
+                                               name='pool-health', daemon=True)
+        self._health_thread.start()
+
+    def _health_loop(self, stop_event):
+        while not stop_event.wait(self.health_check_interval):
+            self.check_health()
+
+    def check_health(self):
+        """Ping connections idle longer than health_check_interval, evict dead ones"""
+        threshold = time.monotonic() - (self.health_check_interval or 0)
+        with self._condition:
+            stale = [conn for conn in self._idle if conn.last_used <= threshold]
+            for conn in stale:
+                self._idle.remove(conn)
+            generation = self._generation
+
+        if not stale:
+            return 0
+
+        alive, dead = [], []
+        for conn in stale:
+            (alive if conn.ping() else dead).append(conn)
+
+        now = time.monotonic()
+        with self._condition:
+            closed = generation != self._generation
+            if not closed:
+                for conn in alive:
+                    conn.last_used = now
+                    self._idle.appendleft(conn)
+                self.total_created -= len(dead)
+                self.evicted += len(dead)
+                self._condition.notify_all()
+
+        # pool was closed while pinging: its counters no longer include these
+        if closed:
+            for conn in stale:
+                conn.close()
+            return 0
+
+        for conn in dead:
+            conn.close()
+
+        if dead:
+            print(f"[ConnectionPool] Evicted {len(dead)} dead connection(s)")
+        return len(dead)
+
+    def get_connection(self, autocommit=False, timeout=None):
+        """Get connection from pool, waiting up to timeout seconds if it is exhausted"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        limit = self.pool_size + self.max_overflow
+        conn = None
+        waited = False
+
+        with self._condition:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self.total_created < limit and not self.warming:
+                    self.total_created += 1  # reserve the slot, connect outside the lock
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RuntimeError(f"Connection pool exhausted after {timeout}s. "
+                                       f"Active: {len(self._active)}, Total: {self.total_created}")
+                if not waited:
+                    waited = True
+                    self.waits += 1
+                self._condition.wait(remaining)
+
+        REGISTRY.histogram('pool_wait_seconds').observe(time.monotonic() - started)
+
+        if conn is None:
+            try:
+                with REGISTRY.timer('pool_connect_seconds'):
+                    conn = PooledConnection(self._connect())
+            except Exception:
+                with self._condition:
+                    self.total_created -= 1
+                    self._condition.notify()
+                raise
+
+        self._start_health_thread()
+
+        if autocommit:
+            conn.autocommit = True
+
+        with self._condition:
+            self._active.add(conn)
+        return conn
+
+    def return_connection(self, conn):
+        """Return connection to pool"""
+        with self._condition:
+            if conn not in self._active:
+                return
+            self._active.remove(conn)
+
+        # Roll back only if something ran outside autocommit
+        usable = conn.reset()
+
+        with self._condition:
+            keep = usable and len(self._idle) < self.pool_size
+            if keep:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+            else:
+                self.total_created -= 1
+            self._condition.notify()
+
+        if not keep:
+            conn.close()
+
+    @contextmanager
+    def lease(self, autocommit=False, timeout=None):
+        """Borrow a connection for the duration of a with-block"""
+        conn = self.get_connection(autocommit=autocommit, timeout=timeout)
+        try:
+            yield conn
+        finally:
+            self.return_connection(conn)
+
+    def close_all_connections(self):
+        """Close all connections and stop health checks"""
+        self._health_stop.set()
+        self._health_thread = None
+
+        with self._condition:
+            conns = list(self._active) + list(self._idle)
+            self._active.clear()
+            self._idle.clear()
+            # prewarm threads still connecting and health checks still pinging close their connections
+            self._generation += 1
+            self.total_created = 0
+            self.warming = 0
+            self._condition.notify_all()
+
+        for conn in conns:
+            conn.close()
+
+    def get_stats(self):
+        """Get pool statistics"""
+        with self._condition:
+            return {
+                'pool': len(self._idle),
+                'active': len(self._active),
+                'total': self.total_created,
+                'warming': self.warming,
+                'limit': self.pool_size + self.max_overflow,
+                'waits': self.waits,
+                'evicted': self.evicted
+            }
+
+    def __del__(self):
+        """Destructor"""
+        self.close_all_connections()
+
+
 class StrategyBase:
     """Base class for all trading strategies"""
 
@@ -143,12 +529,14 @@ class StrategyBase:
         9: 2592000 # MN1
     }
 
-    def __init__(self, configid, timer_interval=0.5, timeframe_id=1):
+    def __init__(self, configid, timer_interval=0.5, timeframe_id=1, connection_provider=None):
         """
         Args:
             configid: Strategy configuration ID (required)
             timer_interval: Timer interval in seconds (default 0.5s = 500ms)
             timeframe_id: Default timeframe ID (default 1 = M1)
+            connection_provider: Shared ConnectionProvider (optional). When given,
+                the strategy does not own the pool and will not close it.
         """
         self._termination_error_printed = None
         if configid is None:
@@ -162,7 +550,11 @@ class StrategyBase:
         print(f"StrategyBase initialized for config {configid} with {timer_interval}s interval")
 
         # Initialize connection provider
-        self.connection_provider = LocalConnectionProvider()
+        self._owns_connection_provider = connection_provider is None
+        if connection_provider is None:
+            self.connection_provider = PooledConnectionProvider()
+        else:
+            self.connection_provider = connection_provider
         self.db = DatabaseHelper(self.connection_provider)
 
         # Configuration storage
@@ -173,6 +565,39 @@ class StrategyBase:
         # Position storage in memory
         self.positions = {}  # configid -> position_data
 
+        # Bar-driven mode (see run(bar_clock=...))
+        self.control_interval = 5.0  # seconds between termination/suspend checks
+        self.last_bar_times = {}  # (ticker_jid, timeframe_id) -> latest barTime seen
+        self._bar_event = threading.Event()
+        self._bar_seen_at = None  # time.monotonic() of the first unprocessed bar
+
+        # DeadlineScheduler of run(); bar_offset set -> logic at bar close + bar_offset seconds
+        self.scheduler = None
+        self.bar_offset = None
+        self.heartbeat_interval = 60.0
+
+        # Set by request_reload() (control channel, ConfigWatcher); applied at the start of the next cycle
+        self._reload_requested = False
+        self.reload_listeners = []  # callback(strategy, changed_keys) after a reload changed parameters
+        self.config_watch_interval = 30.0  # run(): algo.ConfigurationSets change polling (0 disables)
+
+        # Set by TerminationCoordinator.register(); checks are then answered from memory
+        self.termination_coordinator = None
+
+        # ExecutionLogger (optional); when set, execution logs are written behind
+        self.execution_logger = None
+
+        # PositionCache (optional); when set, positions are read from memory
+        self.position_cache = None
+
+        # OrderTracker (optional); when set, last_order is a Future of the last fill
+        self.order_tracker = None
+        self.last_order = None
+
+        # Set once the positions were dropped on stop (here or by force_close_batch)
+        self.force_closed = False
+        self._force_close_lock = threading.Lock()
+
     def _register_and_load_configuration(self):
         """Register strategy in database and load configuration"""
         conn = self.db.get_connection(autocommit=True)
@@ -239,40 +664,68 @@ class StrategyBase:
         """Return connection to pool"""
         self.db.return_connection(connection)
 
-    def run(self):
+    def lease(self, autocommit=False):
+        """Context manager: with self.lease() as conn: ..."""
+        return self.db.lease(autocommit)
+
+    def run(self, bar_clock=None):
         """
         Main strategy execution loop.
+
+        Jobs run on a DeadlineScheduler (absolute monotonic deadlines, missed
+        ticks coalesced, lateness in the metrics registry):
+            cycle      every timer_interval, termination/suspend checks and the strategy body
+            logic      with bar_offset set: at bar close + bar_offset instead (the cycle job
+                       then only checks termination/suspend)
+            heartbeat  every heartbeat_interval
+
+        Args:
+            bar_clock: BarClock (optional). When given, the strategy body runs only
+                when a new bar lands; termination and suspend checks still run
+                every control_interval seconds.
         """
         print(f"[StrategyBase] Starting execution loop for config {self.configid}")  # ← ИЗМЕНИТЬ
 
-        try:
-            while True:
-                conn = self.get_connection()
+        subscriptions = []
+        self.scheduler = DeadlineScheduler()
 
-                try:
-                    if self.check_termination(conn):
-                        print(f"[StrategyBase] Termination condition met. Stopping strategy.")
-                        self.force_close(conn)
-                        break
+        def resubscribe(strategy, changed):
+            """Follow ticker/timeframe changes of a reload"""
+            pairs = self.bar_subscriptions()
+            for ticker_jid, timeframe_id in set(subscriptions) - set(pairs):
+                bar_clock.unsubscribe(ticker_jid, timeframe_id, self.on_new_bar)
+            for ticker_jid, timeframe_id in set(pairs) - set(subscriptions):
+                bar_clock.subscribe(ticker_jid, timeframe_id, self.on_new_bar)
+            subscriptions[:] = pairs
 
-                    if self.check_suspend_trading(conn):  # ← ИЗМЕНИТЬ НАЗВАНИЕ
-                        print(f"[StrategyBase] Trading suspend time reached.")  # ← ИЗМЕНИТЬ ТЕКСТ
-                        self.force_close(conn)
-                        break
-
-                    # ← ВСТАВИТЬ ЗДЕСЬ ↓
-                    self.process_bars_and_signals(conn, close_existing=True)
-                    # ← ВСТАВИТЬ ЗДЕСЬ ↑
+        try:
+            if bar_clock is not None:
+                subscriptions = self.bar_subscriptions()
+                for ticker_jid, timeframe_id in subscriptions:
+                    bar_clock.subscribe(ticker_jid, timeframe_id, self.on_new_bar)
+                self.reload_listeners.append(resubscribe)
+                print(f"[StrategyBase] Bar-driven mode: {subscriptions}")
+                self.scheduler.add_job('cycle', self.control_interval, lambda: self._scheduled_cycle(False))
+                self.scheduler.add_job('logic', None, lambda: self._scheduled_cycle(True))
+            elif self.bar_offset is not None:
+                bar_seconds = self.TIMEFRAME_MAP.get(self.timeframe_id, 60)
+                print(f"[StrategyBase] Logic at bar close + {self.bar_offset}s ({bar_seconds}s bars)")
+                self.scheduler.add_job('cycle', self.timer_interval, lambda: self._scheduled_cycle(False))
+                self.scheduler.add_job('logic', bar_seconds, lambda: self._scheduled_cycle(True),
+                                       offset=self.bar_offset, align=True)
+            else:
+                self.scheduler.add_job('cycle', self.timer_interval, lambda: self._scheduled_cycle(True),
+                                       run_now=True)
 
-                finally:
-                    self.return_connection(conn)
+            if self.heartbeat_interval:
+                self.scheduler.add_job('heartbeat', self.heartbeat_interval, self.send_heartbeat, run_now=True)
 
-                import time
-                time.sleep(self.timer_interval)
+            if self.config_watch_interval:
+                config_watcher = ConfigWatcher(self.connection_provider, on_change=lambda configid: self.request_reload())
+                config_watcher.register(self.configid)
+                self.scheduler.add_job('config', self.config_watch_interval, config_watcher.poll, run_now=True)
 
-                self.current_cycle += 1
-                if self.current_cycle >= self.n:
-                    self.current_cycle = 0
+            self.scheduler.run()
 
         except KeyboardInterrupt:
             print(f"[StrategyBase] Interrupted by user")
@@ -281,10 +734,161 @@ class StrategyBase:
             import traceback
             traceback.print_exc()
         finally:
+            self.scheduler.stop()
+            if resubscribe in self.reload_listeners:
+                self.reload_listeners.remove(resubscribe)
+            for ticker_jid, timeframe_id in subscriptions:
+                bar_clock.unsubscribe(ticker_jid, timeframe_id, self.on_new_bar)
             print(f"[StrategyBase] Strategy {self.configid} stopped")  # ← ИЗМЕНИТЬ
 
+    def _scheduled_cycle(self, process_signals):
+        """Scheduler job: one cycle on a leased connection; False stops the scheduler"""
+        with self.lease() as conn:
+            return self.run_cycle(conn, process_signals=process_signals)
+
+    def send_heartbeat(self):
+        """algo.sp_UpdateStrategyState 'heartbeat' (queued when an ExecutionLogger is attached)"""
+        if self.execution_logger is not None:
+            self.execution_logger.update_state(self.configid, 'heartbeat')
+            return
+        with self.lease(autocommit=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("EXEC algo.sp_UpdateStrategyState @configID = ?, @currentState = 'heartbeat'",
+                           self.configid)
+            cursor.close()
+
+    def cycle_in_bar(self, now=None):
+        """Timer cycles since the current bar of timeframe_id opened, from the wall clock (0..n-1)"""
+        bar_seconds = self.TIMEFRAME_MAP.get(self.timeframe_id, 60)
+        now = time.time() if now is None else now
+        return min(int((now % bar_seconds) / self.timer_interval), max(self.n - 1, 0))
+
+    def bar_subscriptions(self):
+        """(ticker_jid, timeframe_id) pairs whose new bars should wake this strategy"""
+        config = getattr(self, 'config_data', None)
+        if not config:
+            return []
+        return [(config['ticker_jid'], self.timeframe_id)]
+
+    def on_new_bar(self, ticker_jid, timeframe_id, bar_time):
+        """BarClock callback: remember the bar and wake the execution loop"""
+        self.last_bar_times[(ticker_jid, timeframe_id)] = bar_time
+        if self._bar_seen_at is None:
+            self._bar_seen_at = time.monotonic()
+        self._bar_event.set()
+        if self.scheduler is not None:
+            self.scheduler.trigger('logic')
+
+    def run_cycle(self, conn, process_signals=True):
+        """
+        Execute one timer cycle on the given connection.
+        Returns False when the strategy must stop, True otherwise.
+        Used by run() and by StrategyHost, which schedules cycles of many strategies.
+        With process_signals=False only termination and suspend checks run.
+        Cycle time, DB calls and bar-to-signal latency go to the metrics registry.
+        """
+        origin = None
+        if process_signals:
+            origin, self._bar_seen_at = self._bar_seen_at, None
+        with REGISTRY.cycle(type(self).__name__, origin=origin):
+            return self._run_cycle(conn, process_signals)
+
+    def _run_cycle(self, conn, process_signals):
+        if self._reload_requested:
+            self._reload_requested = False
+            self.reload_configuration(conn)
+
+        if self.check_termination(conn):
+            print(f"[StrategyBase] Termination condition met. Stopping strategy.")
+            self.force_close(conn)
+            return False
+
+        if self.check_suspend_trading(conn):  # ← ИЗМЕНИТЬ НАЗВАНИЕ
+            print(f"[StrategyBase] Trading suspend time reached.")  # ← ИЗМЕНИТЬ ТЕКСТ
+            self.force_close(conn)
+            return False
+
+        if not process_signals:
+            return True
+
+        self.process_bars_and_signals(conn, close_existing=True)
+
+        # Position within the current bar from the wall clock; a counter drifts with work time
+        self.current_cycle = self.cycle_in_bar()
+
+        return True
+
+    def request_reload(self):
+        """Re-read the configuration before the next cycle (thread-safe)"""
+        self._reload_requested = True
+        if self.scheduler is not None:
+            self.scheduler.trigger('cycle')
+
+    def reload_configuration(self, connection):
+        """
+        Re-read algo.fn_GetStrategyConfiguration and apply changed parameters.
+        The new configuration replaces the old one as a whole; if _setup_parameters
+        fails the old one is restored. The instance GUID is kept.
+        Returns the set of changed keys, None on error.
+        """
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT * FROM algo.fn_GetStrategyConfiguration(?)", self.configid)
+            row = cursor.fetchone()
+            columns = [column[0] for column in cursor.description] if row else []
+            cursor.close()
+            if not row:
+                print(f"[StrategyBase] Configuration {self.configid} not found, keeping current parameters")
+                return None
+
+            previous = self.config_data or {}
+            config = dict(previous)
+            config.update(register_json_types(columns, row))
+            changed = {key for key, value in config.items() if key in previous and previous[key] != value}
+            if not changed:
+                return changed
+
+            self.config_data = config
+            previous_timeframe = self.timeframe_id, self.n
+            try:
+                if 'timeframe_signal_id' in changed:
+                    self.timeframe_id = config['timeframe_signal_id']
+                    self.n = int(self.TIMEFRAME_MAP.get(self.timeframe_id, 60) / self.timer_interval)
+                if hasattr(self, '_setup_parameters'):
+                    self._setup_parameters()
+            except Exception:
+                self.config_data = previous
+                self.timeframe_id, self.n = previous_timeframe
+                if hasattr(self, '_setup_parameters'):
+                    self._setup_parameters()
+                raise
+
+            self.on_configuration_changed(changed, previous)
+            if self.termination_coordinator is not None:
+                self.termination_coordinator.register(self)  # close time may have changed
+            for listener in list(self.reload_listeners):
+                listener(self, changed)
+            print(f"[StrategyBase] Configuration {self.configid} reloaded: {', '.join(sorted(changed))}")
+            return changed
+        except Exception as e:
+            print(f"[StrategyBase] Error reloading configuration: {e}")
+            return None
+
+    def on_configuration_changed(self, changed, previous):
+        """
+        Rebuild state derived from the changed keys only (override for strategy
+        buffers). Default: forget bar times of pairs no longer subscribed.
+        """
+        subscribed = set(self.bar_subscriptions())
+        for pair in list(self.last_bar_times):
+            if pair not in subscribed:
+                del self.last_bar_times[pair]
+
     def check_termination(self, connection):
         """Check if strategy should terminate using database procedure"""
+        if self.termination_coordinator is not None:
+            return self.termination_coordinator.should_terminate(self.configid)
+
         try:
             cursor = connection.cursor()
 
@@ -315,6 +919,9 @@ class StrategyBase:
 
     def check_suspend_trading(self, connection):
         """Check if trading should be suspended (time-based)"""
+        if self.termination_coordinator is not None:
+            return self.termination_coordinator.should_suspend(self.configid)
+
         try:
             if not hasattr(self, 'config_data'):
                 return False
@@ -336,8 +943,46 @@ class StrategyBase:
             print(f"[StrategyBase] Error checking suspend trading: {e}")
             return False
 
+    def claim_force_close(self):
+        """True for the one caller that must drop this strategy's positions"""
+        with self._force_close_lock:
+            if self.force_closed:
+                return False
+            self.force_closed = True
+            return True
+
+    def force_close_signals(self, positions):
+        """Drop signals for positions of this strategy"""
+        return drop_signals(positions, self.config_data.get('broker_id'), self.config_data.get('platform_id'),
+                            self.configid)
+
+    @staticmethod
+    def drop_log_fields(position):
+        """
+        volume and trade_uuid for logging a drop of position: the closed volume
+        (logs.strategyExecution requires volume > 0, the signal itself is sent
+        with 0) and the position's orderUUID (trade_uuid is a UNIQUEIDENTIFIER,
+        the integer position ID is not)
+        """
+        return {'volume': position.get('volume'), 'trade_uuid': position.get('orderUUID')}
+
+    def log_force_close(self, connection, positions):
+        """Log one force_close per position and forget the in-memory position"""
+        for position in positions:
+            self.log_strategy_execution(
+                connection=connection,
+                signal_type='force_close',
+                **self.drop_log_fields(position)
+            )
+        if self.configid in self.positions:
+            del self.positions[self.configid]
+
     def force_close(self, connection):
-        """Force close all positions for this strategy"""
+        """Force close all positions for this strategy (one signal batch)"""
+        if not self.claim_force_close():
+            print(f"[StrategyBase] Positions of config {self.configid} already closed")
+            return True
+
         print(f"[StrategyBase] Force closing positions for config {self.configid}")
 
         try:
@@ -345,6 +990,7 @@ class StrategyBase:
             cursor = connection.cursor()
             cursor.execute("SELECT algo.fn_GetInstancePositionIDs(?)", self.config_instance_guid)
             result = cursor.fetchone()
+            cursor.close()
 
             if not result or not result[0]:
                 print(f"[StrategyBase] No positions found")
@@ -357,52 +1003,28 @@ class StrategyBase:
                 print(f"[StrategyBase] No positions to close")
                 return True
 
-            # Close each position
-            for position in positions_data:
-                position_id = position['id']
-                print(f"[StrategyBase] Closing position ID {position_id}")
-
-                execute_signal_procedure(
-                    connection=connection,
-                    ticker=position['ticker'],
-                    direction='drop',
-                    volume=0,
-                    order_price=None,
-                    stop_loss=None,
-                    take_profit=None,
-                    expiry=None,
-                    broker_id=self.config_data.get('broker_id'),
-                    platform_id=self.config_data.get('platform_id'),
-                    trade_id=position_id,
-                    trade_type='POSITION',
-                    strategy_configuration_id=self.configid
-                )
-
-                # Log close
-                self.log_strategy_execution(
-                    connection=connection,
-                    signal_type='force_close',
-                    volume=0,
-                    trade_uuid=str(position_id)
-                )
+            # All drops in one batch and one commit
+            if not execute_signal_batch(connection, self.force_close_signals(positions_data)):
+                self.force_closed = False
+                return False
 
+            self.log_force_close(connection, positions_data)
             connection.commit()
-            cursor.close()
-
-            # Remove from memory
-            if self.configid in self.positions:
-                del self.positions[self.configid]
 
             print(f"[StrategyBase] Force close completed for {len(positions_data)} position(s)")
             return True
 
         except Exception as e:
             print(f"[StrategyBase] Error in force close: {e}")
+            self.force_closed = False
             connection.rollback()
             return False
 
     def get_position(self, configid):
         """Get position from memory for specified configid"""
+        if self.position_cache is not None:
+            positions = self.position_cache.get_positions(configid)
+            return positions[0] if positions else None
         return self.positions.get(configid)
 
     def close_position(self, configid, position_id):
@@ -414,51 +1036,53 @@ class StrategyBase:
         try:
             print(f"[StrategyBase] Closing position {position_id} for config {configid}")
 
-            # Get position details from memory or DB
-            position = self.positions.get(configid)
-            if not position:
-                # Try to get from DB
-                cursor = self.get_connection().cursor()
-                cursor.execute("SELECT algo.fn_GetStrategyPositionIDs(?)", configid)
-                result = cursor.fetchone()
-                if result and result[0]:
-                    import json
-                    positions_data = json.loads(result[0])
-                    if positions_data and len(positions_data) > 0:
-                        position = positions_data[0]
-
-            if not position:
-                print(f"[StrategyBase] Position {position_id} not found")
-                return False
-
-            # Execute close
-            conn = self.get_connection()
-            execute_signal_procedure(
-                connection=conn,
-                ticker=position['ticker'],
-                direction='drop',
-                volume=0,
-                order_price=None,
-                stop_loss=None,
-                take_profit=None,
-                expiry=None,
-                broker_id=self.config_data.get('broker_id'),
-                platform_id=self.config_data.get('platform_id'),
-                trade_id=position_id,
-                trade_type='POSITION',
-                strategy_configuration_id=configid
-            )
+            with self.lease() as conn:
+                # Get position details from memory or DB
+                position = self.positions.get(configid)
+                if not position:
+                    # Try to get from DB
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT algo.fn_GetStrategyPositionIDs(?)", configid)
+                    result = cursor.fetchone()
+                    cursor.close()
+                    if result and result[0]:
+                        import json
+                        positions_data = json.loads(result[0])
+                        if positions_data and len(positions_data) > 0:
+                            position = positions_data[0]
+
+                if not position:
+                    print(f"[StrategyBase] Position {position_id} not found")
+                    return False
+
+                if self.order_tracker is not None:
+                    self.last_order = self.order_tracker.expect_close(position_id)
+
+                # Execute close
+                execute_signal_procedure(
+                    connection=conn,
+                    ticker=position['ticker'],
+                    direction='drop',
+                    volume=0,
+                    order_price=None,
+                    stop_loss=None,
+                    take_profit=None,
+                    expiry=None,
+                    broker_id=self.config_data.get('broker_id'),
+                    platform_id=self.config_data.get('platform_id'),
+                    trade_id=position_id,
+                    trade_type='POSITION',
+                    strategy_configuration_id=configid
+                )
 
-            # Log
-            self.log_strategy_execution(
-                connection=conn,
-                signal_type='drop',
-                volume=0,
-                trade_uuid=str(position_id)
-            )
+                # Log
+                self.log_strategy_execution(
+                    connection=conn,
+                    signal_type='drop',
+                    **self.drop_log_fields(position)
+                )
 
-            conn.commit()
-            self.return_connection(conn)
+                conn.commit()
 
             # Remove from memory
             if configid in self.positions:
@@ -484,36 +1108,38 @@ class StrategyBase:
 
             print(f"[StrategyBase] Opening {direction} position for config {configid}")
 
-            conn = self.get_connection()
-
-            # Execute open
-            execute_signal_procedure(
-                connection=conn,
-                ticker=self.config_data['ticker'],
-                direction=direction,
-                volume=float(self.config_data['open_volume']),
-                order_price=None,
-                stop_loss=None,
-                take_profit=None,
-                expiry=None,
-                broker_id=self.config_data.get('broker_id'),
-                platform_id=self.config_data.get('platform_id'),
-                trade_id=None,
-                trade_type=None,
-                strategy_configuration_id=configid
-            )
+            if self.order_tracker is not None:
+                self.last_order = self.order_tracker.expect_open(configid, ticker=self.config_data['ticker'],
+                                                                 direction=direction)
 
-            # Log
-            self.log_strategy_execution(
-                connection=conn,
-                signal_type=direction,
-                volume=float(self.config_data['open_volume']),
-                price=None,
-                trade_uuid=None
-            )
+            with self.lease() as conn:
+                # Execute open
+                execute_signal_procedure(
+                    connection=conn,
+                    ticker=self.config_data['ticker'],
+                    direction=direction,
+                    volume=float(self.config_data['open_volume']),
+                    order_price=None,
+                    stop_loss=None,
+                    take_profit=None,
+                    expiry=None,
+                    broker_id=self.config_data.get('broker_id'),
+                    platform_id=self.config_data.get('platform_id'),
+                    trade_id=None,
+                    trade_type=None,
+                    strategy_configuration_id=configid
+                )
 
-            conn.commit()
-            self.return_connection(conn)
+                # Log
+                self.log_strategy_execution(
+                    connection=conn,
+                    signal_type=direction,
+                    volume=float(self.config_data['open_volume']),
+                    price=None,
+                    trade_uuid=None
+                )
+
+                conn.commit()
 
             print(f"[StrategyBase] {direction} position opened for {self.config_data['ticker']}")
             return True
@@ -522,8 +1148,68 @@ class StrategyBase:
             print(f"[StrategyBase] Error opening position: {e}")
             return False
 
+    def reverse_position(self, configid, position, direction):
+        """Close position and open direction as one signal batch (no flat gap, one confirmation)"""
+        if configid != self.configid:
+            print(f"[StrategyBase] Warning: reverse_position called for config {configid} but instance is for config {self.configid}")
+            return False
+
+        try:
+            if not hasattr(self, 'config_data'):
+                print(f"[StrategyBase] No config data loaded")
+                return False
+
+            print(f"[StrategyBase] Reversing position {position['id']} to {direction} for config {configid}")
+            volume = float(self.config_data['open_volume'])
+            broker_id = self.config_data.get('broker_id')
+            platform_id = self.config_data.get('platform_id')
+
+            with self.lease() as conn:
+                if self.order_tracker is not None:
+                    self.last_order = self.order_tracker.submit_reversal(
+                        conn, configid, position, direction, volume,
+                        broker_id=broker_id, platform_id=platform_id)
+                    sent = not (self.last_order.done() and self.last_order.result() is None)
+                else:
+                    sent = execute_signal_batch(conn, reversal_signals(position, direction, volume,
+                                                                       broker_id, platform_id, configid))
+                if not sent:
+                    return False
+
+                # Log both legs
+                self.log_strategy_execution(
+                    connection=conn,
+                    signal_type='drop',
+                    **self.drop_log_fields(position)
+                )
+                self.log_strategy_execution(
+                    connection=conn,
+                    signal_type=direction,
+                    volume=volume,
+                    price=None,
+                    trade_uuid=None
+                )
+
+                conn.commit()
+
+            # Remove from memory
+            if configid in self.positions:
+                del self.positions[configid]
+
+            print(f"[StrategyBase] Reversal to {direction} sent for {position['ticker']}")
+            return True
+
+        except Exception as e:
+            print(f"[StrategyBase] Error reversing position: {e}")
+            return False
+
     def log_strategy_execution(self, connection, signal_type, volume, price=None, trade_uuid=None):
         """Log strategy execution - общий метод"""
+        if self.execution_logger is not None:
+            self.execution_logger.log_execution(self.configid, signal_type=signal_type, volume=volume,
+                                                price=price, trade_uuid=trade_uuid)
+            return True
+
         try:
             cursor = connection.cursor()
             cursor.execute("""
@@ -542,8 +1228,9 @@ class StrategyBase:
             return False
 
     def _cleanup(self):
-        """Cleanup resources"""
-        self.connection_provider.close_all_connections()
+        """Cleanup resources (shared providers are closed by their owner)"""
+        if getattr(self, '_owns_connection_provider', False):
+            self.connection_provider.close_all_connections()
 
     def __del__(self):
         """Destructor"""
@@ -577,8 +1264,8 @@ class DatabaseHelper:
             connection_provider: ConnectionProvider instance (optional)
         """
         if connection_provider is None:
-            # Default to LocalConnectionProvider
-            self.connection_provider = LocalConnectionProvider()
+            # Default to thread-safe PooledConnectionProvider
+            self.connection_provider = PooledConnectionProvider()
         else:
             self.connection_provider = connection_provider
 
@@ -593,6 +1280,15 @@ class DatabaseHelper:
         else:
             connection.close()
 
+    @contextmanager
+    def lease(self, autocommit=False):
+        """Borrow a connection for the duration of a with-block"""
+        conn = self.get_connection(autocommit)
+        try:
+            yield conn
+        finally:
+            self.return_connection(conn)
+
     def execute_query(self, query, params=None):
         """Execute SQL query with automatic connection management"""
         conn = self.get_connection()
@@ -606,6 +1302,19 @@ class DatabaseHelper:
         finally:
             self.return_connection(conn)
 
+    def get_market_snapshot(self, pairs):
+        """
+        Latest and previous bar with EMA/RSI for many pairs in one statement
+
+        Args:
+            pairs: List of (ticker_jid, timeframe_id)
+
+        Returns:
+            dict (ticker_jid, timeframe_id) -> MarketSnapshot(current, previous)
+        """
+        with self.lease(autocommit=True) as conn:
+            return fetch_market_snapshot(conn, pairs)
+
     def get_stats(self):
         """Get connection pool statistics"""
         if hasattr(self.connection_provider, 'get_stats'):
@@ -630,6 +1339,32 @@ class SignalValidator:
 
 
 # ===== SIGNAL EXECUTION FUNCTION =====
+def force_close_batch(connection, strategies):
+    """
+    Drop the open positions of several strategies in one signal batch
+    (end-of-day flattening of a host). Positions are read from each strategy's
+    PositionCache, so refresh the cache first. Strategies already force-closed
+    are skipped; on failure they are released for their own force_close.
+    Returns number of drop signals sent, None on failure.
+    """
+    claimed = [strategy for strategy in strategies
+               if strategy.position_cache is not None and strategy.claim_force_close()]
+    closing = [(strategy, strategy.position_cache.get_positions(strategy.configid)) for strategy in claimed]
+    signals = [signal for strategy, positions in closing for signal in strategy.force_close_signals(positions)]
+
+    if not execute_signal_batch(connection, signals):
+        for strategy in claimed:
+            strategy.force_closed = False
+        return None
+
+    for strategy, positions in closing:
+        strategy.log_force_close(connection, positions)
+    connection.commit()
+
+    print(f"[Signal] Force close batch: {len(signals)} position(s) of {len(claimed)} strategies")
+    return len(signals)
+
+
 def execute_signal_procedure(connection, ticker, direction, volume, order_price=None,
                              stop_loss=None, take_profit=None, expiry=None,
                              broker_id=None, platform_id=None, trade_id=None,
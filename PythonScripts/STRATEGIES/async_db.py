@@ -0,0 +1,102 @@
+"""
+Async DB - asyncio access to a connection pool for concurrent reads.
+
+Each call leases its own pooled connection and runs on a worker thread via
+run_in_executor; pyodbc releases the GIL while a statement is in flight, so
+independent reads overlap and a cycle waits for the slowest one instead of
+the sum. DB calls made on the workers still count towards the calling
+strategy's cycle in the metrics registry.
+
+Usage:
+    adb = AsyncDatabase(connection_provider)
+    price, signal = adb.run(adb.gather(
+        adb.call(get_current_price, ticker_jid, 1),
+        adb.fetchval("SELECT trading_signal FROM algo.fn_GetCurrentSignals(?, ?, ?, ?)", *args)))
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import REGISTRY, instrument_connection
+
+
+class AsyncDatabase:
+    """asyncio facade over a ConnectionProvider; one pooled connection per concurrent call"""
+
+    def __init__(self, connection_provider, max_workers=4, instrument=False, registry=REGISTRY):
+        """
+        Args:
+            connection_provider: Provider with get_connection(autocommit) / return_connection(conn)
+            max_workers: Concurrent statements (keep within the pool size)
+            instrument: Wrap connections for DB-call metrics (for pools that do not record them)
+            registry: MetricsRegistry the calling cycle lives in
+        """
+        self.connection_provider = connection_provider
+        self.instrument = instrument
+        self.registry = registry
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='async-db')
+        # Providers without their own locking (LocalConnectionProvider) are leased one at a time
+        self._lease_lock = threading.Lock()
+
+        self.calls = 0
+        self.errors = 0
+
+    def _leased(self, cycle, autocommit, func, args):
+        """Worker: run func(connection, *args) on a leased connection"""
+        with self._lease_lock:
+            conn = self.connection_provider.get_connection(autocommit)
+        try:
+            with self.registry.bind_cycle(cycle):
+                return func(instrument_connection(conn, self.registry) if self.instrument else conn, *args)
+        finally:
+            with self._lease_lock:
+                self.connection_provider.return_connection(conn)
+
+    async def call(self, func, *args, autocommit=True):
+        """Await func(connection, *args) run on a worker thread with its own connection"""
+        import asyncio  # deferred: asyncio is the heaviest import on the strategy start path
+
+        loop = asyncio.get_running_loop()
+        self.calls += 1
+        try:
+            return await loop.run_in_executor(self.executor, self._leased, self.registry.current_cycle(),
+                                              autocommit, func, args)
+        except Exception:
+            self.errors += 1
+            raise
+
+    async def fetchall(self, sql, *params):
+        def query(conn, *args):
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, *args)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+        return await self.call(query, *params)
+
+    async def fetchone(self, sql, *params):
+        rows = await self.fetchall(sql, *params)
+        return rows[0] if rows else None
+
+    async def fetchval(self, sql, *params):
+        row = await self.fetchone(sql, *params)
+        return row[0] if row else None
+
+    @staticmethod
+    async def gather(*awaitables, return_exceptions=False):
+        """Run awaitables concurrently; results in the same order"""
+        import asyncio
+        return await asyncio.gather(*awaitables, return_exceptions=return_exceptions)
+
+    @staticmethod
+    def run(coroutine):
+        """Run a coroutine to completion from synchronous code (strategy cycle thread)"""
+        import asyncio
+        return asyncio.run(coroutine)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def get_stats(self):
+        return {'calls': self.calls, 'errors': self.errors}
@@ -0,0 +1,184 @@
+"""
+Bar Clock - wakes strategies when a new bar lands in tms.bars.
+
+One query per poll covers every (TickerJID, timeframeID) subscribed in the
+process, instead of every strategy hitting the database on a fixed timer.
+"""
+
+import time
+import threading
+from collections import defaultdict
+
+from ANFramework import DatabaseHelper
+
+
+class BarClock:
+    """Shared watcher of the latest barTime per (TickerJID, timeframeID)"""
+
+    # Two parameters per pair, SQL Server allows 2100 per statement
+    MAX_PAIRS_PER_QUERY = 1000
+
+    def __init__(self, connection_provider=None, poll_interval=1.0, grace_seconds=1.0):
+        """
+        Args:
+            connection_provider: ConnectionProvider shared with the strategies (optional)
+            poll_interval: Seconds between latest-bar queries
+            grace_seconds: Delay after a new bar is seen before callbacks fire,
+                so dependent rows (tms.EMA, tms.Indicators_Momentum) can land
+        """
+        self.db = DatabaseHelper(connection_provider)
+        self.poll_interval = poll_interval
+        self.grace_seconds = grace_seconds
+
+        self._subscribers = defaultdict(list)  # (ticker_jid, timeframe_id) -> [callback]
+        self._last_bar = {}  # (ticker_jid, timeframe_id) -> latest barTime seen
+        self._pending = {}  # (ticker_jid, timeframe_id) -> (barTime, monotonic due time)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.polls = 0
+        self.bars_fired = 0
+
+    def subscribe(self, ticker_jid, timeframe_id, callback):
+        """Call callback(ticker_jid, timeframe_id, bar_time) on every new bar"""
+        key = (int(ticker_jid), int(timeframe_id))
+        with self._lock:
+            if callback not in self._subscribers[key]:
+                self._subscribers[key].append(callback)
+
+    def unsubscribe(self, ticker_jid, timeframe_id, callback):
+        """Remove a callback; the pair is no longer queried once nobody listens"""
+        key = (int(ticker_jid), int(timeframe_id))
+        with self._lock:
+            callbacks = self._subscribers.get(key)
+            if not callbacks:
+                return
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                del self._subscribers[key]
+                self._last_bar.pop(key, None)
+                self._pending.pop(key, None)
+
+    def fetch_latest(self, pairs):
+        """Latest barTime for each (ticker_jid, timeframe_id) pair in one round trip per chunk"""
+        latest = {}
+        if not pairs:
+            return latest
+
+        with self.db.lease(autocommit=True) as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(pairs), self.MAX_PAIRS_PER_QUERY):
+                chunk = pairs[start:start + self.MAX_PAIRS_PER_QUERY]
+                values = ", ".join(["(?, ?)"] * len(chunk))
+                params = [value for pair in chunk for value in pair]
+
+                # Seeks idx_bars_ticker_time (TickerJID, timeFrameID, barTime) per pair
+                cursor.execute(f"""
+                    SELECT s.TickerJID, s.TimeFrameID, x.lastBarTime
+                    FROM (VALUES {values}) AS s(TickerJID, TimeFrameID)
+                    CROSS APPLY (
+                        SELECT MAX(b.barTime) AS lastBarTime
+                        FROM tms.bars b
+                        WHERE b.TickerJID = s.TickerJID
+                          AND b.timeframeID = s.TimeFrameID
+                    ) x
+                """, params)
+
+                for ticker_jid, timeframe_id, bar_time in cursor.fetchall():
+                    if bar_time is not None:
+                        latest[(int(ticker_jid), int(timeframe_id))] = bar_time
+            cursor.close()
+
+        return latest
+
+    def poll(self):
+        """Query latest bars once and fire callbacks whose grace delay has passed"""
+        with self._lock:
+            pairs = list(self._subscribers)
+
+        latest = self.fetch_latest(pairs)
+        self.polls += 1
+        now = time.monotonic()
+
+        with self._lock:
+            for key, bar_time in latest.items():
+                previous = self._last_bar.get(key)
+                if previous is None:
+                    # First observation only seeds the clock
+                    self._last_bar[key] = bar_time
+                elif bar_time > previous:
+                    self._last_bar[key] = bar_time
+                    self._pending[key] = (bar_time, now + self.grace_seconds)
+
+        return self.fire_due()
+
+    def fire_due(self):
+        """Invoke callbacks for pending bars whose grace delay has passed"""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for key, (bar_time, due_at) in list(self._pending.items()):
+                if due_at <= now:
+                    del self._pending[key]
+                    due.append((key, bar_time, list(self._subscribers.get(key, ()))))
+
+        for (ticker_jid, timeframe_id), bar_time, callbacks in due:
+            for callback in callbacks:
+                try:
+                    callback(ticker_jid, timeframe_id, bar_time)
+                except Exception as e:
+                    print(f"[BarClock] Callback error for {ticker_jid}/{timeframe_id}: {e}")
+            self.bars_fired += 1
+
+        return len(due)
+
+    def _next_wait(self):
+        """Sleep until the next poll or the earliest pending callback"""
+        with self._lock:
+            due_times = [due_at for _, due_at in self._pending.values()]
+        wait = self.poll_interval
+        if due_times:
+            wait = min(wait, max(0.0, min(due_times) - time.monotonic()))
+        return wait
+
+    def _loop(self):
+        next_poll = time.monotonic()
+        while not self._stop_event.is_set():
+            if time.monotonic() >= next_poll:
+                next_poll = time.monotonic() + self.poll_interval
+                try:
+                    self.poll()
+                except Exception as e:
+                    print(f"[BarClock] Poll error: {e}")
+            else:
+                self.fire_due()
+
+            self._stop_event.wait(min(self._next_wait(), max(0.0, next_poll - time.monotonic())))
+
+    def start(self):
+        """Start polling in a background thread"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name='bar-clock', daemon=True)
+        self._thread.start()
+        print(f"[BarClock] Started (poll: {self.poll_interval}s, grace: {self.grace_seconds}s)")
+
+    def stop(self):
+        """Stop the polling thread"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def get_stats(self):
+        """Clock statistics"""
+        with self._lock:
+            return {
+                'pairs': len(self._subscribers),
+                'pending': len(self._pending),
+                'polls': self.polls,
+                'bars_fired': self.bars_fired
+            }
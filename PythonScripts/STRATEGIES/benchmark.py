@@ -0,0 +1,326 @@
+"""
+Benchmark - load test of StrategyHost against a local stand-in database.
+
+Starts N strategies (SyntheticStrategy by default, any module:ClassName
+works) on LocalDatabase or the in-memory SimulatedExchange, replays bars
+from an OLTP/historicalData CSV and reports per run:
+
+    cycles_per_second, queries_per_cycle, cycle p50/p99, bar -> order p50/p99,
+    pool wait, keep-up ratio (cycles run / cycles due), RSS per strategy, CPU
+
+Results are written as JSON; --baseline compares against an earlier file.
+
+Usage:
+    python benchmark.py --strategies 1 10 100 1000 --output bench.json
+    python benchmark.py --strategies 200 --poll --baseline bench.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import contextlib
+from datetime import datetime
+
+from ANFramework import StrategyBase
+from market_snapshot import fetch_market_snapshot
+from metrics import REGISTRY
+from strategy_host import StrategyHost, load_strategy_class, background_connections
+from local_db import LocalDatabase, LocalDatabaseProvider, DEFAULT_CSV_PATH, TIMEFRAMES, csv_series, read_csv_bars
+from simulated_provider import SimulatedMarket, SimulatedExchange, SimulatedConnectionProvider
+
+DEFAULT_CSV = os.path.join(DEFAULT_CSV_PATH, 'metals', 'XAUUSD_15min.csv')
+TIMEFRAME_CODES = {timeframe_id: code for timeframe_id, code, _, _ in TIMEFRAMES}
+
+
+class SyntheticStrategy(StrategyBase):
+    """Bar-driven strategy with a typical DB profile: one snapshot read per bar, a reversal every trade_every bars"""
+
+    trade_every = 10
+
+    def __init__(self, configid, connection_provider=None):
+        super().__init__(configid=configid, timer_interval=0.5, timeframe_id=1,
+                         connection_provider=connection_provider)
+        self.config_data = None
+        self.bars_processed = 0
+
+    def _setup_parameters(self):
+        config = self.config_data
+        self.ticker_jid = config['ticker_jid']
+        self.pairs = sorted({(self.ticker_jid, config[key]) for key in
+                             ('timeframe_signal_id', 'timeframe_confirmation_id', 'timeframe_trend_id')
+                             if config.get(key)})
+
+    def process_bars_and_signals(self, connection, close_existing=True):
+        snapshot = fetch_market_snapshot(connection, self.pairs).get((self.ticker_jid, self.timeframe_id))
+        self.bars_processed += 1
+        # Stagger trades across configs so orders do not all land on the same bar
+        if snapshot is None or snapshot.current is None or (self.bars_processed + self.configid) % self.trade_every:
+            return
+
+        current = snapshot.current
+        signal = 'buy' if current.ema_20 is None or current.close >= current.ema_20 else 'sell'
+        position = self.get_position(self.configid)
+        if position is None:
+            self.open_position(self.configid, signal)
+        else:
+            self.reverse_position(self.configid, position, 'sell' if position['direction'].lower() == 'buy' else 'buy')
+
+
+# ===== MEASUREMENT =====
+
+def rss_bytes():
+    """Resident set size of this process, None where it cannot be read"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _merged(snapshot_name, metrics):
+    """Histogram snapshot of a metric, summed over labels where there are several"""
+    snapshots = [h for h in metrics['histograms'] if h['name'] == snapshot_name]
+    if not snapshots:
+        return {}
+    if len(snapshots) == 1:
+        return snapshots[0]
+    # Several strategy labels: take the worst quantiles, sum the counts
+    merged = {'count': sum(h['count'] for h in snapshots), 'sum': sum(h['sum'] for h in snapshots)}
+    merged['mean'] = merged['sum'] / merged['count'] if merged['count'] else None
+    for key in ('p50', 'p90', 'p99', 'p99.9', 'max'):
+        values = [h[key] for h in snapshots if h.get(key) is not None]
+        merged[key] = max(values) if values else None
+    return merged
+
+
+def _ms(value):
+    return round(value * 1000, 3) if value is not None else None
+
+
+# ===== BACKENDS =====
+
+def build_backend(backend, count, ticker, timeframe_id, history, pool_size, query_latency):
+    """Create the stand-in database with history bars and count configurations; returns (provider, publish)"""
+    if backend == 'local':
+        db = LocalDatabase(':memory:')
+        ticker_jid = db.add_ticker(ticker)
+        db.load_bars(ticker_jid, timeframe_id, history)
+        for configid in range(1, count + 1):
+            code = TIMEFRAME_CODES[timeframe_id]
+            db.add_config(configid, ticker=ticker, timeframe_signal=code, timeframe_confirmation=code,
+                          timeframe_trend=code, open_volume=0.01)
+        provider = LocalDatabaseProvider(db, pool_size=pool_size, max_overflow=pool_size)
+        return provider, lambda bar: db.publish_bar(ticker_jid, timeframe_id, *bar)
+
+    market = SimulatedMarket()
+    ticker_jid = 1
+    market.add_ticker(ticker, ticker_jid)
+    for bar in history:
+        market.publish_bar(ticker_jid, timeframe_id, *bar)
+    exchange = SimulatedExchange(market)
+    for configid in range(1, count + 1):
+        exchange.add_config(configid, ticker=ticker, ticker_jid=ticker_jid, timeframe_signal_id=timeframe_id,
+                            timeframe_confirmation_id=timeframe_id, timeframe_trend_id=timeframe_id)
+    provider = SimulatedConnectionProvider(exchange, pool_size=pool_size, max_overflow=pool_size,
+                                           query_latency=query_latency)
+    return provider, lambda bar: market.publish_bar(ticker_jid, timeframe_id, *bar)
+
+
+# ===== RUN =====
+
+def run_benchmark(strategy_class, count, bars, history, ticker, timeframe_id, backend='local',
+                  bar_period=1.0, poll=False, interval=0.5, workers=10, control_interval=1.0,
+                  query_latency=0.0, verbose=False):
+    """
+    One load test: count strategies, one replayed bar every bar_period seconds.
+
+    Args:
+        strategy_class: StrategyBase subclass hosted count times
+        count: Number of strategy instances (config IDs 1..count)
+        bars: (bar_time, open, high, low, close) rows replayed during the run
+        history: Rows loaded before the strategies start
+        ticker: Ticker of the bars
+        timeframe_id: Timeframe of the bars and the strategies' signal timeframe
+        backend: 'local' (LocalDatabase) or 'simulated' (SimulatedExchange)
+        bar_period: Wall-clock seconds between replayed bars
+        poll: Run strategy bodies every interval instead of on new bars
+        interval: Timer interval in poll mode
+        workers: Host worker threads (each cycle holds one pooled connection)
+        control_interval: Termination check interval in bar-driven mode
+        query_latency: Simulated round trip per statement ('simulated' backend)
+        verbose: Keep strategy output
+
+    Returns:
+        dict of results
+    """
+    REGISTRY.reset()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+    with output:
+        provider, publish = build_backend(backend, count, ticker, timeframe_id, history,
+                                          pool_size=2 * workers + background_connections(not poll),
+                                          query_latency=query_latency)
+    rss_start = rss_bytes()
+    with output:
+        load_started = time.perf_counter()
+        host = StrategyHost(strategy_class, range(1, count + 1), timer_interval=interval, pool_size=workers,
+                            bar_driven=not poll, control_interval=control_interval,
+                            bar_poll_interval=min(0.1, bar_period / 4), bar_grace=0,
+                            connection_provider=provider)
+        loaded = host.load_strategies()
+        load_seconds = time.perf_counter() - load_started
+    rss_loaded = rss_bytes()
+
+    cpu_started = time.process_time()
+    run_started = time.perf_counter()
+    runner = threading.Thread(target=host.run, name='benchmark-host', daemon=True)
+    with output:
+        runner.start()
+        # First bar after one period so BarClock has its baseline, last bar gets one period to drain
+        next_bar = time.monotonic()
+        for bar in bars:
+            next_bar += bar_period
+            time.sleep(max(0.0, next_bar - time.monotonic()))
+            publish(bar)
+        time.sleep(max(0.0, next_bar + bar_period - time.monotonic()))
+        host.stop()
+        runner.join()
+    elapsed = time.perf_counter() - run_started
+    cpu_seconds = time.process_time() - cpu_started
+    rss_end = rss_bytes()
+
+    metrics = REGISTRY.to_dict()
+    cycles = sum(c['value'] for c in metrics['counters'] if c['name'] == 'cycles_total')
+    cycle = _merged('cycle_seconds', metrics)
+    queries = _merged('queries_per_cycle', metrics)
+    signal = _merged('signal_submit_seconds', metrics)
+    pool_wait = _merged('pool_wait_seconds', metrics)
+    db_errors = sum(c['value'] for c in metrics['counters'] if c['name'] == 'db_errors_total')
+
+    # Cycles that were due: one per bar per strategy, or one per interval per strategy when polling
+    due = loaded * (elapsed / interval if poll else len(bars))
+    per_strategy = None
+    if rss_start is not None and rss_loaded is not None and loaded:
+        per_strategy = (rss_loaded - rss_start) / loaded
+
+    return {
+        'strategies': count,
+        'loaded': loaded,
+        'backend': backend,
+        'mode': 'poll' if poll else 'bars',
+        'bars': len(bars),
+        'elapsed_seconds': round(elapsed, 3),
+        'load_seconds': round(load_seconds, 3),
+        'cycles': cycles,
+        'cycles_per_second': round(cycles / elapsed, 2) if elapsed else None,
+        'keep_up': round(min(cycles / due, 1.0), 4) if due else None,
+        'cycles_skipped': host.cycles_skipped,
+        'queries_per_cycle': round(queries['mean'], 2) if queries.get('mean') is not None else None,
+        'cycle_p50_ms': _ms(cycle.get('p50')),
+        'cycle_p99_ms': _ms(cycle.get('p99')),
+        'cycle_max_ms': _ms(cycle.get('max')),
+        'signal_p50_ms': _ms(signal.get('p50')),
+        'signal_p99_ms': _ms(signal.get('p99')),
+        'pool_wait_mean_ms': _ms(pool_wait.get('mean')),
+        'pool_wait_p99_ms': _ms(pool_wait.get('p99')),
+        'pool_wait_max_ms': _ms(pool_wait.get('max')),
+        'db_errors': db_errors,
+        'rss_mb': round(rss_end / 2 ** 20, 1) if rss_end is not None else None,
+        'rss_per_strategy_kb': round(per_strategy / 1024, 1) if per_strategy is not None else None,
+        'cpu_percent': round(100 * cpu_seconds / elapsed, 1) if elapsed else None
+    }
+
+
+def compare(results, baseline):
+    """Print cycles/s and p99 changes against a baseline result file"""
+    previous = {(r['strategies'], r['backend'], r['mode']): r for r in baseline.get('results', [])}
+    for result in results:
+        before = previous.get((result['strategies'], result['backend'], result['mode']))
+        if before is None:
+            continue
+        changes = []
+        for key in ('cycles_per_second', 'keep_up', 'cycle_p99_ms', 'signal_p99_ms', 'rss_per_strategy_kb'):
+            if before.get(key) and result.get(key) is not None:
+                changes.append(f"{key} {before[key]} -> {result[key]} ({100 * (result[key] / before[key] - 1):+.1f}%)")
+        print(f"[Benchmark] N={result['strategies']}: " + ", ".join(changes))
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Load test StrategyHost against a local stand-in database')
+    parser.add_argument('--strategies', type=int, nargs='+', default=[1, 10, 100],
+                        help='Strategy counts to run, one benchmark each')
+    parser.add_argument('--strategy', default='benchmark:SyntheticStrategy',
+                        help='Strategy class as module:ClassName')
+    parser.add_argument('--backend', choices=['local', 'simulated'], default='local',
+                        help='LocalDatabase (SQLite) or the in-memory SimulatedExchange')
+    parser.add_argument('--csv', default=DEFAULT_CSV, help='historicalData CSV to replay')
+    parser.add_argument('--history', type=int, default=300, help='Bars loaded before the run')
+    parser.add_argument('--bars', type=int, default=30, help='Bars replayed during the run')
+    parser.add_argument('--bar-period', type=float, default=1.0, help='Seconds between replayed bars')
+    parser.add_argument('--poll', action='store_true', help='Run strategy bodies every --interval')
+    parser.add_argument('--interval', type=float, default=0.5, help='Timer interval in poll mode')
+    parser.add_argument('--workers', type=int, default=10, help='Host worker threads')
+    parser.add_argument('--query-latency', type=float, default=0.0,
+                        help='Seconds per statement round trip (simulated backend)')
+    parser.add_argument('--output', default=None, help='Write results as JSON to this file')
+    parser.add_argument('--baseline', default=None, help='Earlier --output file to compare with')
+    parser.add_argument('--verbose', action='store_true', help='Keep strategy output')
+    args = parser.parse_args()
+
+    key = csv_series(os.path.basename(args.csv))
+    if key is None:
+        print(f"[Benchmark] Cannot tell ticker/timeframe from {args.csv}")
+        sys.exit(1)
+    ticker, timeframe_id = key
+    rows = read_csv_bars(args.csv)
+    if len(rows) < args.history + args.bars:
+        print(f"[Benchmark] {args.csv} has {len(rows)} bars, need {args.history + args.bars}")
+        sys.exit(1)
+    rows = rows[-(args.history + args.bars):]
+    history, bars = rows[:args.history], rows[args.history:]
+
+    strategy_class = load_strategy_class(args.strategy)
+    print(f"[Benchmark] {strategy_class.__name__} on {args.backend}, {ticker} timeframe {timeframe_id}, "
+          f"{args.bars} bars every {args.bar_period}s")
+
+    results = []
+    for count in args.strategies:
+        result = run_benchmark(strategy_class, count, bars, history, ticker, timeframe_id,
+                               backend=args.backend, bar_period=args.bar_period, poll=args.poll,
+                               interval=args.interval, workers=args.workers,
+                               query_latency=args.query_latency, verbose=args.verbose)
+        results.append(result)
+        print(f"[Benchmark] N={count}: {result['cycles_per_second']} cycles/s, keep-up {result['keep_up']}, "
+              f"{result['queries_per_cycle']} queries/cycle, cycle p50/p99 "
+              f"{result['cycle_p50_ms']}/{result['cycle_p99_ms']} ms, pool wait p99 {result['pool_wait_p99_ms']} ms, "
+              f"{result['rss_per_strategy_kb']} KB/strategy, CPU {result['cpu_percent']}%")
+
+    report = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'arguments': vars(args),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[Benchmark] Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
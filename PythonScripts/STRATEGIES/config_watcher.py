@@ -0,0 +1,124 @@
+"""
+Config Watcher - detects algo.ConfigurationSets changes of running strategies.
+
+One query per poll for every watched config, reading the persisted
+SHA2_256 column instead of hashing NVARCHAR(MAX) JSON on every poll:
+
+    SELECT Id, ParameterValuesHash FROM algo.ConfigurationSets WHERE Id IN (...)
+
+A config whose hash differs from the last poll is reported to on_change;
+the strategy then reloads its parameters between cycles (request_reload).
+The first poll after register() only records the baseline.
+"""
+
+import threading
+
+
+class ConfigWatcher:
+    """Batched change detection of strategy configurations"""
+
+    # One parameter per config ID, SQL Server allows 2100 per statement
+    MAX_IDS_PER_QUERY = 2000
+
+    def __init__(self, connection_provider, on_change=None, interval=30.0):
+        """
+        Args:
+            connection_provider: ConnectionProvider to borrow a connection from for each poll
+            on_change: Called with the configid of every changed configuration
+            interval: Seconds between polls when started as a thread
+        """
+        self.connection_provider = connection_provider
+        self.on_change = on_change
+        self.interval = interval
+
+        self._hashes = {}  # configid -> last ParameterValuesHash (bytes), None until the first poll
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.polls = 0
+        self.changes = 0
+
+    def register(self, configid):
+        with self._lock:
+            self._hashes.setdefault(configid, None)
+
+    def unregister(self, configid):
+        with self._lock:
+            self._hashes.pop(configid, None)
+
+    def poll(self):
+        """One query for all watched configs; returns configids whose parameters changed"""
+        with self._lock:
+            configids = list(self._hashes)
+        if not configids:
+            return []
+
+        hashes = {}
+        conn = self.connection_provider.get_connection(autocommit=True)
+        try:
+            cursor = conn.cursor()
+            for start in range(0, len(configids), self.MAX_IDS_PER_QUERY):
+                chunk = configids[start:start + self.MAX_IDS_PER_QUERY]
+                placeholders = ", ".join(["?"] * len(chunk))
+                cursor.execute(f"""
+                    SELECT Id, ParameterValuesHash
+                    FROM algo.ConfigurationSets
+                    WHERE Id IN ({placeholders})
+                """, chunk)
+                hashes.update((int(configid), bytes(value) if value is not None else None)
+                              for configid, value in cursor.fetchall())
+            cursor.close()
+        finally:
+            self.connection_provider.return_connection(conn)
+
+        changed = []
+        with self._lock:
+            for configid, value in hashes.items():
+                if configid not in self._hashes:
+                    continue  # unregistered during the query
+                previous = self._hashes[configid]
+                self._hashes[configid] = value
+                if previous is not None and previous != value:
+                    changed.append(configid)
+            self.polls += 1
+            self.changes += len(changed)
+
+        for configid in changed:
+            print(f"[ConfigWatcher] Configuration {configid} changed")
+            if self.on_change is not None:
+                try:
+                    self.on_change(configid)
+                except Exception as e:
+                    print(f"[ConfigWatcher] Change handler error for {configid}: {e}")
+        return changed
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"[ConfigWatcher] Poll error: {e}")
+
+    def start(self):
+        """Record the baseline now and poll every interval seconds in the background"""
+        if self._thread is not None:
+            return self
+        try:
+            self.poll()
+        except Exception as e:
+            print(f"[ConfigWatcher] Poll error: {e}")
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='config-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def get_stats(self):
+        with self._lock:
+            return {'watched': len(self._hashes), 'polls': self.polls, 'changes': self.changes}
@@ -0,0 +1,389 @@
+"""
+Control Channel - push commands (terminate / suspend / reload) to running
+strategy processes over a local socket.
+
+Each StrategyHost or standalone strategy started with a control port runs a
+ControlServer on 127.0.0.1 (or a Unix domain socket) and announces itself in
+the control directory with the config IDs it runs. The CLI, or the dispatcher
+that watches algo.strategy_termination_queue once for the whole box, finds
+the process for a config ID and pushes the command. Termination is still
+confirmed through the database (sp_TerminateInstance / the queue view), so
+the processes only poll the queue as a slow safety fallback.
+
+Protocol: one JSON object per line each way.
+    {"command": "terminate", "config_id": 3, "token": "..."}
+    {"ok": true, ...}
+
+Every TCP server requires a token: one is generated when none is given and
+stored in its announcement file, which only the owner can read, so the CLI
+and dispatcher of the same user pick it up. A Unix domain socket is created
+with 0600 permissions and may run without a token.
+
+Usage:
+    python control_channel.py list
+    python control_channel.py terminate --config-id 3
+    python control_channel.py suspend --config-id 3
+    python control_channel.py reload --config-id 3
+    python control_channel.py dispatch --interval 1.0
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import secrets
+import tempfile
+import threading
+import socketserver
+
+CONTROL_DIR = os.getenv('ANFUND_CONTROL_DIR') or os.path.join(tempfile.gettempdir(), 'anfund_control')
+COMMANDS = ('ping', 'status', 'terminate', 'suspend', 'reload')
+MAX_MESSAGE = 64 * 1024
+
+
+class ControlError(Exception):
+    """Command could not be delivered or was rejected"""
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline(MAX_MESSAGE + 1)
+            if not line or len(line) > MAX_MESSAGE:
+                break
+            response = self.server.control.dispatch(line)
+            self.wfile.write((json.dumps(response, default=str) + "\n").encode())
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = os.name != 'nt'  # SO_REUSEADDR lets other processes share the port on Windows
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def server_bind(self):
+            # created 0600: only the owner can connect, which is the socket's authentication
+            umask = os.umask(0o177)
+            try:
+                super().server_bind()
+            finally:
+                os.umask(umask)
+
+
+class ControlServer:
+    """Local command listener of one strategy process"""
+
+    def __init__(self, name, config_ids=(), port=0, path=None, token=None, control_dir=CONTROL_DIR):
+        """
+        Args:
+            name: Process label in the control directory (e.g. 'host', 'mtf_rsi_ema_v3')
+            config_ids: Config IDs served, used by the CLI to find this process
+            port: TCP port on 127.0.0.1 (0 picks a free one); ignored when path is given
+            path: Unix domain socket path instead of TCP
+            token: Shared secret every command must carry (generated for TCP when omitted;
+                optional on a Unix socket)
+            control_dir: Directory of announcement files (None disables announcing)
+        """
+        if path is None and token is None:
+            token = secrets.token_hex(32)
+        self.name = name
+        self.config_ids = list(config_ids)
+        self.token = token
+        self.control_dir = control_dir
+        self._handlers = {'ping': self._ping}
+        self._announcement = None
+        self._thread = None
+
+        if path is not None:
+            if os.path.exists(path):
+                os.unlink(path)
+            self._server = _UnixServer(path, _Handler)
+            self.address = {'path': path}
+        else:
+            self._server = _TCPServer(('127.0.0.1', port), _Handler)
+            self.address = {'host': '127.0.0.1', 'port': self._server.server_address[1]}
+        self._server.control = self
+
+        self.commands_received = 0
+        self.commands_failed = 0
+
+    def register(self, command, handler):
+        """handler(config_id, message) -> dict merged into the reply"""
+        self._handlers[command] = handler
+
+    def _ping(self, config_id, message):
+        return {'pid': os.getpid(), 'name': self.name, 'config_ids': self.config_ids}
+
+    def dispatch(self, line):
+        """Decode, authorise and run one command; returns the reply"""
+        try:
+            message = json.loads(line)
+            command = message.get('command')
+        except (ValueError, AttributeError):
+            return {'ok': False, 'error': 'invalid message'}
+
+        if self.token is not None and message.get('token') != self.token:
+            return {'ok': False, 'error': 'unauthorized'}
+        handler = self._handlers.get(command)
+        if handler is None:
+            return {'ok': False, 'error': f'unsupported command: {command}'}
+
+        self.commands_received += 1
+        config_id = message.get('config_id')
+        try:
+            result = handler(int(config_id) if config_id is not None else None, message) or {}
+            return dict({'ok': True}, **result)
+        except Exception as e:
+            self.commands_failed += 1
+            print(f"[Control] {command} failed: {e}")
+            return {'ok': False, 'error': str(e)}
+
+    def set_config_ids(self, config_ids):
+        """Update the announced config IDs"""
+        self.config_ids = list(config_ids)
+        self._announce()
+
+    def _announce(self):
+        if self.control_dir is None:
+            return
+        os.makedirs(self.control_dir, mode=0o700, exist_ok=True)
+        path = os.path.join(self.control_dir, f"{self.name}-{os.getpid()}.json")
+        temp = path + '.tmp'
+        if os.path.exists(temp):
+            os.remove(temp)
+        # owner-only: the file carries the token
+        with os.fdopen(os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'w') as f:
+            json.dump({'name': self.name, 'pid': os.getpid(), 'config_ids': self.config_ids,
+                       'address': self.address, 'token': self.token}, f)
+        os.replace(temp, path)
+        self._announcement = path
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, name='control-server', daemon=True)
+            self._thread.start()
+            self._announce()
+            print(f"[Control] Listening on {self.address}")
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._server.server_close()
+        if 'path' in self.address and os.path.exists(self.address['path']):
+            os.unlink(self.address['path'])
+        if self._announcement and os.path.exists(self._announcement):
+            os.remove(self._announcement)
+            self._announcement = None
+
+    def get_stats(self):
+        return {'commands_received': self.commands_received, 'commands_failed': self.commands_failed}
+
+
+# ===== CLIENT =====
+
+def send_command(address, command, config_id=None, token=None, timeout=2.0, **fields):
+    """
+    Send one command and wait for the reply.
+
+    Args:
+        address: {'host', 'port'} or {'path'} as announced by ControlServer
+        command: One of COMMANDS
+        config_id: Target config (optional for ping/status)
+        token: Shared secret of the server (required for TCP servers)
+        timeout: Seconds to connect and to wait for the reply
+    """
+    message = dict(fields, command=command, config_id=config_id)
+    if token is not None:
+        message['token'] = token
+
+    if 'path' in address:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        target = address['path']
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        target = (address.get('host', '127.0.0.1'), int(address['port']))
+    sock.settimeout(timeout)
+    try:
+        sock.connect(target)
+        sock.sendall((json.dumps(message) + "\n").encode())
+        with sock.makefile('rb') as reader:
+            line = reader.readline(MAX_MESSAGE)
+    except OSError as e:
+        raise ControlError(f"{address}: {e}")
+    finally:
+        sock.close()
+    if not line:
+        raise ControlError(f"{address}: no reply")
+    return json.loads(line)
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        # os.kill() terminates the process on Windows; a stale entry just fails to connect
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def list_servers(control_dir=CONTROL_DIR):
+    """Announced control servers of live processes (unreadable announcements of other users are skipped)"""
+    servers = []
+    if not os.path.isdir(control_dir):
+        return servers
+    for file_name in sorted(os.listdir(control_dir)):
+        if not file_name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(control_dir, file_name)) as f:
+                server = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if _pid_alive(server.get('pid', 0)):
+            servers.append(server)
+    return servers
+
+
+def push(command, config_id, token=None, control_dir=CONTROL_DIR, timeout=2.0):
+    """
+    Deliver a command to every announced process running config_id; returns the replies.
+    Without token each server gets the token of its announcement.
+    """
+    replies = []
+    for server in list_servers(control_dir):
+        if config_id is not None and config_id not in server.get('config_ids', []):
+            continue
+        server_token = token if token is not None else server.get('token')
+        try:
+            replies.append(send_command(server['address'], command, config_id, token=server_token,
+                                        timeout=timeout))
+        except ControlError as e:
+            replies.append({'ok': False, 'error': str(e)})
+    return replies
+
+
+def request_termination(config_id, connection_provider=None):
+    """Queue the termination in the database (algo.sp_RequestStrategyTermination)"""
+    from ANFramework import DatabaseHelper
+
+    db = DatabaseHelper(connection_provider)
+    with db.lease(autocommit=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute("EXEC algo.sp_RequestStrategyTermination @config_id = ?", config_id)
+        cursor.close()
+
+
+class TerminationDispatcher:
+    """One queue poll for the whole box; new rows are pushed to the owning process"""
+
+    def __init__(self, connection_provider=None, interval=1.0, token=None, control_dir=CONTROL_DIR):
+        from ANFramework import DatabaseHelper
+
+        self.db = DatabaseHelper(connection_provider)
+        self.interval = interval
+        self.token = token
+        self.control_dir = control_dir
+        self._sent = set()  # termination_ids already pushed
+        self._stop_event = threading.Event()
+        self.pushed = 0
+
+    def poll(self):
+        """Push terminate for queue rows not pushed yet; returns how many were delivered"""
+        with self.db.lease(autocommit=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT config_id, termination_id, requested_at FROM algo.strategy_termination_queue_v")
+            rows = cursor.fetchall()
+            cursor.close()
+
+        pending = {termination_id for _, termination_id, _ in rows}
+        self._sent &= pending  # completed rows leave the view
+        delivered = 0
+        for config_id, termination_id, _ in rows:
+            if termination_id in self._sent:
+                continue
+            replies = push('terminate', config_id, token=self.token, control_dir=self.control_dir)
+            if any(reply.get('ok') for reply in replies):
+                self._sent.add(termination_id)
+                delivered += 1
+                print(f"[Dispatcher] Terminate pushed for config {config_id} (termination {termination_id})")
+        self.pushed += delivered
+        return delivered
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"[Dispatcher] Poll error: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Send control commands to running strategies')
+    parser.add_argument('command', choices=['list', 'dispatch'] + list(COMMANDS))
+    parser.add_argument('--config-id', type=int, default=None, help='Target configuration ID')
+    parser.add_argument('--address', default=None, help='host:port or socket path instead of discovery')
+    parser.add_argument('--token', default=os.getenv('ANFUND_CONTROL_TOKEN'), help='Shared secret')
+    parser.add_argument('--no-queue', action='store_true',
+                        help='terminate: push only, do not queue in algo.strategy_termination_queue')
+    parser.add_argument('--interval', type=float, default=1.0, help='dispatch: queue poll interval')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for server in list_servers():
+            print(f"{server['name']} pid={server['pid']} configs={server['config_ids']} {server['address']}")
+        return
+
+    if args.command == 'dispatch':
+        dispatcher = TerminationDispatcher(interval=args.interval, token=args.token)
+        try:
+            dispatcher.run()
+        except KeyboardInterrupt:
+            dispatcher.stop()
+        return
+
+    if args.command in ('terminate', 'suspend', 'reload') and args.config_id is None:
+        print(f"--config-id is required for {args.command}")
+        sys.exit(1)
+
+    if args.command == 'terminate' and not args.no_queue:
+        request_termination(args.config_id)
+
+    started = time.perf_counter()
+    if args.address:
+        address = {'path': args.address} if ':' not in args.address else \
+            {'host': args.address.rsplit(':', 1)[0], 'port': int(args.address.rsplit(':', 1)[1])}
+        token = args.token
+        if token is None:
+            token = next((server.get('token') for server in list_servers() if server['address'] == address), None)
+        replies = [send_command(address, args.command, args.config_id, token=token)]
+    else:
+        replies = push(args.command, args.config_id, token=args.token)
+
+    if not replies:
+        print(f"No running process serves config {args.config_id}")
+        sys.exit(1)
+    for reply in replies:
+        print(json.dumps(reply, default=str))
+    print(f"[Control] {len(replies)} repl{'y' if len(replies) == 1 else 'ies'} in "
+          f"{(time.perf_counter() - started) * 1000:.1f} ms")
+    sys.exit(0 if all(reply.get('ok') for reply in replies) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Emulated DB - pyodbc-like connections over an in-process statement engine.
+
+The paper-trading stand-in (simulated_provider) and the SQLite stand-in
+(local_db) share everything between the framework and their engine: cursor,
+connection, pooled provider, the SQL Server helpers they imitate
+(GETUTCDATE, BINARY_CHECKSUM, HASHBYTES, fn_GetStrategyConfiguration column
+types) and the checks of trd.sp_CreateSignal / algo.sp_TerminateInstance.
+An engine only implements
+
+    execute(sql, params) -> list of result sets
+
+where a result set is (columns, rows), or a bare list of row tuples when the
+statement's columns are not needed (cursor.description stays None). An
+engine may also implement executemany(sql, seq_of_params); otherwise every
+parameter set is executed on its own.
+
+Usage:
+    provider = EmulatedConnectionProvider(engine, pool_size=10)
+    helper = DatabaseHelper(provider)
+"""
+
+import time
+import zlib
+import hashlib
+from collections import deque, namedtuple
+from datetime import datetime, timezone, time as dt_time
+from decimal import Decimal
+
+from ANFramework import PooledConnectionProvider
+
+SIGNAL_TYPES = ('BUY', 'SELL', 'DROP')  # algo.strategySignalType
+
+
+class EmulationError(Exception):
+    """Statement an engine cannot answer, or a THROW of an emulated procedure"""
+
+
+# ===== SQL SERVER HELPERS =====
+
+def utcnow():
+    """GETUTCDATE(): naive UTC"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def binary_checksum(*values):
+    """Stable signed 32-bit stand-in for BINARY_CHECKSUM"""
+    value = zlib.crc32("|".join(str(v) for v in values).encode())
+    return value - (1 << 32) if value >= (1 << 31) else value
+
+
+def parameter_values_hash(json_text):
+    """algo.ConfigurationSets.ParameterValuesHash: HASHBYTES('SHA2_256') of the NVARCHAR (UTF-16LE) JSON"""
+    return hashlib.sha256(json_text.encode('utf-16-le')).digest()
+
+
+def configuration_result(config):
+    """
+    algo.fn_GetStrategyConfiguration result set for a configuration dict with
+    configID: config_id first, TIME trading window and DECIMAL(18, 4) volume
+    like the real function.
+    """
+    config = dict(config)
+    config = dict(config_id=config.pop('configID'), **config)
+    for key in ('trading_close_utc', 'trading_start_utc'):
+        if isinstance(config.get(key), str):
+            config[key] = dt_time.fromisoformat(config[key])
+    if config.get('open_volume') is not None:
+        config['open_volume'] = Decimal(str(config['open_volume'])).quantize(Decimal('0.0001'))
+    return tuple(config), [tuple(config.values())]
+
+
+# ===== PROCEDURE CHECKS =====
+
+def check_signal(ticker, direction, volume, trade_id, trade_type, find_trade, find_symbol):
+    """
+    trd.sp_CreateSignal argument checks, in the procedure's order and with its messages.
+
+    find_trade(trade_id, trade_type) and find_symbol(ticker) return None when
+    the trade / symbol mapping does not exist.
+
+    Returns (DIRECTION, trade, symbol); trade is None unless dropping.
+    """
+    if ticker is None or volume is None or direction is None:
+        raise EmulationError('Required parameter is null.')
+    direction = str(direction).upper()
+    if direction not in SIGNAL_TYPES:
+        raise EmulationError('Invalid direction. Must be BUY, SELL, or DROP')
+
+    trade = None
+    if direction == 'DROP':
+        if trade_id is None or trade_type is None:
+            raise EmulationError('Instrument to drop is not provided')
+        trade = find_trade(trade_id, trade_type)
+        if trade is None:
+            raise EmulationError('Trade not found for drop operation')
+
+    symbol = find_symbol(ticker)
+    if symbol is None:
+        raise EmulationError('Symbol mapping not found')
+    return direction, trade, symbol
+
+
+def terminate_instance(guid, is_requested, terminate):
+    """
+    algo.sp_TerminateInstance: if is_requested(GUID) finds an open termination
+    request, terminate(GUID, now) marks it done, closes the instance and logs
+    the termination event. Returns the should_terminate flag (1/0).
+    """
+    guid = str(guid).upper()
+    if not is_requested(guid):
+        return 0
+    terminate(guid, utcnow())
+    return 1
+
+
+# ===== CONNECTIONS =====
+
+_row_types = {}
+
+
+def _row_type(columns):
+    """Row class with attribute access like pyodbc.Row"""
+    row_type = _row_types.get(columns)
+    if row_type is None:
+        row_type = _row_types[columns] = namedtuple('Row', columns, rename=True)
+    return row_type
+
+
+def _params(args):
+    """pyodbc accepts execute(sql, a, b) and execute(sql, (a, b))"""
+    if len(args) == 1 and isinstance(args[0], (list, tuple)):
+        return list(args[0])
+    return list(args)
+
+
+class EmulatedCursor:
+    """pyodbc-like cursor over engine result sets"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.fast_executemany = False
+        self.description = None
+        self.rowcount = -1
+        self._result_sets = []
+        self._rows = None
+
+    def _next_result_set(self):
+        if not self._result_sets:
+            self._rows, self.description = None, None
+            return None
+        result_set = self._result_sets.pop(0)
+        if isinstance(result_set, tuple):
+            columns, rows = result_set
+            row_type = _row_type(tuple(columns))
+            self._rows = deque(row_type(*row) for row in rows)
+            self.description = [(column, None, None, None, None, None, True) for column in columns]
+        else:
+            self._rows = deque(result_set)
+            self.description = None
+        self.rowcount = len(self._rows)
+        return True
+
+    def execute(self, sql, *args):
+        self._result_sets = list(self.connection._run(sql, _params(args)))
+        self.rowcount = -1
+        self._next_result_set()
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = [list(params) for params in seq_of_params]
+        self.connection._run_many(sql, seq_of_params)
+        self._result_sets = []
+        self._next_result_set()
+        self.rowcount = len(seq_of_params)
+        return self
+
+    def _current(self):
+        if self._rows is None:
+            raise EmulationError("No results. Previous SQL was not a query.")
+        return self._rows
+
+    def fetchone(self):
+        rows = self._current()
+        return rows.popleft() if rows else None
+
+    def fetchall(self):
+        rows = self._current()
+        result = list(rows)
+        rows.clear()
+        return result
+
+    def fetchmany(self, size=1):
+        rows = self._current()
+        return [rows.popleft() for _ in range(min(size, len(rows)))]
+
+    def fetchval(self):
+        row = self.fetchone()
+        return row[0] if row else None
+
+    def nextset(self):
+        return self._next_result_set()
+
+    def close(self):
+        self._result_sets = []
+        self._rows = None
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+
+class EmulatedConnection:
+    """pyodbc-like connection to an engine; commit/rollback do nothing"""
+
+    def __init__(self, engine, query_latency=0.0):
+        self.engine = engine
+        self.query_latency = query_latency
+        self.autocommit = False
+        self.closed = False
+
+    def _check(self):
+        if self.closed:
+            raise EmulationError("Attempt to use a closed connection.")
+
+    def _run(self, sql, params):
+        self._check()
+        if self.query_latency:
+            time.sleep(self.query_latency)  # network round trip
+        return self.engine.execute(sql, params)
+
+    def _run_many(self, sql, seq_of_params):
+        executemany = getattr(self.engine, 'executemany', None)
+        if executemany is None:
+            for params in seq_of_params:
+                self._run(sql, params)
+            return
+        self._check()
+        if self.query_latency:
+            time.sleep(self.query_latency)
+        executemany(sql, seq_of_params)
+
+    def cursor(self):
+        return EmulatedCursor(self)
+
+    def execute(self, sql, *args):
+        return self.cursor().execute(sql, *args)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class EmulatedConnectionProvider(PooledConnectionProvider):
+    """PooledConnectionProvider over emulated connections: pooling, waits and metrics work as in production"""
+
+    def __init__(self, engine, pool_size=20, max_overflow=10, acquire_timeout=30.0, query_latency=0.0,
+                 name='EMULATED'):
+        """
+        Args:
+            engine: Object with execute(sql, params) shared by all connections
+            pool_size: Number of persistent connections
+            max_overflow: Additional connections if pool exhausted
+            acquire_timeout: Seconds to wait for a free connection before RuntimeError
+            query_latency: Seconds added to every statement, emulating the network round trip
+            name: Stands in for the connection string in pool messages
+        """
+        self.engine = engine
+        self.query_latency = query_latency
+        super().__init__(pool_size=pool_size, max_overflow=max_overflow, acquire_timeout=acquire_timeout,
+                         health_check_interval=0, connection_string=name)
+
+    def _connect(self):
+        return EmulatedConnection(self.engine, self.query_latency)
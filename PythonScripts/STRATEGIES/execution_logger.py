@@ -0,0 +1,462 @@
+"""
+Execution Logger - write-behind queue for logs.strategyExecution and
+algo.sp_UpdateStrategyState.
+
+Strategies enqueue events in memory; a background worker writes them in
+batches. Rows carry the client-side signalTimeUTC, so the timing of a signal
+does not depend on when the batch reaches the database. Batches that cannot be
+written are appended to a JSONL spill file and replayed on their own, in a
+separate transaction from new rows. A batch the server rejects is retried
+one row at a time; rows rejected on their own go to a dead-letter file
+instead of being replayed forever.
+"""
+
+import os
+import json
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import pytz
+
+
+def trade_uuid_or_none(value):
+    """trade_uuid is a UNIQUEIDENTIFIER column; anything else (e.g. a position ID) would reject the row"""
+    if value is None:
+        return None
+    try:
+        return str(uuid.UUID(str(value))).upper()
+    except ValueError:
+        return None
+
+
+class LogEvent:
+    """Handle of one queued logs.strategyExecution row"""
+
+    __slots__ = ('config_id', 'signal_type', 'event_type', 'volume', 'price',
+                 'trade_uuid', 'signal_time', 'sealed')
+
+    def __init__(self, config_id, signal_type=None, event_type=None, volume=None,
+                 price=None, trade_uuid=None, signal_time=None):
+        self.config_id = config_id
+        self.signal_type = signal_type
+        self.event_type = event_type
+        self.volume = volume
+        self.price = price
+        self.trade_uuid = trade_uuid
+        # Naive UTC, same as GETUTCDATE() default of signalTimeUTC
+        self.signal_time = signal_time or datetime.now(pytz.UTC).replace(tzinfo=None)
+        self.sealed = False  # picked up by the worker, no longer mutable in memory
+
+    def to_dict(self):
+        return {'op': 'execution', 'config_id': self.config_id, 'signal_type': self.signal_type,
+                'event_type': self.event_type, 'volume': self.volume, 'price': self.price,
+                'trade_uuid': self.trade_uuid, 'signal_time': self.signal_time.isoformat()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['config_id'], data.get('signal_type'), data.get('event_type'),
+                   data.get('volume'), data.get('price'), data.get('trade_uuid'),
+                   datetime.fromisoformat(data['signal_time']))
+
+    def __repr__(self):
+        return (f"LogEvent({self.config_id}, {self.signal_type or self.event_type}, "
+                f"{self.signal_time.strftime('%H:%M:%S.%f')})")
+
+
+class ExecutionLogger:
+    """Bounded write-behind logger shared by all strategies of a process"""
+
+    STATES = ('start', 'heartbeat', 'stop', 'terminated')
+
+    def __init__(self, connection_provider, max_queue=10000, batch_size=500,
+                 flush_interval=0.5, put_timeout=0.05, spill_path=None, spill_retry_interval=30.0,
+                 dead_letter_path=None):
+        """
+        Args:
+            connection_provider: Object with get_connection()/return_connection()
+            max_queue: Queue capacity; producers wait up to put_timeout when full, then spill
+            batch_size: Maximum operations written per transaction
+            flush_interval: Seconds the worker waits for more events before flushing
+            put_timeout: Backpressure limit for producers (seconds)
+            spill_path: JSONL file for events that could not be written
+            spill_retry_interval: Seconds between replay attempts while idle
+            dead_letter_path: JSONL file for rows the database rejected on their own
+        """
+        self.connection_provider = connection_provider
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.spill_path = spill_path or os.path.join(os.getcwd(), 'execution_log_spill.jsonl')
+        self.spill_retry_interval = spill_retry_interval
+        self.dead_letter_path = dead_letter_path or os.path.join(os.getcwd(), 'execution_log_dead.jsonl')
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._heartbeats = {}  # config_id -> True, coalesced until the next flush
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._worker = None
+        self._next_spill_retry = 0.0
+
+        self._signal_type_ids = None  # TypeName -> ID
+        self._event_type_ids = None  # eventTypeName -> ID
+
+        self.enqueued = 0
+        self.written = 0
+        self.spilled = 0
+        self.rejected = 0
+        self.dead_lettered = 0
+        self.failed_flushes = 0
+
+    # ===== PRODUCER API =====
+
+    def log_execution(self, config_id, signal_type=None, volume=None, price=None,
+                      trade_uuid=None, event_type=None):
+        """Queue a logs.strategyExecution row; returns a LogEvent handle"""
+        event = LogEvent(config_id, signal_type=signal_type, event_type=event_type,
+                         volume=volume, price=price, trade_uuid=trade_uuid_or_none(trade_uuid))
+        self._enqueue(event)
+        return event
+
+    def set_trade_uuid(self, event, trade_uuid):
+        """Attach the confirmed position UUID to a previously logged event"""
+        trade_uuid = trade_uuid_or_none(trade_uuid)
+        if trade_uuid is None:
+            return
+        with self._lock:
+            if not event.sealed:
+                event.trade_uuid = trade_uuid
+                return
+        # Already taken by the worker: update by (configID, signalTimeUTC)
+        self._enqueue({'op': 'uuid', 'config_id': event.config_id,
+                       'signal_time': event.signal_time.isoformat(), 'trade_uuid': trade_uuid})
+
+    def update_state(self, config_id, state):
+        """Queue algo.sp_UpdateStrategyState; heartbeats are coalesced per config"""
+        if state not in self.STATES:
+            raise ValueError(f"Invalid state: {state}")
+        if state == 'heartbeat':
+            with self._lock:
+                self._heartbeats[config_id] = True
+            return
+        self._enqueue({'op': 'state', 'config_id': config_id, 'state': state})
+
+    def _enqueue(self, op):
+        try:
+            self._queue.put(op, timeout=self.put_timeout)
+            self.enqueued += 1
+        except queue.Full:
+            # Backpressure exhausted: keep the event on disk instead of blocking the caller
+            self._spill([op])
+
+    # ===== WORKER =====
+
+    def start(self):
+        """Start the background writer"""
+        if self._worker is not None:
+            return self
+        self._stop_event.clear()
+        self._worker = threading.Thread(target=self._run, name='execution-logger', daemon=True)
+        self._worker.start()
+        return self
+
+    def _run(self):
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            ops = self._drain(self.flush_interval)
+            with self._lock:
+                has_heartbeats = bool(self._heartbeats)
+
+            retry_spill = (os.path.exists(self.spill_path)
+                           and time.monotonic() >= self._next_spill_retry)
+            if ops or has_heartbeats or retry_spill:
+                self._flush(ops)
+
+        # Coalesced heartbeats queued after the last batch
+        self._flush([])
+
+    def _drain(self, wait):
+        """Take up to batch_size operations, waiting at most `wait` for the first one"""
+        ops = []
+        try:
+            ops.append(self._queue.get(timeout=wait) if wait else self._queue.get_nowait())
+            while len(ops) < self.batch_size:
+                ops.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            for op in ops:
+                if isinstance(op, LogEvent):
+                    op.sealed = True
+        return ops
+
+    def flush(self):
+        """Write everything queued so far from the calling thread"""
+        while True:
+            ops = self._drain(0)
+            self._flush(ops)
+            if not ops or self._queue.empty():
+                break
+
+    def _flush(self, ops):
+        with self._lock:
+            heartbeats, self._heartbeats = self._heartbeats, {}
+
+        records = [op if isinstance(op, dict) else op.to_dict() for op in ops]
+        records += [{'op': 'state', 'config_id': config_id, 'state': 'heartbeat'} for config_id in heartbeats]
+
+        if records:
+            try:
+                written, pending, dead = self._write_records(records)
+            except Exception as e:
+                written, pending, dead = 0, records, []
+                print(f"[ExecutionLogger] Flush failed: {e}")
+            self.written += written
+            self._dead_letter(dead)
+            if pending:
+                self.failed_flushes += 1
+                self._next_spill_retry = time.monotonic() + self.spill_retry_interval
+                print(f"[ExecutionLogger] Database unavailable, spilling {len(pending)} record(s)")
+                self._spill(pending)
+                return
+
+        # Spilled records go in their own transaction, so they cannot hold back new rows
+        if os.path.exists(self.spill_path) and (records or time.monotonic() >= self._next_spill_retry):
+            try:
+                self._replay_spill()
+            except Exception as e:
+                self.failed_flushes += 1
+                self._next_spill_retry = time.monotonic() + self.spill_retry_interval
+                print(f"[ExecutionLogger] Spill replay failed: {e}")
+
+    def _replay_spill(self):
+        with self._spill_lock:
+            replay, consumed, corrupt = self._read_spill()
+        if not consumed:
+            return
+
+        written, pending, dead = self._write_records(replay) if replay else (0, [], [])
+        with self._spill_lock:
+            self._truncate_spill(consumed)
+        self.written += written
+        self._dead_letter(dead + corrupt)
+        if pending:
+            # Database went away during the replay: back to the spill file
+            self._next_spill_retry = time.monotonic() + self.spill_retry_interval
+            self._spill(pending)
+        print(f"[ExecutionLogger] Replayed {written} spilled record(s)"
+              + (f", {len(dead) + len(corrupt)} dead-lettered" if dead or corrupt else ""))
+
+    def _write_records(self, records):
+        """
+        Write records in one transaction; if the server rejects the batch, retry
+        them one row per transaction.
+
+        Returns (written, pending, dead): pending rows were not tried because the
+        database stopped answering, dead are (record, error) rejected on their own.
+        Raises when no connection can be obtained.
+        """
+        conn = self.connection_provider.get_connection()
+        try:
+            try:
+                self._write(conn, records)
+                conn.commit()
+                return len(records), [], []
+            except Exception as e:
+                self._rollback(conn)
+                print(f"[ExecutionLogger] Batch of {len(records)} rejected, retrying row by row: {e}")
+
+            written, dead = 0, []
+            for index, record in enumerate(records):
+                try:
+                    self._write(conn, [record])
+                    conn.commit()
+                    written += 1
+                except Exception as e:
+                    self._rollback(conn)
+                    if not self._alive(conn):
+                        return written, records[index:], dead
+                    dead.append((record, str(e)))
+            return written, [], dead
+        finally:
+            self.connection_provider.return_connection(conn)
+
+    @staticmethod
+    def _rollback(conn):
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _alive(conn):
+        """Tell a rejected row from a lost connection"""
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _load_type_ids(self, cursor):
+        cursor.execute("SELECT TypeName, ID FROM algo.strategySignalType")
+        self._signal_type_ids = {str(name).lower(): type_id for name, type_id in cursor.fetchall()}
+        cursor.execute("SELECT eventTypeName, ID FROM algo.strategyEventsType")
+        self._event_type_ids = {str(name).lower(): type_id for name, type_id in cursor.fetchall()}
+
+    def _execution_row(self, record):
+        """Resolve type IDs the same way logs.sp_LogStrategyExecution does"""
+        signal_type = record.get('signal_type')
+        if signal_type is not None:
+            signal_type_id = self._signal_type_ids.get(str(signal_type).lower())
+            event_type_id = self._event_type_ids.get('signal')
+            if signal_type_id is None:
+                return None
+        else:
+            signal_type_id = None
+            event_type_id = self._event_type_ids.get(str(record.get('event_type')).lower())
+            if event_type_id is None:
+                return None
+
+        return (record['config_id'], signal_type_id, event_type_id, record.get('volume'),
+                record.get('price'), datetime.fromisoformat(record['signal_time']), record.get('trade_uuid'))
+
+    def _write(self, conn, records):
+        cursor = conn.cursor()
+        try:
+            if self._signal_type_ids is None:
+                self._load_type_ids(cursor)
+
+            executions, uuids, states = [], [], []
+            for record in records:
+                op = record['op']
+                if op == 'execution':
+                    row = self._execution_row(record)
+                    if row is None:
+                        # The procedure would THROW for this row, retrying cannot help
+                        self.rejected += 1
+                        print(f"[ExecutionLogger] Invalid signal/event type, dropped: {record}")
+                        continue
+                    executions.append(row)
+                elif op == 'uuid':
+                    uuids.append((record['trade_uuid'], record['config_id'],
+                                  datetime.fromisoformat(record['signal_time'])))
+                elif op == 'state':
+                    states.append((record['config_id'], record['state']))
+
+            if executions:
+                cursor.fast_executemany = True
+                cursor.executemany("""
+                    INSERT INTO logs.strategyExecution
+                        (configID, signalTypeID, EventTypeID, volume, price, signalTimeUTC, trade_uuid)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, executions)
+
+            # After the inserts, so UUIDs of rows from the same batch are found
+            if uuids:
+                cursor.executemany("""
+                    UPDATE logs.strategyExecution
+                    SET trade_uuid = ?
+                    WHERE configID = ? AND signalTimeUTC = ? AND trade_uuid IS NULL
+                """, uuids)
+
+            for config_id, state in states:
+                cursor.execute("EXEC algo.sp_UpdateStrategyState @configID = ?, @currentState = ?",
+                               (config_id, state))
+        finally:
+            cursor.close()
+
+    # ===== SPILL FILE =====
+
+    def _spill(self, records):
+        records = [op if isinstance(op, dict) else op.to_dict() for op in records]
+        if not records:
+            return
+        try:
+            with self._spill_lock:
+                with open(self.spill_path, 'a', encoding='utf-8') as f:
+                    for record in records:
+                        f.write(json.dumps(record) + '\n')
+            self.spilled += len(records)
+        except Exception as e:
+            print(f"[ExecutionLogger] Spill write failed, {len(records)} record(s) lost: {e}")
+
+    def _read_spill(self):
+        """
+        Up to batch_size * 10 spilled records from the head of the file.
+
+        Returns (records, consumed, corrupt): consumed counts the non-empty lines
+        read, corrupt are (line, error) of lines that are not valid JSON.
+        """
+        records, corrupt, consumed = [], [], 0
+        if not os.path.exists(self.spill_path):
+            return records, consumed, corrupt
+        try:
+            with open(self.spill_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    if consumed >= self.batch_size * 10:
+                        break
+                    consumed += 1
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError as e:
+                        corrupt.append((line, str(e)))
+        except Exception as e:
+            print(f"[ExecutionLogger] Spill read failed: {e}")
+            return [], 0, []
+        return records, consumed, corrupt
+
+    def _truncate_spill(self, count):
+        """Drop the first `count` replayed records, keep anything spilled meanwhile"""
+        with open(self.spill_path, 'r', encoding='utf-8') as f:
+            remaining = [line for line in f if line.strip()][count:]
+        if remaining:
+            with open(self.spill_path, 'w', encoding='utf-8') as f:
+                f.writelines(remaining)
+        else:
+            os.remove(self.spill_path)
+
+    def _dead_letter(self, failed):
+        """Keep (record, error) pairs the database will never accept out of the spill file"""
+        if not failed:
+            return
+        try:
+            with self._spill_lock:
+                with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                    for record, error in failed:
+                        f.write(json.dumps({'record': record, 'error': error}, default=str) + '\n')
+            self.dead_lettered += len(failed)
+            print(f"[ExecutionLogger] {len(failed)} rejected record(s) moved to {self.dead_letter_path}")
+        except Exception as e:
+            print(f"[ExecutionLogger] Dead-letter write failed, {len(failed)} record(s) lost: {e}")
+
+    # ===== LIFECYCLE =====
+
+    def close(self, timeout=10.0):
+        """Flush the queue and stop the worker"""
+        self._stop_event.set()
+        if self._worker is not None:
+            self._worker.join(timeout=timeout)
+            self._worker = None
+        else:
+            self.flush()
+
+    def get_stats(self):
+        """Logger statistics"""
+        return {
+            'queued': self._queue.qsize(),
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'spilled': self.spilled,
+            'rejected': self.rejected,
+            'dead_lettered': self.dead_lettered,
+            'failed_flushes': self.failed_flushes
+        }
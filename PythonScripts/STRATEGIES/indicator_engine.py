@@ -0,0 +1,480 @@
+"""
+Indicator Engine - streaming EMA, SMA, RSI, Stochastic, ATR and ADX per
+(TickerJID, timeframeID), updated in place on every closed bar.
+
+Formulas follow the SQL CLR batch functions, so values agree with
+tms.EMA / tms.MA / tms.Indicators_Momentum / tms.MarketRegime_* at the
+column scale:
+    EMA    EMACalculationsBatch: seeded with the first close, k = 2 / (n + 1)
+    SMA    MACalculationsBatch: average of the available closes until n are known
+    RSI    MomentumAllInOneCalculationsBatch: simple averages of the last n changes,
+           50 until n + 1 closes, 100 when there are no losses
+    Stoch  %K over the last 14 bars, 50 until 14 bars or a flat range
+    Flags  Overbought RSI_14 > 70 or %K > 80, Oversold RSI_14 < 30 or %K < 20
+    ATR    MarketRegimeCalculationsBatch: SMA14 of true range, 0 until 14 values
+    ADX    SMA14 of DX from SMA14-smoothed +DM / -DM
+tms.bars holds FLOAT prices, which the CLR converts to decimal (15 significant
+digits) and then computes in decimal. The engine applies the same input
+conversion and compares directional moves in decimal; everything else runs in
+float64 and is rounded to the column scale, where it matches except for
+values within float error of a rounding boundary (last digit off by one).
+
+batch_indicators() computes the snapshot columns over whole OHLC arrays with
+the same formulas and input conversion, for offline replays.
+"""
+
+import math
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from market_snapshot import BarSnapshot, MarketSnapshot
+
+EMA_COLUMNS = {
+    5: 'EMA_5_SHORT', 8: 'EMA_8_SHORT', 9: 'EMA_9_MACD_SIGNAL', 12: 'EMA_12_MACD_FAST',
+    20: 'EMA_20_SHORT', 21: 'EMA_21_FIBO', 26: 'EMA_26_MACD_SLOW', 50: 'EMA_50_MEDIUM',
+    55: 'EMA_55_FIBO', 100: 'EMA_100_LONG', 144: 'EMA_144_FIBO', 200: 'EMA_200_LONG',
+    233: 'EMA_233_FIBO'
+}
+
+SMA_COLUMNS = {
+    5: 'MA5', 8: 'MA8', 20: 'MA20', 30: 'MA30', 50: 'MA50', 100: 'MA100', 200: 'MA200',
+    500: 'MA500', 21: 'MA21_FIB', 55: 'MA55_FIB', 144: 'MA144_FIB', 233: 'MA233_FIB',
+    195: 'MA195_NYSE', 390: 'MA390_NYSE'
+}
+
+RSI_PERIODS = (7, 14, 21)
+STOCH_PERIOD = 14
+ADX_PERIOD = 14
+
+# Decimal places of the target columns
+PRICE_SCALE = 8  # EMA, MA, ATR: decimal(18,8)
+OSCILLATOR_SCALE = 4  # RSI, Stoch, DI, ADX: decimal(8,4)
+
+
+def clr_decimal(value):
+    """double -> decimal the way Convert.ToDecimal(double) does (15 significant digits)"""
+    return Decimal(f"{float(value):.15g}")
+
+
+class BarBuffer:
+    """Fixed-size ring buffer of OHLC bars"""
+
+    OPEN, HIGH, LOW, CLOSE = range(4)
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros((capacity, 4))
+        self.times = np.empty(capacity, dtype=object)
+        self.count = 0  # bars appended since creation
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, bar_time, open_, high, low, close):
+        i = self.count % self.capacity
+        self.data[i] = (open_, high, low, close)
+        self.times[i] = bar_time
+        self.count += 1
+
+    def last(self, n, column=None):
+        """Last n bars in chronological order (n <= len)"""
+        index = np.arange(self.count - n, self.count) % self.capacity
+        return self.data[index] if column is None else self.data[index, column]
+
+    @property
+    def last_time(self):
+        return self.times[(self.count - 1) % self.capacity] if self.count else None
+
+
+class RollingMean:
+    """Moving average over a fixed window; the running sum is rebuilt every full turn to stop float drift"""
+
+    def __init__(self, period, partial=False, exact=False):
+        """
+        Args:
+            period: Window length
+            partial: Average the available values before the window is full
+                (MACalculationsBatch), otherwise 0 until then (SMACache)
+            exact: Correctly rounded sum on every add, for short windows whose
+                zero tests (ATR > 0, +DI + -DI > 0) must not see drift residue
+        """
+        self.period = period
+        self.partial = partial
+        self.exact = exact
+        self.values = np.zeros(period)
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value):
+        i = self.count % self.period
+        if self.count >= self.period:
+            self.sum -= self.values[i]
+        self.values[i] = value
+        self.sum += value
+        self.count += 1
+        if self.exact or i == self.period - 1:
+            self.sum = math.fsum(self.values)
+
+    def mean(self):
+        if self.count >= self.period:
+            return self.sum / self.period
+        if self.partial and self.count:
+            return self.sum / self.count
+        return 0.0
+
+
+class IndicatorSeries:
+    """Indicator state of one (TickerJID, timeframeID)"""
+
+    def __init__(self, capacity=256, ema_periods=tuple(EMA_COLUMNS), sma_periods=tuple(SMA_COLUMNS)):
+        """
+        Args:
+            capacity: Bars kept in the ring buffer (at least what RSI/Stochastic look back)
+            ema_periods: EMA periods to maintain
+            sma_periods: SMA periods to maintain
+        """
+        self.bars = BarBuffer(max(capacity, max(RSI_PERIODS) + 1, STOCH_PERIOD))
+        self.ema_periods = tuple(ema_periods)
+        self._k = np.array([2.0 / (period + 1) for period in self.ema_periods])
+        self._ema = None
+        self._sma = {period: RollingMean(period, partial=True) for period in sma_periods}
+
+        self._tr = RollingMean(ADX_PERIOD, exact=True)
+        self._plus_dm = RollingMean(ADX_PERIOD, exact=True)
+        self._minus_dm = RollingMean(ADX_PERIOD, exact=True)
+        self._dx = RollingMean(ADX_PERIOD, exact=True)
+
+        self.current = None  # values of the last bar
+        self.previous = None  # values of the bar before
+
+    def seed_ema(self, values):
+        """
+        Continue EMAs from stored values (tms.EMA row of the last bar seen),
+        exactly like the incremental CLR run does.
+
+        Args:
+            values: dict period -> EMA value; missing periods keep their state
+        """
+        if self._ema is None:
+            return
+        for i, period in enumerate(self.ema_periods):
+            if values.get(period) is not None:
+                self._ema[i] = float(values[period])
+        for i, period in enumerate(self.ema_periods):
+            self.current[EMA_COLUMNS.get(period, f'EMA_{period}')] = round(float(self._ema[i]), PRICE_SCALE)
+
+    def _rsi(self, period):
+        if len(self.bars) < period + 1:
+            return 50.0
+        changes = np.diff(self.bars.last(period + 1, BarBuffer.CLOSE))
+        avg_gain = float(changes[changes > 0].sum()) / period
+        avg_loss = float(-changes[changes < 0].sum()) / period
+        if avg_loss == 0:
+            return 100.0
+        rs = avg_gain / avg_loss
+        return 100.0 - (100.0 / (1.0 + rs))
+
+    def _stoch_k(self):
+        if len(self.bars) < STOCH_PERIOD:
+            return 50.0
+        window = self.bars.last(STOCH_PERIOD)
+        lowest = float(window[:, BarBuffer.LOW].min())
+        highest = float(window[:, BarBuffer.HIGH].max())
+        if highest == lowest:
+            return 50.0
+        return 100.0 * (float(window[-1, BarBuffer.CLOSE]) - lowest) / (highest - lowest)
+
+    def update(self, bar_time, open_, high, low, close):
+        """Apply one closed bar; returns dict of values named like the SQL columns"""
+        open_, high, low, close = (float(clr_decimal(value)) for value in (open_, high, low, close))
+        prev = self.bars.last(1)[0].tolist() if self.bars.count else None
+        self.bars.append(bar_time, open_, high, low, close)
+
+        # EMA: first bar seeds every period with its close
+        if self._ema is None:
+            self._ema = np.full(len(self.ema_periods), close)
+        else:
+            self._ema = close * self._k + self._ema * (1 - self._k)
+
+        for mean in self._sma.values():
+            mean.add(close)
+
+        rsi = {period: self._rsi(period) for period in RSI_PERIODS}
+        stoch_k = self._stoch_k()
+
+        # True range and directional movement; the first bar is its own previous close
+        prev_close = prev[BarBuffer.CLOSE] if prev is not None else close
+        true_range = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        plus_dm = minus_dm = 0.0
+        if prev is not None:
+            # Equal moves must compare equal, which float subtraction does not guarantee
+            up_move = clr_decimal(high) - clr_decimal(prev[BarBuffer.HIGH])
+            down_move = clr_decimal(prev[BarBuffer.LOW]) - clr_decimal(low)
+            if up_move > down_move and up_move > 0:
+                plus_dm = float(up_move)
+            elif down_move > up_move and down_move > 0:
+                minus_dm = float(down_move)
+
+        self._tr.add(true_range)
+        self._plus_dm.add(plus_dm)
+        self._minus_dm.add(minus_dm)
+        atr = self._tr.mean()
+        plus_di = (self._plus_dm.mean() / atr) * 100 if atr > 0 else 0.0
+        minus_di = (self._minus_dm.mean() / atr) * 100 if atr > 0 else 0.0
+        dx = abs(plus_di - minus_di) / (plus_di + minus_di) * 100 if plus_di + minus_di > 0 else 0.0
+        self._dx.add(dx)
+
+        values = {'BarTime': bar_time, 'openValue': open_, 'highValue': high,
+                  'lowValue': low, 'closeValue': close}
+        for i, period in enumerate(self.ema_periods):
+            values[EMA_COLUMNS.get(period, f'EMA_{period}')] = round(float(self._ema[i]), PRICE_SCALE)
+        for period, mean in self._sma.items():
+            values[SMA_COLUMNS.get(period, f'MA{period}')] = round(mean.mean(), PRICE_SCALE)
+        for period, value in rsi.items():
+            values[f'RSI_{period}'] = round(value, OSCILLATOR_SCALE)
+        values['Stoch_K_14'] = round(stoch_k, OSCILLATOR_SCALE)
+        # Flags use the unrounded values, as in the CLR
+        values['Overbought_Flag'] = rsi[14] > 70 or stoch_k > 80
+        values['Oversold_Flag'] = rsi[14] < 30 or stoch_k < 20
+        values['ATR_14'] = round(atr, PRICE_SCALE)
+        values['Plus_DI_14'] = round(plus_di, OSCILLATOR_SCALE)
+        values['Minus_DI_14'] = round(minus_di, OSCILLATOR_SCALE)
+        values['ADX_14'] = round(self._dx.mean(), OSCILLATOR_SCALE)
+
+        self.previous, self.current = self.current, values
+        return values
+
+    @staticmethod
+    def _bar_snapshot(values):
+        if values is None:
+            return None
+        return BarSnapshot(values['BarTime'], values['openValue'], values['highValue'],
+                           values['lowValue'], values['closeValue'],
+                           values.get('EMA_20_SHORT'), values.get('EMA_50_MEDIUM'),
+                           values['RSI_14'], values['Oversold_Flag'], values['Overbought_Flag'])
+
+    def snapshot(self):
+        """MarketSnapshot of the last two bars, same shape as DatabaseHelper.get_market_snapshot"""
+        if self.current is None:
+            return None
+        return MarketSnapshot(self._bar_snapshot(self.current), self._bar_snapshot(self.previous))
+
+
+def clr_doubles(values):
+    """clr_decimal of every value, back to a float64 array"""
+    # float of the 15-digit string is float(clr_decimal(value)) without building the Decimal
+    return np.array([float(f"{float(value):.15g}") for value in values], dtype=float)
+
+
+def batch_ema(close, period):
+    """EMA of every bar, seeded with the first close like IndicatorSeries"""
+    k = 2.0 / (period + 1)
+    out = np.empty(len(close))
+    value = None
+    for i, price in enumerate(close.tolist()):
+        value = price if value is None else price * k + value * (1 - k)
+        out[i] = value
+    return out
+
+
+def batch_rsi(close, period=14):
+    """RSI of every bar: 50 until n + 1 closes, 100 when there are no losses"""
+    out = np.full(len(close), 50.0)
+    if len(close) <= period:
+        return out
+    windows = sliding_window_view(np.diff(close), period)
+    avg_gain = np.where(windows > 0, windows, 0.0).sum(axis=1) / period
+    avg_loss = -np.where(windows < 0, windows, 0.0).sum(axis=1) / period
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[period:] = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    return out
+
+
+def batch_stoch_k(high, low, close, period=STOCH_PERIOD):
+    """%K of every bar: 50 until n bars or a flat range"""
+    out = np.full(len(close), 50.0)
+    if len(close) < period:
+        return out
+    lowest = sliding_window_view(low, period).min(axis=1)
+    highest = sliding_window_view(high, period).max(axis=1)
+    span = highest - lowest
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[period - 1:] = np.where(span == 0, 50.0, 100.0 * (close[period - 1:] - lowest) / span)
+    return out
+
+
+def batch_indicators(open_, high, low, close, ema_periods=(20, 50)):
+    """
+    Snapshot columns of every bar at once, named and rounded like
+    IndicatorSeries.update: converted OHLC, EMAs, RSI_14, Stoch_K_14 and the flags.
+
+    Args:
+        open_, high, low, close: Price arrays in bar order
+        ema_periods: EMA periods to compute
+    """
+    open_, high, low, close = (clr_doubles(values) for values in (open_, high, low, close))
+    rsi_14 = batch_rsi(close)
+    stoch_k = batch_stoch_k(high, low, close)
+
+    values = {'openValue': open_, 'highValue': high, 'lowValue': low, 'closeValue': close}
+    for period in ema_periods:
+        values[EMA_COLUMNS.get(period, f'EMA_{period}')] = np.round(batch_ema(close, period), PRICE_SCALE)
+    values['RSI_14'] = np.round(rsi_14, OSCILLATOR_SCALE)
+    values['Stoch_K_14'] = np.round(stoch_k, OSCILLATOR_SCALE)
+    # Flags use the unrounded values, as in the CLR
+    values['Overbought_Flag'] = (rsi_14 > 70) | (stoch_k > 80)
+    values['Oversold_Flag'] = (rsi_14 < 30) | (stoch_k < 20)
+    return values
+
+
+class IndicatorEngine:
+    """Indicator series for many (TickerJID, timeframeID) pairs"""
+
+    # Four parameters per pair, SQL Server allows 2100 per statement
+    MAX_PAIRS_PER_QUERY = 500
+
+    def __init__(self, capacity=256, ema_periods=tuple(EMA_COLUMNS), sma_periods=tuple(SMA_COLUMNS),
+                 warmup_bars=None):
+        """
+        Args:
+            capacity: Ring buffer size per series
+            ema_periods: EMA periods to maintain
+            sma_periods: SMA periods to maintain
+            warmup_bars: Bars replayed when a series is first synced
+                (default: enough for the longest SMA)
+        """
+        self.capacity = capacity
+        self.ema_periods = tuple(ema_periods)
+        self.sma_periods = tuple(sma_periods)
+        self.warmup_bars = warmup_bars or max(capacity, max(self.sma_periods, default=0) + 1)
+
+        self._series = {}  # (ticker_jid, timeframe_id) -> IndicatorSeries
+        self._lock = threading.Lock()
+
+        self.bars_processed = 0
+
+    def series(self, ticker_jid, timeframe_id):
+        """Series of a pair, created empty on first use"""
+        key = (int(ticker_jid), int(timeframe_id))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = IndicatorSeries(self.capacity, self.ema_periods, self.sma_periods)
+                self._series[key] = series
+            return series
+
+    def update(self, ticker_jid, timeframe_id, bar_time, open_, high, low, close):
+        """Apply a closed bar; bars not newer than the last one are ignored"""
+        series = self.series(ticker_jid, timeframe_id)
+        with self._lock:
+            last_time = series.bars.last_time
+            if last_time is not None and bar_time <= last_time:
+                return series.current
+            self.bars_processed += 1
+            return series.update(bar_time, open_, high, low, close)
+
+    def latest(self, ticker_jid, timeframe_id):
+        """Values of the last bar, or None"""
+        with self._lock:
+            series = self._series.get((int(ticker_jid), int(timeframe_id)))
+            return series.current if series else None
+
+    def get_market_snapshot(self, pairs):
+        """dict (ticker_jid, timeframe_id) -> MarketSnapshot from local state"""
+        result = {}
+        with self._lock:
+            for ticker_jid, timeframe_id in pairs:
+                series = self._series.get((int(ticker_jid), int(timeframe_id)))
+                snapshot = series.snapshot() if series else None
+                if snapshot is not None:
+                    result[(int(ticker_jid), int(timeframe_id))] = snapshot
+        return result
+
+    def sync(self, connection, pairs):
+        """
+        Load bars newer than each series' last bar in one statement per chunk.
+        New series replay warmup_bars bars and continue their EMAs from the
+        last tms.EMA row, so they match the incremental CLR run.
+        Returns number of bars applied.
+        """
+        pairs = list(dict.fromkeys((int(t), int(tf)) for t, tf in pairs))
+        with self._lock:
+            last_times = {pair: (self._series[pair].bars.last_time if pair in self._series else None)
+                          for pair in pairs}
+        new_pairs = [pair for pair, last_time in last_times.items() if last_time is None]
+
+        cursor = connection.cursor()
+        try:
+            bars = {}
+            for start in range(0, len(pairs), self.MAX_PAIRS_PER_QUERY):
+                chunk = pairs[start:start + self.MAX_PAIRS_PER_QUERY]
+                values = ", ".join(["(?, ?, ?, ?)"] * len(chunk))
+                params = []
+                for pair in chunk:
+                    params += [pair[0], pair[1], last_times[pair] or datetime(1900, 1, 1), self.warmup_bars]
+
+                cursor.execute(f"""
+                    SELECT s.TickerJID, s.TimeFrameID, b.barTime, b.openValue, b.highValue, b.lowValue, b.closeValue
+                    FROM (VALUES {values}) AS s(TickerJID, TimeFrameID, AfterTime, MaxBars)
+                    CROSS APPLY (
+                        SELECT TOP (s.MaxBars) barTime, openValue, highValue, lowValue, closeValue
+                        FROM tms.bars
+                        WHERE TickerJID = s.TickerJID AND timeframeID = s.TimeFrameID AND barTime > s.AfterTime
+                        ORDER BY barTime DESC
+                    ) b
+                    ORDER BY s.TickerJID, s.TimeFrameID, b.barTime
+                """, params)
+                for row in cursor.fetchall():
+                    bars.setdefault((int(row[0]), int(row[1])), []).append(row[2:])
+
+            seeds = self._load_ema_seeds(cursor, new_pairs) if new_pairs else {}
+        finally:
+            cursor.close()
+
+        applied = 0
+        for pair, rows in bars.items():
+            seed = seeds.get(pair)
+            for bar_time, open_, high, low, close in rows:
+                if None in (open_, high, low, close):
+                    continue
+                self.update(pair[0], pair[1], bar_time, open_, high, low, close)
+                applied += 1
+                if seed is not None and bar_time == seed[0]:
+                    with self._lock:
+                        self._series[pair].seed_ema(seed[1])
+        return applied
+
+    def _load_ema_seeds(self, cursor, pairs):
+        """Last tms.EMA row per pair: (BarTime, {period: value})"""
+        periods = [period for period in self.ema_periods if period in EMA_COLUMNS]
+        if not periods:
+            return {}
+        columns = ", ".join(f"e.{EMA_COLUMNS[period]}" for period in periods)
+
+        seeds = {}
+        for start in range(0, len(pairs), self.MAX_PAIRS_PER_QUERY):
+            chunk = pairs[start:start + self.MAX_PAIRS_PER_QUERY]
+            values = ", ".join(["(?, ?)"] * len(chunk))
+            params = [value for pair in chunk for value in pair]
+            cursor.execute(f"""
+                SELECT s.TickerJID, s.TimeFrameID, e.BarTime, {columns}
+                FROM (VALUES {values}) AS s(TickerJID, TimeFrameID)
+                CROSS APPLY (
+                    SELECT TOP 1 *
+                    FROM tms.EMA
+                    WHERE TickerJID = s.TickerJID AND TimeFrameID = s.TimeFrameID
+                    ORDER BY BarTime DESC
+                ) e
+            """, params)
+            for row in cursor.fetchall():
+                seeds[(int(row[0]), int(row[1]))] = (row[2], dict(zip(periods, row[3:])))
+        return seeds
+
+    def get_stats(self):
+        """Engine statistics"""
+        with self._lock:
+            return {'series': len(self._series), 'bars_processed': self.bars_processed}
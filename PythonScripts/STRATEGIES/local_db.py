@@ -0,0 +1,854 @@
+"""
+Local DB - SQLite stand-in for the cTrader schema.
+
+Tables mirror what the strategies read and write (tms.bars, tms.EMA,
+tms.Indicators_Momentum, trd.trades_v, algo.strategyTracker,
+algo.strategy_termination_queue, algo.strategies_positions, the execution log
+and the type/config tables). Schema-qualified names are kept as quoted table
+names, so plain statements run unchanged. Stored procedures and the
+T-SQL-only reads the framework issues (EXEC ..., algo.fn_*, CROSS APPLY
+snapshots) are answered by Python implementations over the same tables.
+
+Bars come from the OLTP/historicalData CSVs; EMA and momentum rows are
+computed on load with the IndicatorEngine formulas. trd.sp_CreateSignal
+fills at the last close immediately (auto_fill) or on fill_pending_signals().
+
+Usage:
+    db = LocalDatabase('anfund_local.db')
+    db.load_historical_csv()
+    db.add_config(1, ticker='XAUUSD', timeframe_signal='M15', open_volume=0.01)
+    helper = DatabaseHelper(LocalDatabaseProvider(db))
+
+    python local_db.py --db anfund_local.db --load
+
+All connections share one SQLite handle and statements are serialised.
+There are no transactions: every statement applies immediately. Cursors,
+connections and the pooled provider come from emulated_db; LocalDatabase is
+the engine.
+"""
+
+import os
+import re
+import csv
+import json
+import uuid
+import sqlite3
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+from emulated_db import (EmulationError, EmulatedConnectionProvider, SIGNAL_TYPES, utcnow, binary_checksum,
+                         parameter_values_hash, configuration_result, check_signal, terminate_instance)
+from indicator_engine import IndicatorSeries, EMA_COLUMNS, RSI_PERIODS
+
+DEFAULT_CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'OLTP', 'historicalData')
+
+SCHEMAS = ('tms', 'trd', 'algo', 'logs', 'ref')
+
+TIMEFRAMES = [  # tms.timeframes
+    (1, 'M1', '1 Minute', 1), (2, 'M5', '5 Minutes', 5), (3, 'M15', '15 Minutes', 15),
+    (4, 'M30', '30 Minutes', 30), (5, 'H1', '1 Hour', 60), (6, 'H4', '4 Hours', 240),
+    (7, 'D1', '1 Day', 1440), (8, 'W1', '1 Week', 10080), (9, 'MN1', '1 Month', 43200)
+]
+
+# historicalData file suffix -> timeframeID; files without a suffix are daily
+CSV_TIMEFRAMES = {'1min': 1, '5min': 2, '15min': 3, '30min': 4, '1h': 5, '4h': 6, '1d': 7, 'daily': 7}
+
+EVENT_TYPES = ('start', 'stop', 'error', 'termination', 'signal')
+STRATEGY_STATES = ('start', 'heartbeat', 'stop', 'terminated')
+
+EMA_COLUMN_NAMES = [EMA_COLUMNS[period] for period in sorted(EMA_COLUMNS)]
+MOMENTUM_COLUMN_NAMES = [f'RSI_{period}' for period in RSI_PERIODS] + ['Stoch_K_14', 'Overbought_Flag', 'Oversold_Flag']
+
+SCHEMA_SQL = f"""
+CREATE TABLE IF NOT EXISTS "ref.assetMasterTable" (
+    ID INTEGER PRIMARY KEY, ticker TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS "tms.timeframes" (
+    ID INTEGER PRIMARY KEY, timeframeCode TEXT NOT NULL UNIQUE, timeframeName TEXT, minutes INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS "tms.bars" (
+    ID INTEGER PRIMARY KEY, TickerJID INTEGER NOT NULL, barTime DATETIME NOT NULL, timeframeID INTEGER NOT NULL,
+    openValue REAL NOT NULL, closeValue REAL NOT NULL, highValue REAL NOT NULL, lowValue REAL NOT NULL,
+    sourceID INTEGER NOT NULL DEFAULT 1,
+    UNIQUE (TickerJID, barTime, timeframeID, sourceID));
+CREATE INDEX IF NOT EXISTS idx_bars_ticker_time ON "tms.bars" (TickerJID, timeframeID, barTime);
+CREATE TABLE IF NOT EXISTS "tms.EMA" (
+    ID INTEGER PRIMARY KEY, BarID INTEGER NOT NULL UNIQUE, TickerJID INTEGER NOT NULL, BarTime DATETIME NOT NULL,
+    TimeFrameID INTEGER NOT NULL, {', '.join(f'{name} REAL' for name in EMA_COLUMN_NAMES)});
+CREATE INDEX IF NOT EXISTS IX_EMA_Ticker_TimeFrame_Time ON "tms.EMA" (TickerJID, TimeFrameID, BarTime);
+CREATE TABLE IF NOT EXISTS "tms.Indicators_Momentum" (
+    ID INTEGER PRIMARY KEY, TickerJID INTEGER NOT NULL, BarTime DATETIME NOT NULL, TimeFrameID INTEGER NOT NULL,
+    SourceID INTEGER NOT NULL DEFAULT 1, {', '.join(f'{name} REAL' for name in MOMENTUM_COLUMN_NAMES[:-2])},
+    Overbought_Flag INTEGER, Oversold_Flag INTEGER,
+    UNIQUE (TickerJID, BarTime, TimeFrameID));
+CREATE TABLE IF NOT EXISTS "trd.trades_v" (
+    ID INTEGER PRIMARY KEY AUTOINCREMENT, orderUUID TEXT NOT NULL, ticker TEXT NOT NULL, direction TEXT NOT NULL,
+    volume REAL NOT NULL, entryPrice REAL, createdTime DATETIME NOT NULL, tradeType TEXT NOT NULL DEFAULT 'POSITION');
+CREATE INDEX IF NOT EXISTS IX_trades_v_orderUUID ON "trd.trades_v" (orderUUID);
+CREATE TABLE IF NOT EXISTS "trd.closedPositions" (
+    ID INTEGER PRIMARY KEY, orderUUID TEXT NOT NULL, ticker TEXT NOT NULL, direction TEXT NOT NULL,
+    volume REAL NOT NULL, entryPrice REAL, exitPrice REAL, createdTime DATETIME, closedTime DATETIME);
+CREATE TABLE IF NOT EXISTS "algo.ConfigurationSets" (
+    Id INTEGER PRIMARY KEY, ParameterValuesJson TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS "algo.strategyTracker" (
+    ID INTEGER PRIMARY KEY, configID INTEGER NOT NULL, configInstanceGUID TEXT NOT NULL UNIQUE,
+    timeStarted DATETIME, modified DATETIME, timeClosed DATETIME);
+CREATE INDEX IF NOT EXISTS IX_strategyTracker_configID ON "algo.strategyTracker" (configID, timeClosed);
+CREATE TABLE IF NOT EXISTS "algo.strategy_termination_queue" (
+    id INTEGER PRIMARY KEY, config_id INTEGER NOT NULL, configInstanceGUID TEXT, terminate INTEGER NOT NULL DEFAULT 1,
+    requested_at DATETIME, terminated_at DATETIME);
+CREATE TABLE IF NOT EXISTS "algo.strategies_positions" (
+    trade_uuid TEXT PRIMARY KEY, strategy_configuration_id INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_strategies_config ON "algo.strategies_positions" (strategy_configuration_id);
+CREATE TABLE IF NOT EXISTS "algo.tradingSignals" (
+    signalID INTEGER PRIMARY KEY, assetID INTEGER NOT NULL, ticker TEXT NOT NULL, volume REAL NOT NULL,
+    signalTypeID INTEGER NOT NULL, orderPrice REAL, stopLoss REAL, takeProfit REAL, expiry DATETIME,
+    positionLabel TEXT, created DATETIME, filledTime DATETIME, fillPrice REAL);
+CREATE TABLE IF NOT EXISTS "algo.strategySignalType" (
+    ID INTEGER PRIMARY KEY, TypeName TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS "algo.strategyEventsType" (
+    ID INTEGER PRIMARY KEY, eventTypeName TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS "logs.strategyExecution" (
+    ID INTEGER PRIMARY KEY, configID INTEGER NOT NULL, signalTypeID INTEGER, EventTypeID INTEGER, volume REAL,
+    price REAL, signalTimeUTC DATETIME, tradingSignalID INTEGER, trade_uuid TEXT);
+"""
+
+
+class LocalDatabaseError(EmulationError):
+    """THROW of an emulated procedure only the local database implements"""
+
+
+def _convert_datetime(value):
+    return datetime.fromisoformat(value.decode())
+
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_converter('DATETIME', _convert_datetime)
+
+_SCHEMA_NAME = re.compile(r"(?<![\w.\"'\[])\b(" + "|".join(SCHEMAS) + r")\.(\w+)")
+_EXEC = re.compile(r"^\s*EXEC(?:UTE)?\s+(?:@\w+\s*=\s*)?([\w.\[\]]+)(.*?);?\s*$", re.IGNORECASE | re.DOTALL)
+_SCALAR_FUNCTION = re.compile(r"^\s*SELECT\s+(\w+\.fn_\w+)\s*\((.*)\)\s*(?:AS\s+\w+)?\s*;?\s*$",
+                              re.IGNORECASE | re.DOTALL)
+_EXEC_BATCH = re.compile(r"^\s*(?:SET\s+\w+\s+\w+\s*;\s*)*EXEC(?:UTE)?\s.*;\s*EXEC(?:UTE)?\s",
+                         re.IGNORECASE | re.DOTALL)  # several procedure calls sent as one batch
+_ISNULL = re.compile(r"\bISNULL\s*\(", re.IGNORECASE)  # ISNULL is an operator in SQLite
+_TOP = re.compile(r"^(\s*SELECT\s+)TOP\s*\(?\s*(\d+)\s*\)?\s+", re.IGNORECASE)
+
+
+def _split_arguments(text):
+    """Split an EXEC argument list on commas outside quotes"""
+    parts, current, quoted = [], [], False
+    for char in text:
+        if char == "'":
+            quoted = not quoted
+        if char == ',' and not quoted:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append(''.join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _literal(text, params):
+    if text == '?':
+        return next(params)
+    if text.upper() == 'NULL':
+        return None
+    if text[:2].upper() == "N'":
+        text = text[1:]
+    if text.startswith("'") and text.endswith("'"):
+        return text[1:-1].replace("''", "'")
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _split_statements(sql, params):
+    """Split a batch on ';' and hand each statement its share of the parameters"""
+    statements = [statement for statement in sql.split(';') if statement.strip()]
+    result, offset = [], 0
+    for statement in statements:
+        count = statement.count('?')
+        result.append((statement, params[offset:offset + count]))
+        offset += count
+    return result
+
+
+def csv_series(file_name):
+    """historicalData file name -> (ticker, timeframe_id), None for tick/ETF/unknown files"""
+    if not file_name.lower().endswith('.csv'):
+        return None
+    ticker, _, suffix = file_name[:-4].partition('_')
+    timeframe_id = CSV_TIMEFRAMES.get(suffix.lower()) if suffix else 7
+    return (ticker, timeframe_id) if timeframe_id is not None else None
+
+
+def read_csv_bars(path):
+    """(bar_time, open, high, low, close) rows of a historicalData CSV; malformed rows are skipped"""
+    bars = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            stamp = row.get('DateTime') or row.get('Date')
+            try:
+                bars.append((datetime.fromisoformat(stamp[:19]), float(row['Open']), float(row['High']),
+                             float(row['Low']), float(row['Close'])))
+            except (TypeError, ValueError, KeyError):
+                continue
+    return bars
+
+
+def _translate(sql):
+    """T-SQL -> SQLite for plain statements: quoted schema names, ISNULL -> IFNULL, TOP n -> LIMIT n"""
+    sql = _ISNULL.sub('IFNULL(', _SCHEMA_NAME.sub(r'"\1.\2"', sql))
+    match = _TOP.match(sql)
+    if match and sql.upper().count('TOP') == 1 and ' LIMIT ' not in sql.upper():
+        sql = match.group(1) + sql[match.end():].rstrip().rstrip(';') + f" LIMIT {match.group(2)}"
+    return sql
+
+
+class LocalDatabase:
+    """SQLite database with Python implementations of the procedures and functions"""
+
+    # T-SQL-only framework statements: pattern -> handler, first match wins
+    STATEMENTS = [
+        (r"^\s*(?:SET\s+\w+\s+(?:ON|OFF)\s*;?\s*)+$", '_session_options'),
+        (r"MAX\(b\.barTime\)\s+AS\s+lastBarTime", '_last_bar_times'),
+        (r"tms\.Indicators_Momentum\s+m\s+ON\s+m\.ID\s*=\s*b\.ID", '_market_snapshot'),
+        (r"TOP\s*\(s\.MaxBars\)", '_bars_after'),
+        (r"SELECT\s+TOP\s+1\s+\*\s+FROM\s+tms\.EMA", '_ema_seeds'),
+        (r"FROM\s+algo\.fn_GetCurrentSignals\s*\(", '_current_signals'),
+        (r"FROM\s+algo\.fn_GetStrategyConfiguration\s*\(", '_strategy_configuration'),
+        (r"ParameterValuesHash\s+FROM\s+algo\.ConfigurationSets", '_config_hashes'),
+    ]
+
+    PROCEDURES = {
+        'algo.sp_strategyregister': '_sp_strategy_register',
+        'logs.sp_logstrategyexecution': '_sp_log_strategy_execution',
+        'algo.sp_terminateinstance': '_sp_terminate_instance',
+        'algo.sp_updatestrategystate': '_sp_update_strategy_state',
+        'algo.sp_requeststrategytermination': '_sp_request_strategy_termination',
+        'trd.sp_createsignal': '_sp_create_signal',
+    }
+
+    FUNCTIONS = {
+        'algo.fn_getinstancepositionids': '_fn_instance_position_ids',
+        'algo.fn_getstrategypositionids': '_fn_strategy_position_ids',
+        'algo.fn_openstrategyguid': '_fn_open_strategy_guid',
+    }
+
+    def __init__(self, path=':memory:', auto_fill=True, indicators=True):
+        """
+        Args:
+            path: SQLite file, ':memory:' for a throwaway database
+            auto_fill: Fill trd.sp_CreateSignal at the last close right away
+            indicators: Maintain tms.EMA / tms.Indicators_Momentum for loaded and published bars
+        """
+        self.path = path
+        self.auto_fill = auto_fill
+        self.indicators = indicators
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                     detect_types=sqlite3.PARSE_DECLTYPES)
+        self._conn.create_function('GETUTCDATE', 0, lambda: utcnow().isoformat(' '))
+        self._conn.create_function('SYSUTCDATETIME', 0, lambda: utcnow().isoformat(' '))
+        self._conn.create_function('NEWID', 0, lambda: str(uuid.uuid4()).upper())
+        self._conn.create_function('BINARY_CHECKSUM', -1, binary_checksum)
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.RLock()
+
+        self._statements = [(re.compile(pattern, re.IGNORECASE | re.DOTALL), getattr(self, name))
+                            for pattern, name in self.STATEMENTS]
+        self._translated = {}  # sql -> translated sql
+        self._series = {}  # (ticker_jid, timeframe_id) -> IndicatorSeries for publish_bar()
+
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock:
+            self._conn.executescript(SCHEMA_SQL)
+            self._conn.executemany('INSERT OR IGNORE INTO "tms.timeframes" VALUES (?, ?, ?, ?)', TIMEFRAMES)
+            self._conn.executemany('INSERT OR IGNORE INTO "algo.strategySignalType" VALUES (?, ?)',
+                                   list(enumerate(SIGNAL_TYPES, 1)))
+            self._conn.executemany('INSERT OR IGNORE INTO "algo.strategyEventsType" VALUES (?, ?)',
+                                   list(enumerate(EVENT_TYPES, 1)))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ===== STATEMENTS =====
+
+    def execute(self, sql, params):
+        """Run one statement or batch; returns a list of (columns, rows) result sets"""
+        with self._lock:
+            if _EXEC_BATCH.match(sql):
+                return self._execute_batch(sql, params)
+
+            match = _EXEC.match(sql)
+            if match:
+                return self._call_procedure(match.group(1), match.group(2), params)
+
+            match = _SCALAR_FUNCTION.match(sql)
+            if match and match.group(1).lower() in self.FUNCTIONS:
+                args = [_literal(arg, iter(params)) for arg in _split_arguments(match.group(2))]
+                value = getattr(self, self.FUNCTIONS[match.group(1).lower()])(*args)
+                return [(('value',), [(value,)])]
+
+            for pattern, handler in self._statements:
+                if pattern.search(sql):
+                    return handler(sql, params)
+
+            translated = self._translated.get(sql)
+            if translated is None:
+                translated = self._translated[sql] = _translate(sql)
+            result_sets = []
+            for statement, statement_params in _split_statements(translated, params):
+                cursor = self._conn.execute(statement, statement_params)
+                if cursor.description is not None:
+                    columns = tuple(column[0] for column in cursor.description)
+                    result_sets.append((columns, cursor.fetchall()))
+            return result_sets
+
+    def executemany(self, sql, seq_of_params):
+        with self._lock:
+            if _EXEC.match(sql):
+                for params in seq_of_params:
+                    self.execute(sql, list(params))
+                return
+            self._conn.executemany(_translate(sql), seq_of_params)
+
+    def _execute_batch(self, sql, params):
+        """Procedure calls of one batch, all or nothing (SET XACT_ABORT ON)"""
+        result_sets = []
+        self._conn.execute('SAVEPOINT exec_batch')
+        try:
+            for statement, statement_params in _split_statements(sql, params):
+                if re.match(r"\s*SET\s", statement, re.IGNORECASE):
+                    continue
+                result_sets.extend(self.execute(statement, statement_params))
+        except Exception:
+            self._conn.execute('ROLLBACK TO exec_batch')
+            raise
+        finally:
+            self._conn.execute('RELEASE exec_batch')
+        return result_sets
+
+    def _call_procedure(self, name, argument_text, params):
+        handler_name = self.PROCEDURES.get(name.replace('[', '').replace(']', '').lower())
+        if handler_name is None:
+            raise LocalDatabaseError(f"Procedure not implemented locally: {name}")
+
+        params = iter(params)
+        args, kwargs = [], {}
+        for part in _split_arguments(argument_text):
+            named = re.match(r"@(\w+)\s*=\s*(.*)$", part, re.DOTALL)
+            if named:
+                kwargs[named.group(1).lower()] = _literal(named.group(2).strip(), params)
+            else:
+                args.append(_literal(part, params))
+        return getattr(self, handler_name)(*args, **kwargs)
+
+    def _query(self, sql, params=()):
+        return self._conn.execute(sql, params).fetchall()
+
+    def _scalar(self, sql, params=()):
+        row = self._conn.execute(sql, params).fetchone()
+        return row[0] if row else None
+
+    # ===== PROCEDURES =====
+
+    def _sp_strategy_register(self, configid):
+        config = self._configuration(configid)
+        if config is None:
+            return [(('registration',), [('{"error": "Configuration not found"}',)])]
+
+        guid = str(uuid.uuid4()).upper()
+        now = utcnow()
+        self._conn.execute('INSERT INTO "algo.strategyTracker" (configID, configInstanceGUID, timeStarted, modified) '
+                           'VALUES (?, ?, ?, ?)', (configid, guid, now, now))
+        config['configInstanceGUID'] = guid
+        return [(('registration',), [(json.dumps(config, default=str),)])]
+
+    def _configuration(self, configid):
+        """algo.fn_GetStrategyConfiguration"""
+        row = self._query('SELECT ParameterValuesJson FROM "algo.ConfigurationSets" WHERE Id = ?', (configid,))
+        if not row:
+            return None
+        parameters = json.loads(row[0][0])
+        timeframe_ids = dict(self._query('SELECT timeframeCode, ID FROM "tms.timeframes"'))
+        return {
+            'configID': configid,
+            'ticker': parameters.get('ticker'),
+            'ticker_jid': self._scalar('SELECT ID FROM "ref.assetMasterTable" WHERE ticker = ?',
+                                       (parameters.get('ticker'),)),
+            'timeframe_signal_id': timeframe_ids.get(parameters.get('timeframe_signal')),
+            'timeframe_confirmation_id': timeframe_ids.get(parameters.get('timeframe_confirmation')),
+            'timeframe_trend_id': timeframe_ids.get(parameters.get('timeframe_trend')),
+            'open_volume': parameters.get('open_volume'),
+            'trading_close_utc': parameters.get('trading_close_utc'),
+            'trading_start_utc': parameters.get('trading_start_utc'),
+            'broker_id': parameters.get('broker_id'),
+            'platform_id': parameters.get('platform_id')
+        }
+
+    def _sp_log_strategy_execution(self, configid, signaltype=None, eventtypename=None, volume=None,
+                                   price=None, tradingsignalid=None, trade_uuid=None):
+        signal_type_id = event_type_id = None
+        if signaltype is not None:
+            signal_type_id = self._scalar('SELECT ID FROM "algo.strategySignalType" WHERE TypeName = ? COLLATE NOCASE',
+                                          (signaltype,))
+            if signal_type_id is None:
+                raise LocalDatabaseError('Invalid signalType')
+            event_type_id = self._scalar('SELECT ID FROM "algo.strategyEventsType" WHERE eventTypeName = ?',
+                                         ('signal',))
+        elif eventtypename is not None:
+            event_type_id = self._scalar('SELECT ID FROM "algo.strategyEventsType" WHERE eventTypeName = ?',
+                                         (eventtypename,))
+            if event_type_id is None:
+                raise LocalDatabaseError('Invalid eventTypeName')
+
+        self._conn.execute('INSERT INTO "logs.strategyExecution" (configID, signalTypeID, EventTypeID, volume, price, '
+                           'signalTimeUTC, tradingSignalID, trade_uuid) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                           (configid, signal_type_id, event_type_id, volume, price, utcnow(), tradingsignalid,
+                            str(trade_uuid) if trade_uuid is not None else None))
+        return []
+
+    def _termination_requested(self, guid):
+        return self._scalar('SELECT COUNT(*) FROM "algo.strategy_termination_queue" '
+                            'WHERE configInstanceGUID = ? AND terminate = 1 AND terminated_at IS NULL', (guid,))
+
+    def _terminate(self, guid, now):
+        configid = self._scalar('SELECT configID FROM "algo.strategyTracker" '
+                                'WHERE configInstanceGUID = ? AND timeClosed IS NULL', (guid,))
+        self._conn.execute('UPDATE "algo.strategy_termination_queue" SET terminated_at = ? '
+                           'WHERE configInstanceGUID = ? AND terminate = 1 AND terminated_at IS NULL', (now, guid))
+        self._conn.execute('UPDATE "algo.strategyTracker" SET timeClosed = ? '
+                           'WHERE configInstanceGUID = ? AND timeClosed IS NULL', (now, guid))
+        if configid is not None:
+            self._sp_log_strategy_execution(configid, eventtypename='termination', trade_uuid=guid)
+
+    def _sp_terminate_instance(self, guid):
+        should_terminate = terminate_instance(guid, self._termination_requested, self._terminate)
+        return [(('should_terminate',), [(should_terminate,)])]
+
+    def _sp_update_strategy_state(self, configid, currentstate):
+        if currentstate not in STRATEGY_STATES:
+            raise LocalDatabaseError('Invalid state')
+        now = utcnow()
+        updated = self._conn.execute(
+            'UPDATE "algo.strategyTracker" SET '
+            'modified = CASE WHEN ? = \'heartbeat\' THEN ? ELSE modified END, '
+            'timeClosed = CASE WHEN ? IN (\'stop\', \'terminated\') THEN ? ELSE timeClosed END '
+            'WHERE configID = ? AND timeClosed IS NULL',
+            (currentstate, now, currentstate, now, configid)).rowcount
+        if not updated and currentstate == 'start':
+            self._conn.execute('INSERT INTO "algo.strategyTracker" (configID, configInstanceGUID, timeStarted, modified) '
+                               'VALUES (?, ?, ?, ?)', (configid, str(uuid.uuid4()).upper(), now, now))
+        return []
+
+    def _sp_request_strategy_termination(self, config_id):
+        guid = self._fn_open_strategy_guid(config_id)
+        if not self._scalar('SELECT 1 FROM "algo.ConfigurationSets" WHERE Id = ?', (config_id,)):
+            raise LocalDatabaseError('Configuration not found')
+        pending = self._scalar('SELECT 1 FROM "algo.strategy_termination_queue" '
+                               'WHERE configInstanceGUID = ? AND terminated_at IS NULL', (guid,))
+        if guid is None or pending:
+            return []
+        cursor = self._conn.execute('INSERT INTO "algo.strategy_termination_queue" '
+                                    '(config_id, configInstanceGUID, requested_at) VALUES (?, ?, ?)',
+                                    (config_id, guid, utcnow()))
+        message = f"A record has been enqueued for closing. LogId = {cursor.lastrowid}"
+        return [(('termination_id',), [(message,)])]
+
+    def _sp_create_signal(self, ticker, direction, volume, orderprice=None, stoploss=None, takeprofit=None,
+                          expiry=None, brokerid=2, platformid=1, tradeid=None, tradetype=None,
+                          strategy_configuration_id=None):
+        direction, trade_label, asset_id = check_signal(
+            ticker, direction, volume, tradeid, tradetype,
+            lambda trade_id, trade_type: self._scalar(
+                'SELECT orderUUID FROM "trd.trades_v" WHERE ID = ? AND tradeType = ?', (trade_id, trade_type)),
+            lambda symbol: self._scalar('SELECT ID FROM "ref.assetMasterTable" WHERE ticker = ?', (symbol,)))
+        signal_type_id = self._scalar('SELECT ID FROM "algo.strategySignalType" WHERE UPPER(TypeName) = ?',
+                                      (direction,))
+
+        is_drop = direction == 'DROP'
+        label = trade_label if is_drop else str(uuid.uuid4()).upper()
+        cursor = self._conn.execute(
+            'INSERT INTO "algo.tradingSignals" (assetID, ticker, volume, signalTypeID, orderPrice, stopLoss, '
+            'takeProfit, expiry, positionLabel, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (asset_id, ticker, volume, signal_type_id, orderprice, stoploss, takeprofit, expiry, label, utcnow()))
+        if not is_drop:
+            self._conn.execute('INSERT INTO "algo.strategies_positions" (trade_uuid, strategy_configuration_id) '
+                               'VALUES (?, ?)', (label, strategy_configuration_id))
+        if self.auto_fill:
+            self._fill_signal(cursor.lastrowid)
+        return []
+
+    # ===== FUNCTIONS =====
+
+    def _positions_json(self, configid):
+        rows = self._query('SELECT tv.ID, tv.direction, tv.volume, tv.orderUUID, tv.ticker '
+                           'FROM "trd.trades_v" tv '
+                           'JOIN "algo.strategies_positions" sp ON sp.trade_uuid = tv.orderUUID '
+                           'WHERE tv.tradeType = \'POSITION\' AND sp.strategy_configuration_id = ?', (configid,))
+        return json.dumps([{'id': position_id, 'direction': direction, 'volume': volume,
+                            'orderUUID': order_uuid, 'ticker': ticker}
+                           for position_id, direction, volume, order_uuid, ticker in rows])
+
+    def _fn_instance_position_ids(self, guid):
+        configid = self._scalar('SELECT configID FROM "algo.strategyTracker" WHERE configInstanceGUID = ?',
+                                (str(guid).upper(),))
+        return '[]' if configid is None else self._positions_json(configid)
+
+    def _fn_strategy_position_ids(self, configid):
+        return self._positions_json(configid)
+
+    def _fn_open_strategy_guid(self, config_id):
+        return self._scalar('SELECT configInstanceGUID FROM "algo.strategyTracker" '
+                            'WHERE configID = ? AND timeClosed IS NULL ORDER BY ID DESC LIMIT 1', (config_id,))
+
+    # ===== T-SQL-ONLY READS =====
+
+    @staticmethod
+    def _pairs(params, width=2):
+        return [tuple(params[i:i + width]) for i in range(0, len(params), width)]
+
+    def _session_options(self, sql, params):
+        """SET NOCOUNT / XACT_ABORT: no session options in SQLite"""
+        return []
+
+    def _last_bar_times(self, sql, params):
+        rows = []
+        for ticker_jid, timeframe_id in self._pairs(params):
+            last = self._scalar('SELECT barTime FROM "tms.bars" WHERE TickerJID = ? AND timeframeID = ? '
+                                'ORDER BY barTime DESC LIMIT 1', (ticker_jid, timeframe_id))
+            rows.append((ticker_jid, timeframe_id, last))
+        return [(('TickerJID', 'TimeFrameID', 'lastBarTime'), rows)]
+
+    def _market_snapshot(self, sql, params):
+        rows = []
+        for ticker_jid, timeframe_id in sorted(set(self._pairs(params))):
+            rows.extend(self._query(
+                'SELECT b.TickerJID, b.timeframeID, b.barTime, b.openValue, b.highValue, b.lowValue, b.closeValue, '
+                'e.EMA_20_SHORT, e.EMA_50_MEDIUM, m.RSI_14, m.Oversold_Flag, m.Overbought_Flag '
+                'FROM "tms.bars" b '
+                'LEFT JOIN "tms.EMA" e ON e.TickerJID = b.TickerJID AND e.TimeFrameID = b.timeframeID '
+                'AND e.BarTime = b.barTime '
+                'LEFT JOIN "tms.Indicators_Momentum" m ON m.ID = b.ID '
+                'WHERE b.TickerJID = ? AND b.timeframeID = ? ORDER BY b.barTime DESC LIMIT 2',
+                (ticker_jid, timeframe_id)))
+        columns = ('TickerJID', 'TimeFrameID', 'barTime', 'openValue', 'highValue', 'lowValue', 'closeValue',
+                   'EMA_20_SHORT', 'EMA_50_MEDIUM', 'RSI_14', 'Oversold_Flag', 'Overbought_Flag')
+        return [(columns, rows)]
+
+    def _bars_after(self, sql, params):
+        rows = []
+        for ticker_jid, timeframe_id, after_time, max_bars in self._pairs(params, 4):
+            bars = self._query('SELECT TickerJID, timeframeID, barTime, openValue, highValue, lowValue, closeValue '
+                               'FROM "tms.bars" WHERE TickerJID = ? AND timeframeID = ? AND barTime > ? '
+                               'ORDER BY barTime DESC LIMIT ?', (ticker_jid, timeframe_id, after_time, max_bars))
+            rows.extend(reversed(bars))
+        columns = ('TickerJID', 'TimeFrameID', 'barTime', 'openValue', 'highValue', 'lowValue', 'closeValue')
+        return [(columns, rows)]
+
+    def _ema_seeds(self, sql, params):
+        selected = re.search(r"e\.BarTime\s*,(.*?)\s+FROM", sql, re.IGNORECASE | re.DOTALL).group(1)
+        columns = [column.strip().split('.')[-1] for column in selected.split(',')]
+        rows = []
+        for ticker_jid, timeframe_id in self._pairs(params):
+            rows.extend(self._query(f'SELECT TickerJID, TimeFrameID, BarTime, {", ".join(columns)} FROM "tms.EMA" '
+                                    'WHERE TickerJID = ? AND TimeFrameID = ? ORDER BY BarTime DESC LIMIT 1',
+                                    (ticker_jid, timeframe_id)))
+        return [(('TickerJID', 'TimeFrameID', 'BarTime') + tuple(columns), rows)]
+
+    def _config_hashes(self, sql, params):
+        """ParameterValuesHash: HASHBYTES('SHA2_256') of the NVARCHAR (UTF-16LE) JSON"""
+        placeholders = ", ".join(["?"] * len(params))
+        rows = self._query(f'SELECT Id, ParameterValuesJson FROM "algo.ConfigurationSets" WHERE Id IN ({placeholders})',
+                           tuple(params))
+        return [(('Id', 'ParameterValuesHash'), [(configid, parameter_values_hash(text)) for configid, text in rows])]
+
+    def _strategy_configuration(self, sql, params):
+        """algo.fn_GetStrategyConfiguration: one row of the configuration, none if missing"""
+        config = self._configuration(params[0])
+        if config is None:
+            return [(('config_id',), [])]
+        return [configuration_result(config)]
+
+    def _current_signals(self, sql, params):
+        """algo.fn_GetCurrentSignals: RSI/EMA signal on the signal and confirmation timeframes, EMA50 trend"""
+        ticker_jid, signal_id, confirmation_id, trend_id = params[:4]
+        signals, trends = {}, {}
+        for timeframe_id in {signal_id, confirmation_id, trend_id}:
+            current = self._query(
+                'SELECT b.barTime, b.lowValue, b.highValue, b.closeValue, e.EMA_20_SHORT, e.EMA_50_MEDIUM, '
+                'm.Oversold_Flag, m.Overbought_Flag '
+                'FROM "tms.bars" b '
+                'LEFT JOIN "tms.EMA" e ON e.TickerJID = b.TickerJID AND e.TimeFrameID = b.timeframeID '
+                'AND e.BarTime = b.barTime '
+                'LEFT JOIN "tms.Indicators_Momentum" m ON m.TickerJID = b.TickerJID AND m.TimeFrameID = b.timeframeID '
+                'AND m.BarTime = b.barTime '
+                'WHERE b.TickerJID = ? AND b.timeframeID = ? ORDER BY b.barTime DESC LIMIT 1',
+                (ticker_jid, timeframe_id))
+            if not current:
+                continue
+            bar_time, low, high, close, ema_20, ema_50, oversold, overbought = current[0]
+            previous = self._query('SELECT Oversold_Flag, Overbought_Flag FROM "tms.Indicators_Momentum" '
+                                   'WHERE TickerJID = ? AND TimeFrameID = ? AND BarTime < ? '
+                                   'ORDER BY BarTime DESC LIMIT 1', (ticker_jid, timeframe_id, bar_time))
+            prev_oversold, prev_overbought = previous[0] if previous else (None, None)
+
+            signal = None
+            if ema_20 is not None and low <= ema_20 and prev_oversold == 1 and oversold == 0:
+                signal = 'buy'
+            elif ema_20 is not None and high >= ema_20 and prev_overbought == 1 and overbought == 0:
+                signal = 'sell'
+            signals[timeframe_id] = signal
+            if ema_50 is not None and close != ema_50:
+                trends[timeframe_id] = 'bullish' if close > ema_50 else 'bearish'
+
+        m1, m15, h1 = signals.get(signal_id), signals.get(confirmation_id), trends.get(trend_id)
+        trading_signal = None
+        if m1 == 'buy' and m15 in ('buy', None) and h1 == 'bullish':
+            trading_signal = 'buy'
+        elif m1 == 'sell' and m15 in ('sell', None) and h1 == 'bearish':
+            trading_signal = 'sell'
+        return [(('trading_signal',), [(trading_signal,)])]
+
+    # ===== FILLS =====
+
+    def last_price(self, ticker):
+        """Close of the newest bar of the ticker's lowest timeframe"""
+        row = self._query('SELECT b.closeValue FROM "tms.bars" b '
+                          'JOIN "ref.assetMasterTable" a ON a.ID = b.TickerJID '
+                          'WHERE a.ticker = ? ORDER BY b.timeframeID, b.barTime DESC LIMIT 1', (ticker,))
+        return row[0][0] if row else None
+
+    def _fill_signal(self, signal_id):
+        signal = self._query('SELECT s.ticker, s.volume, t.TypeName, s.positionLabel FROM "algo.tradingSignals" s '
+                             'JOIN "algo.strategySignalType" t ON t.ID = s.signalTypeID '
+                             'WHERE s.signalID = ? AND s.filledTime IS NULL', (signal_id,))
+        if not signal:
+            return False
+        ticker, volume, signal_type, label = signal[0]
+        price = self.last_price(ticker)
+        if price is None:
+            return False
+
+        now = utcnow()
+        if signal_type.upper() == 'DROP':
+            position = self._query('SELECT ID, direction, volume, entryPrice, createdTime FROM "trd.trades_v" '
+                                   'WHERE orderUUID = ?', (label,))
+            if position:
+                position_id, direction, position_volume, entry_price, created = position[0]
+                self._conn.execute('DELETE FROM "trd.trades_v" WHERE ID = ?', (position_id,))
+                self._conn.execute('INSERT INTO "trd.closedPositions" (ID, orderUUID, ticker, direction, volume, '
+                                   'entryPrice, exitPrice, createdTime, closedTime) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                   (position_id, label, ticker, direction, position_volume, entry_price, price,
+                                    created, now))
+        else:
+            self._conn.execute('INSERT INTO "trd.trades_v" (orderUUID, ticker, direction, volume, entryPrice, '
+                               'createdTime, tradeType) VALUES (?, ?, ?, ?, ?, ?, \'POSITION\')',
+                               (label, ticker, signal_type.capitalize(), volume, price, now))
+        self._conn.execute('UPDATE "algo.tradingSignals" SET filledTime = ?, fillPrice = ? WHERE signalID = ?',
+                           (now, price, signal_id))
+        return True
+
+    def fill_pending_signals(self):
+        """Fill every unfilled signal at the current last price; returns how many filled"""
+        with self._lock:
+            pending = [row[0] for row in self._query('SELECT signalID FROM "algo.tradingSignals" '
+                                                     'WHERE filledTime IS NULL ORDER BY signalID')]
+            return sum(1 for signal_id in pending if self._fill_signal(signal_id))
+
+    # ===== SETUP AND DATA =====
+
+    def add_ticker(self, ticker, ticker_jid=None):
+        """ref.assetMasterTable row; returns the TickerJID"""
+        with self._lock:
+            existing = self._scalar('SELECT ID FROM "ref.assetMasterTable" WHERE ticker = ?', (ticker,))
+            if existing is not None:
+                return existing
+            cursor = self._conn.execute('INSERT INTO "ref.assetMasterTable" (ID, ticker) VALUES (?, ?)',
+                                        (ticker_jid, ticker))
+            return cursor.lastrowid
+
+    def add_config(self, configid, ticker, timeframe_signal='M1', timeframe_confirmation='M15',
+                   timeframe_trend='H1', open_volume=0.01, trading_close_utc=None, trading_start_utc=None,
+                   broker_id=2, platform_id=1, **parameters):
+        """algo.ConfigurationSets row in the same JSON shape as production"""
+        self.add_ticker(ticker)
+        values = dict(parameters, ticker=ticker, timeframe_signal=timeframe_signal,
+                      timeframe_confirmation=timeframe_confirmation, timeframe_trend=timeframe_trend,
+                      open_volume=open_volume, trading_close_utc=trading_close_utc,
+                      trading_start_utc=trading_start_utc, broker_id=broker_id, platform_id=platform_id)
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO "algo.ConfigurationSets" (Id, ParameterValuesJson) '
+                               'VALUES (?, ?)', (configid, json.dumps(values)))
+
+    def request_termination(self, configid):
+        """EXEC algo.sp_RequestStrategyTermination"""
+        with self._lock:
+            return bool(self._sp_request_strategy_termination(configid))
+
+    def _indicator_rows(self, ticker_jid, timeframe_id, bar_id, values):
+        ema = (bar_id, ticker_jid, values['BarTime'], timeframe_id) + tuple(
+            values.get(name) for name in EMA_COLUMN_NAMES)
+        momentum = (bar_id, ticker_jid, values['BarTime'], timeframe_id) + tuple(
+            int(values[name]) if name.endswith('_Flag') else values[name] for name in MOMENTUM_COLUMN_NAMES)
+        return ema, momentum
+
+    def _insert_indicators(self, ema_rows, momentum_rows):
+        self._conn.executemany(f'INSERT OR REPLACE INTO "tms.EMA" (BarID, TickerJID, BarTime, TimeFrameID, '
+                               f'{", ".join(EMA_COLUMN_NAMES)}) VALUES ({", ".join(["?"] * (4 + len(EMA_COLUMN_NAMES)))})',
+                               ema_rows)
+        self._conn.executemany(f'INSERT OR REPLACE INTO "tms.Indicators_Momentum" (ID, TickerJID, BarTime, TimeFrameID, '
+                               f'{", ".join(MOMENTUM_COLUMN_NAMES)}) '
+                               f'VALUES ({", ".join(["?"] * (4 + len(MOMENTUM_COLUMN_NAMES)))})', momentum_rows)
+
+    def _series_for(self, ticker_jid, timeframe_id):
+        key = (ticker_jid, timeframe_id)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = IndicatorSeries()
+            # Continue from bars already stored
+            for bar in reversed(self._query('SELECT barTime, openValue, highValue, lowValue, closeValue '
+                                            'FROM "tms.bars" WHERE TickerJID = ? AND timeframeID = ? '
+                                            'ORDER BY barTime DESC LIMIT ?', (ticker_jid, timeframe_id,
+                                                                              series.bars.capacity))):
+                series.update(*bar)
+        return series
+
+    def publish_bar(self, ticker_jid, timeframe_id, bar_time, open_, high, low, close):
+        """Insert one closed bar (and its indicator rows), as the bar loader does in production"""
+        with self._lock:
+            series = self._series_for(ticker_jid, timeframe_id) if self.indicators else None
+            cursor = self._conn.execute('INSERT OR IGNORE INTO "tms.bars" (TickerJID, barTime, timeframeID, openValue, '
+                                        'closeValue, highValue, lowValue) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                        (ticker_jid, bar_time, timeframe_id, open_, close, high, low))
+            if not cursor.rowcount:
+                return False
+            if series is not None:
+                ema, momentum = self._indicator_rows(ticker_jid, timeframe_id, cursor.lastrowid,
+                                                     series.update(bar_time, open_, high, low, close))
+                self._insert_indicators([ema], [momentum])
+            return True
+
+    def load_bars(self, ticker_jid, timeframe_id, bars):
+        """Bulk insert (bar_time, open, high, low, close) rows of one pair with indicators; returns rows added"""
+        bars = sorted(bars)
+        with self._lock:
+            last = self._scalar('SELECT MAX(barTime) FROM "tms.bars" WHERE TickerJID = ? AND timeframeID = ?',
+                                (ticker_jid, timeframe_id))
+            if last is not None:
+                last = datetime.fromisoformat(last)
+                bars = [bar for bar in bars if bar[0] > last]
+            if not bars:
+                return 0
+
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany('INSERT OR IGNORE INTO "tms.bars" (TickerJID, barTime, timeframeID, '
+                                       'openValue, highValue, lowValue, closeValue) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                       [(ticker_jid, bar_time, timeframe_id, o, h, l, c)
+                                        for bar_time, o, h, l, c in bars])
+                if self.indicators:
+                    series = self._series_for(ticker_jid, timeframe_id) if last is not None else IndicatorSeries()
+                    self._series[(ticker_jid, timeframe_id)] = series
+                    ids = dict(self._query('SELECT barTime, ID FROM "tms.bars" '
+                                           'WHERE TickerJID = ? AND timeframeID = ? AND barTime >= ?',
+                                           (ticker_jid, timeframe_id, bars[0][0])))
+                    ema_rows, momentum_rows = [], []
+                    for bar in bars:
+                        ema, momentum = self._indicator_rows(ticker_jid, timeframe_id, ids[bar[0]],
+                                                             series.update(*bar))
+                        ema_rows.append(ema)
+                        momentum_rows.append(momentum)
+                    self._insert_indicators(ema_rows, momentum_rows)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return len(bars)
+
+    def load_historical_csv(self, base_path=None, tickers=None, ticker_jids=None):
+        """
+        Load OLTP/historicalData CSVs: <TICKER>_<timeframe>.csv or <TICKER>.csv (daily).
+        Tick and ETF files are skipped; the first file of a (ticker, timeframe) wins.
+
+        Args:
+            base_path: historicalData directory (default: the repository copy)
+            tickers: Only these tickers (optional)
+            ticker_jids: ticker -> TickerJID to match production IDs (optional)
+
+        Returns:
+            dict (ticker, timeframe_id) -> bars added
+        """
+        base_path = base_path or DEFAULT_CSV_PATH
+        ticker_jids = ticker_jids or {}
+        loaded = {}
+
+        for directory, _, files in sorted(os.walk(base_path)):
+            for file_name in sorted(files):
+                key = csv_series(file_name)
+                if key is None or (tickers and key[0] not in tickers) or key in loaded:
+                    continue
+                ticker, timeframe_id = key
+                bars = read_csv_bars(os.path.join(directory, file_name))
+
+                ticker_jid = self.add_ticker(ticker, ticker_jids.get(ticker))
+                loaded[(ticker, timeframe_id)] = self.load_bars(ticker_jid, timeframe_id, bars)
+                print(f"[LocalDB] {file_name}: {loaded[(ticker, timeframe_id)]} bars -> "
+                      f"TickerJID {ticker_jid}, timeframe {timeframe_id}")
+        return loaded
+
+    def get_stats(self):
+        """Row counts of the main tables"""
+        with self._lock:
+            return {table.split('.')[-1]: self._scalar(f'SELECT COUNT(*) FROM "{table}"')
+                    for table in ('tms.bars', 'tms.EMA', 'tms.Indicators_Momentum', 'trd.trades_v',
+                                  'algo.strategyTracker', 'algo.tradingSignals', 'logs.strategyExecution')}
+
+
+# ===== CONNECTIONS =====
+
+class LocalDatabaseProvider(EmulatedConnectionProvider):
+    """PooledConnectionProvider over a LocalDatabase; pass it to DatabaseHelper, StrategyBase or StrategyHost"""
+
+    def __init__(self, database=None, pool_size=20, max_overflow=10, acquire_timeout=30.0):
+        """
+        Args:
+            database: LocalDatabase or SQLite path (default: new in-memory database)
+            pool_size: Number of persistent connections
+            max_overflow: Additional connections if pool exhausted
+            acquire_timeout: Seconds to wait for a free connection before RuntimeError
+        """
+        if database is None or isinstance(database, str):
+            database = LocalDatabase(database or ':memory:')
+        self.database = database
+        super().__init__(database, pool_size=pool_size, max_overflow=max_overflow, acquire_timeout=acquire_timeout,
+                         name=f'LOCAL:{database.path}')
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Build a local SQLite stand-in of the cTrader schema')
+    parser.add_argument('--db', default='anfund_local.db', help='SQLite file')
+    parser.add_argument('--load', nargs='?', const=DEFAULT_CSV_PATH, default=None,
+                        help='Load historicalData CSVs (default: repository copy)')
+    parser.add_argument('--tickers', nargs='+', default=None, help='Only these tickers')
+    parser.add_argument('--no-indicators', action='store_true', help='Skip tms.EMA / Indicators_Momentum')
+    args = parser.parse_args()
+
+    db = LocalDatabase(args.db, indicators=not args.no_indicators)
+    if args.load:
+        db.load_historical_csv(args.load, tickers=args.tickers)
+    print(f"[LocalDB] {args.db}: {db.get_stats()}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
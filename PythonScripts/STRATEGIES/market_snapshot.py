@@ -0,0 +1,87 @@
+"""
+Market Snapshot - latest and previous bar with EMA and momentum indicators
+for many (TickerJID, timeframeID) pairs in one statement.
+
+Values are converted once here (float / bool / None), so strategies do not
+deal with Decimal columns.
+"""
+
+from collections import namedtuple
+
+BarSnapshot = namedtuple('BarSnapshot', [
+    'bar_time', 'open', 'high', 'low', 'close',
+    'ema_20', 'ema_50',  # tms.EMA EMA_20_SHORT, EMA_50_MEDIUM
+    'rsi_14', 'oversold', 'overbought'  # tms.Indicators_Momentum
+])
+
+# current / previous are BarSnapshot or None
+MarketSnapshot = namedtuple('MarketSnapshot', ['current', 'previous'])
+
+# Two parameters per pair, SQL Server allows 2100 per statement
+MAX_PAIRS_PER_QUERY = 1000
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def _bool(value):
+    return bool(value) if value is not None else None
+
+
+def fetch_market_snapshot(connection, pairs):
+    """
+    Args:
+        connection: Open database connection
+        pairs: Iterable of (ticker_jid, timeframe_id)
+
+    Returns:
+        dict (ticker_jid, timeframe_id) -> MarketSnapshot; pairs without bars are missing
+    """
+    pairs = list(dict.fromkeys((int(ticker_jid), int(timeframe_id)) for ticker_jid, timeframe_id in pairs))
+    rows_by_pair = {}
+    if not pairs:
+        return {}
+
+    cursor = connection.cursor()
+    try:
+        for start in range(0, len(pairs), MAX_PAIRS_PER_QUERY):
+            chunk = pairs[start:start + MAX_PAIRS_PER_QUERY]
+            values = ", ".join(["(?, ?)"] * len(chunk))
+            params = [value for pair in chunk for value in pair]
+
+            # Last two bars per pair via idx_bars_ticker_time; momentum rows share
+            # the bar ID (clustered PK), EMA rows are matched on bar time
+            cursor.execute(f"""
+                SELECT s.TickerJID, s.TimeFrameID,
+                       b.barTime, b.openValue, b.highValue, b.lowValue, b.closeValue,
+                       e.EMA_20_SHORT, e.EMA_50_MEDIUM,
+                       m.RSI_14, m.Oversold_Flag, m.Overbought_Flag
+                FROM (VALUES {values}) AS s(TickerJID, TimeFrameID)
+                CROSS APPLY (
+                    SELECT TOP 2 ID, barTime, openValue, highValue, lowValue, closeValue
+                    FROM tms.bars
+                    WHERE TickerJID = s.TickerJID AND timeframeID = s.TimeFrameID
+                    ORDER BY barTime DESC
+                ) b
+                OUTER APPLY (
+                    SELECT TOP 1 EMA_20_SHORT, EMA_50_MEDIUM
+                    FROM tms.EMA
+                    WHERE TickerJID = s.TickerJID AND TimeFrameID = s.TimeFrameID AND BarTime = b.barTime
+                ) e
+                LEFT JOIN tms.Indicators_Momentum m ON m.ID = b.ID
+                ORDER BY s.TickerJID, s.TimeFrameID, b.barTime DESC
+            """, params)
+
+            for row in cursor.fetchall():
+                ticker_jid, timeframe_id, bar_time, o, h, l, c, ema_20, ema_50, rsi, oversold, overbought = row
+                rows_by_pair.setdefault((int(ticker_jid), int(timeframe_id)), []).append(BarSnapshot(
+                    bar_time, _float(o), _float(h), _float(l), _float(c),
+                    _float(ema_20), _float(ema_50),
+                    _float(rsi), _bool(oversold), _bool(overbought)
+                ))
+    finally:
+        cursor.close()
+
+    return {pair: MarketSnapshot(rows[0], rows[1] if len(rows) > 1 else None)
+            for pair, rows in rows_by_pair.items()}
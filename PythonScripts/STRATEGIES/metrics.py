@@ -0,0 +1,534 @@
+"""
+Metrics - latency histograms and counters for the strategy loop.
+
+Histograms are HDR-style (log-linear buckets, under 1% relative error) and
+cheap enough to record every cycle and every DB call. REGISTRY is shared by
+the whole process:
+
+    cycle_seconds{strategy}           one strategy cycle
+    db_call_seconds{statement}        one execute(), by procedure/function/table
+    signal_submit_seconds{strategy}   bar arrival (or cycle start) -> sp_CreateSignal
+    pool_wait_seconds                 waiting for a pooled connection
+    queries_per_cycle{strategy}       DB calls made by one cycle
+
+Export with MetricsServer (Prometheus text on /metrics, JSON on /metrics.json)
+or JsonMetricsWriter (periodic file).
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Bucket precision: values below 2**SUB_BUCKET_BITS are exact, above that each
+# power of two is split into 2**(SUB_BUCKET_BITS - 1) buckets; 8 bits -> 128
+# buckets, so a percentile (bucket upper bound) is at most 1/128 = 0.8% high
+SUB_BUCKET_BITS = 8
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+PREFIX = 'anfund_'
+
+
+class Histogram:
+    """Log-linear histogram of non-negative values"""
+
+    def __init__(self, scale=1_000_000):
+        """
+        Args:
+            scale: Recorded units per value unit (1_000_000 records seconds at microsecond resolution)
+        """
+        self.scale = scale
+        self._buckets = {}  # (shift, sub) -> count
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def _bucket(units):
+        shift = max(0, units.bit_length() - SUB_BUCKET_BITS)
+        return shift, units >> shift
+
+    def observe(self, value):
+        """Record one value"""
+        if value < 0:
+            value = 0.0
+        key = self._bucket(int(value * self.scale))
+        with self._lock:
+            self._buckets[key] = self._buckets.get(key, 0) + 1
+            self.count += 1
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def percentile(self, q):
+        """Value at quantile q (0..1): upper bound of its bucket, capped at max"""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = max(1, int(q * self.count + 0.5))
+            seen = 0
+            for shift, sub in sorted(self._buckets):
+                seen += self._buckets[(shift, sub)]
+                if seen >= rank:
+                    upper = (((sub + 1) << shift) - 1) / self.scale
+                    return min(upper, self.max)
+            return self.max
+
+    def snapshot(self):
+        """count / sum / min / max / mean plus QUANTILES"""
+        with self._lock:
+            count, total, low, high = self.count, self.total, self.min, self.max
+        result = {
+            'count': count,
+            'sum': total,
+            'min': low,
+            'max': high,
+            'mean': total / count if count else None
+        }
+        for q in QUANTILES:
+            result[f'p{q * 100:g}'] = self.percentile(q)
+        return result
+
+
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+_SQL_NAME = re.compile(
+    r"^\s*(?:EXEC(?:UTE)?\s+(?:@\w+\s*=\s*)?(?P<proc>[\w.\[\]]+)"
+    r"|(?P<verb>SELECT|INSERT|UPDATE|DELETE|MERGE|WITH)\b)",
+    re.IGNORECASE)
+_SQL_FUNCTION = re.compile(r"\b(\w+\.\w+)\s*\(", re.IGNORECASE)
+_SQL_OBJECT = re.compile(r"\b(?:FROM|INTO|UPDATE|MERGE)\s+([\w.\[\]]+)", re.IGNORECASE)
+_SQL_KEYWORDS = {'select', 'values', 'openjson', 'openquery'}
+_name_cache = {}
+
+
+def statement_name(sql):
+    """
+    Short label for a SQL statement: the procedure for EXEC, the first
+    schema.function(...) call, otherwise verb + first table
+    """
+    cached = _name_cache.get(sql)
+    if cached is not None:
+        return cached
+
+    match = _SQL_NAME.match(sql)
+    if match is None:
+        name = 'other'
+    elif match.group('proc'):
+        name = match.group('proc').replace('[', '').replace(']', '')
+    else:
+        function = _SQL_FUNCTION.search(sql)
+        if function is not None and function.group(1).split('.')[0].lower() not in _SQL_KEYWORDS:
+            name = function.group(1)
+        else:
+            table = _SQL_OBJECT.search(sql)
+            verb = match.group('verb').upper()
+            name = f"{verb} {table.group(1).replace('[', '').replace(']', '')}" if table else verb
+
+    if len(_name_cache) < 1000:
+        _name_cache[sql] = name
+    return name
+
+
+class MetricsRegistry:
+    """Named, labelled histograms and counters plus stats collectors"""
+
+    def __init__(self, prefix=PREFIX):
+        self.prefix = prefix
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = {}  # (name, labels) -> Counter
+        self._collectors = {}  # prefix -> callable returning a stats dict
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def histogram(self, name, scale=1_000_000, **labels):
+        """Histogram for name + labels, created on first use"""
+        key = self._key(name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(scale))
+        return histogram
+
+    def counter(self, name, **labels):
+        """Counter for name + labels, created on first use"""
+        key = self._key(name, labels)
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(key, Counter())
+        return counter
+
+    def add_collector(self, prefix, collect):
+        """
+        Args:
+            prefix: Metric name prefix, e.g. 'pool'
+            collect: Callable returning a (nested) dict of numbers, e.g. provider.get_stats
+        """
+        with self._lock:
+            self._collectors[prefix] = collect
+
+    def remove_collector(self, prefix):
+        with self._lock:
+            self._collectors.pop(prefix, None)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """with REGISTRY.timer('name'): ... records the block duration in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name, **labels).observe(time.perf_counter() - start)
+
+    # ===== CYCLE CONTEXT =====
+
+    @contextmanager
+    def cycle(self, strategy, origin=None):
+        """
+        Time one strategy cycle on this thread and count its DB calls.
+
+        Args:
+            strategy: Strategy label
+            origin: time.monotonic() the cycle's signal is measured from
+                (bar arrival); defaults to the cycle start
+        """
+        state = {'strategy': strategy, 'queries': 0,
+                 'origin': time.monotonic() if origin is None else origin}
+        outer = getattr(self._local, 'cycle', None)
+        self._local.cycle = state
+        start = time.perf_counter()
+        try:
+            yield state
+        finally:
+            self._local.cycle = outer
+            self.histogram('cycle_seconds', strategy=strategy).observe(time.perf_counter() - start)
+            self.histogram('queries_per_cycle', scale=1, strategy=strategy).observe(state['queries'])
+            self.counter('cycles_total', strategy=strategy).inc()
+
+    def current_cycle(self):
+        """State of the cycle running on this thread, None outside cycles"""
+        return getattr(self._local, 'cycle', None)
+
+    @contextmanager
+    def bind_cycle(self, state):
+        """Count DB calls made on this (worker) thread towards a cycle of another thread"""
+        outer = getattr(self._local, 'cycle', None)
+        self._local.cycle = state
+        try:
+            yield state
+        finally:
+            self._local.cycle = outer
+
+    @contextmanager
+    def db_call(self, sql):
+        """Time one statement; counts towards the current cycle"""
+        name = statement_name(sql) if isinstance(sql, str) else 'other'
+        state = getattr(self._local, 'cycle', None)
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.histogram('db_call_seconds', statement=name).observe(time.perf_counter() - start)
+            if failed:
+                self.counter('db_errors_total', statement=name).inc()
+            if state is not None:
+                state['queries'] += 1
+                if name.lower() == 'trd.sp_createsignal':
+                    self.histogram('signal_submit_seconds', strategy=state['strategy']).observe(
+                        time.monotonic() - state['origin'])
+
+    # ===== EXPORT =====
+
+    def _collected(self):
+        with self._lock:
+            collectors = list(self._collectors.items())
+        values = {}
+        for prefix, collect in collectors:
+            try:
+                _flatten(prefix, collect(), values)
+            except Exception as e:
+                print(f"[Metrics] Collector {prefix} failed: {e}")
+        return values
+
+    def to_dict(self):
+        """All metrics as plain JSON-serialisable data"""
+        with self._lock:
+            histograms = list(self._histograms.items())
+            counters = list(self._counters.items())
+        return {
+            'timestamp': time.time(),
+            'histograms': [{'name': name, 'labels': dict(labels), **histogram.snapshot()}
+                           for (name, labels), histogram in sorted(histograms)],
+            'counters': [{'name': name, 'labels': dict(labels), 'value': counter.value}
+                         for (name, labels), counter in sorted(counters)],
+            'gauges': self._collected()
+        }
+
+    def render_prometheus(self):
+        """Prometheus text exposition format; histograms are exported as summaries"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        lines = []
+        declared = set()
+        for (name, labels), histogram in histograms:
+            metric = self.prefix + name
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} summary")
+            snapshot = histogram.snapshot()
+            for q in QUANTILES:
+                value = snapshot[f'p{q * 100:g}']
+                lines.append(f"{metric}{_labels(labels, quantile=q)} {_number(value)}")
+            lines.append(f"{metric}_sum{_labels(labels)} {_number(snapshot['sum'])}")
+            lines.append(f"{metric}_count{_labels(labels)} {snapshot['count']}")
+
+        for (name, labels), counter in counters:
+            metric = self.prefix + name
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_labels(labels)} {counter.value}")
+
+        for name, value in sorted(self._collected().items()):
+            metric = self.prefix + name
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {_number(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Drop all histograms and counters (collectors stay)"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}_{key}", item, out)
+    elif isinstance(value, (bool, int, float)):
+        out[re.sub(r'\W', '_', prefix)] = int(value) if isinstance(value, bool) else value
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + [(k, v) for k, v in extra.items()]
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    return 'NaN' if value is None else repr(float(value))
+
+
+# Process-wide registry used by the framework
+REGISTRY = MetricsRegistry()
+
+
+# ===== RAW CONNECTIONS =====
+
+class InstrumentedCursor:
+    """pyodbc cursor wrapper that times execute() calls in a registry"""
+
+    def __init__(self, cursor, registry=REGISTRY):
+        self._cursor = cursor
+        self._registry = registry
+
+    def execute(self, sql, *args, **kwargs):
+        with self._registry.db_call(sql):
+            self._cursor.execute(sql, *args, **kwargs)
+        return self
+
+    def executemany(self, sql, *args, **kwargs):
+        with self._registry.db_call(sql):
+            self._cursor.executemany(sql, *args, **kwargs)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._cursor.close()
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Connection wrapper whose cursors are InstrumentedCursor; the raw connection stays in .raw"""
+
+    def __init__(self, connection, registry=REGISTRY):
+        self.raw = connection
+        self._registry = registry
+
+    def cursor(self):
+        return InstrumentedCursor(self.raw.cursor(), self._registry)
+
+    def execute(self, sql, *args, **kwargs):
+        cursor = self.cursor()
+        return cursor.execute(sql, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __setattr__(self, name, value):
+        if name in ('raw', '_registry'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.raw, name, value)
+
+
+def instrument_connection(connection, registry=REGISTRY):
+    """Wrap a raw pyodbc connection so its statements are timed"""
+    if isinstance(connection, InstrumentedConnection):
+        return connection
+    return InstrumentedConnection(connection, registry)
+
+
+# ===== EXPORTERS =====
+
+class MetricsServer:
+    """Local HTTP endpoint: /metrics (Prometheus text) and /metrics.json"""
+
+    def __init__(self, registry=REGISTRY, host='127.0.0.1', port=9108):
+        """
+        Args:
+            registry: MetricsRegistry to export
+            host: Bind address (local only by default)
+            port: TCP port, 0 picks a free one
+        """
+        # Imported here: http.server is only needed when the endpoint is enabled
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] == '/metrics':
+                    body = registry_ref.render_prometheus().encode()
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif self.path.split('?')[0] == '/metrics.json':
+                    body = json.dumps(registry_ref.to_dict(), default=str).encode()
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.registry = registry
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.address = self._server.server_address
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True)
+            self._thread.start()
+            print(f"[Metrics] Serving http://{self.address[0]}:{self.address[1]}/metrics")
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._server.server_close()
+
+
+class JsonMetricsWriter:
+    """Writes registry.to_dict() to a JSON file every interval seconds"""
+
+    def __init__(self, path, registry=REGISTRY, interval=10.0):
+        """
+        Args:
+            path: Output file; replaced atomically on each write
+            registry: MetricsRegistry to export
+            interval: Seconds between writes
+        """
+        self.path = path
+        self.registry = registry
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def write(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.registry.to_dict(), f, default=str, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.write()
+            except Exception as e:
+                print(f"[Metrics] Write to {self.path} failed: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._loop, name='metrics-json', daemon=True)
+            self._thread.start()
+            print(f"[Metrics] Writing {self.path} every {self.interval}s")
+        return self
+
+    def stop(self):
+        """Stop and write the final snapshot"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        try:
+            self.write()
+        except Exception as e:
+            print(f"[Metrics] Write to {self.path} failed: {e}")
+
+
+def start_exporters(port=None, path=None, interval=10.0, registry=REGISTRY):
+    """Start the exporters selected on a command line; returns a list to stop() later"""
+    exporters = []
+    if port is not None:
+        exporters.append(MetricsServer(registry, port=port).start())
+    if path:
+        exporters.append(JsonMetricsWriter(path, registry, interval).start())
+    return exporters
@@ -12,10 +12,11 @@ from ANFramework import StrategyBase, execute_signal_procedure  # ← Импор
 class MTFTrendStrategy(StrategyBase):
     """Multi-Timeframe Trend Following Strategy"""
 
-    def __init__(self, configid):
+    def __init__(self, configid, connection_provider=None):
         print(f"[MTF Trend] Initializing strategy for config: {configid}")
 
-        super().__init__(configid=configid, timer_interval=0.5, timeframe_id=1)
+        super().__init__(configid=configid, timer_interval=0.5, timeframe_id=1,
+                         connection_provider=connection_provider)
 
         # Параметры БУДУТ загружены после _register_and_load_configuration()
         self.config_data = None
@@ -86,8 +87,11 @@ class MTFTrendStrategy(StrategyBase):
 
             # 3. Handle signal based on close_existing parameter
             if has_position:
-                # If close_existing=True OR directions don't match - close and open
-                if close_existing or current_direction != signal:
+                # Opposite signal - drop and open in one signal batch
+                if current_direction != signal:
+                    print(f"[MTF Trend] Reversing position {position['id']} ({current_direction}) to {signal}")
+                    self.reverse_position(self.configid, position, signal)
+                elif close_existing:
                     print(f"[MTF Trend] Closing position {position['id']} ({current_direction}) before opening {signal}")
                     self.close_position(self.configid, position['id'])
                     # Framework will handle confirmation and opening new position
@@ -108,6 +112,8 @@ def main():
     parser = argparse.ArgumentParser(description='MTF Trend Strategy')
     parser.add_argument('--configID', type=int, required=True, dest='config_id',
                         help='Configuration ID from database')
+    parser.add_argument('--bars', action='store_true',
+                        help='Run on new bars (BarClock) instead of the 0.5s timer')
     args = parser.parse_args()
 
     try:
@@ -123,7 +129,16 @@ def main():
         print("Configuration loaded successfully")
 
         # ЗАПУСКАЕМ СТРАТЕГИЮ
-        strategy.run()
+        if args.bars:
+            from bar_clock import BarClock
+            bar_clock = BarClock(strategy.connection_provider)
+            bar_clock.start()
+            try:
+                strategy.run(bar_clock=bar_clock)
+            finally:
+                bar_clock.stop()
+        else:
+            strategy.run()
 
     except Exception as e:
         print(f"Error: {e}")
@@ -0,0 +1,318 @@
+"""
+Order Tracker - futures for trd.sp_CreateSignal submissions.
+
+An order resolves as soon as a PositionCache delta shows the fill: a new
+position for buy/sell, the position gone for drop, both for a reversal. While orders are pending
+the tracker refreshes the cache itself, with one adaptive backoff shared by all
+pending orders. Orders not filled in time resolve to None.
+
+Futures are concurrent.futures.Future; use asyncio.wrap_future() to await them.
+"""
+
+import time
+import threading
+from concurrent.futures import Future
+
+from sp_create_signal import execute_signal_procedure, execute_signal_batch, reversal_signals
+from metrics import REGISTRY
+
+
+def poll_with_backoff(check, timeout, initial_interval=0.05, max_interval=1.0, factor=2.0):
+    """
+    Call check() until it returns a truthy value, sleeping initial_interval,
+    then factor times longer each time up to max_interval.
+    Returns the value, or None after timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    interval = initial_interval
+    while True:
+        result = check()
+        if result:
+            return result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        time.sleep(min(interval, remaining))
+        interval = min(interval * factor, max_interval)
+
+
+class PendingOrder:
+    """One expected fill"""
+
+    def __init__(self, kind, deadline, configid=None, ticker=None, direction=None,
+                 position_id=None, exclude_ids=()):
+        self.kind = kind  # 'open', 'close' or 'reverse' (close position_id, then open)
+        self.deadline = deadline
+        self.configid = configid
+        self.ticker = ticker
+        self.direction = direction.lower() if direction else None
+        self.position_id = position_id
+        self.exclude_ids = set(exclude_ids)
+        self.submitted = time.monotonic()
+        self.future = Future()
+        self.closed = False  # reverse: old position seen gone
+        self.opened = None  # reverse: new position seen
+
+    def matches_open(self, position):
+        if position['id'] in self.exclude_ids:
+            return False
+        if self.configid is not None and position.get('configID') != self.configid:
+            return False
+        if self.ticker is not None and position.get('ticker') != self.ticker:
+            return False
+        if self.direction is not None and position.get('direction', '').lower() != self.direction:
+            return False
+        return True
+
+
+class OrderTracker:
+    """Resolves order futures from PositionCache deltas"""
+
+    def __init__(self, position_cache, default_timeout=10.0, initial_interval=0.05,
+                 max_interval=1.0, backoff_factor=2.0):
+        """
+        Args:
+            position_cache: PositionCache to watch (and refresh while orders are pending)
+            default_timeout: Seconds before an unfilled order resolves to None
+            initial_interval: First refresh delay after a submission
+            max_interval: Upper bound of the refresh delay
+            backoff_factor: Delay multiplier after each refresh without a fill
+        """
+        self.position_cache = position_cache
+        self.default_timeout = default_timeout
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+
+        self._pending = []
+        self._condition = threading.Condition()
+        self._reset_backoff = False
+        self._stopped = False
+
+        self.filled = 0
+        self.timed_out = 0
+        self.fill_latency_total = 0.0
+
+        self._thread = None
+
+    # ===== EXPECTATIONS =====
+
+    def _add(self, order):
+        with self._condition:
+            self._pending.append(order)
+            self._reset_backoff = True
+            self._condition.notify_all()
+        return order.future
+
+    def expect_open(self, configid, ticker=None, direction=None, timeout=None, accept_existing=False):
+        """
+        Future resolving to the position dict of the next matching fill.
+        Register before submitting; positions already open are ignored
+        unless accept_existing is True.
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        existing = self.position_cache.get_positions(configid)
+        order = PendingOrder('open', time.monotonic() + timeout, configid=configid, ticker=ticker,
+                             direction=direction, exclude_ids=[] if accept_existing else [p['id'] for p in existing])
+
+        if accept_existing:
+            for position in existing:
+                if order.matches_open(position):
+                    order.future.set_result(position)
+                    return order.future
+
+        return self._add(order)
+
+    def expect_close(self, position_id, timeout=None):
+        """Future resolving to the removed position dict once it is gone"""
+        timeout = self.default_timeout if timeout is None else timeout
+        order = PendingOrder('close', time.monotonic() + timeout, position_id=position_id)
+
+        position = self.position_cache.get(position_id)
+        if position is None:
+            order.future.set_result({'id': position_id})
+            return order.future
+
+        return self._add(order)
+
+    def expect_reversal(self, configid, position_id, ticker=None, direction=None, timeout=None):
+        """Future resolving to the new position once position_id is gone and the new one is open"""
+        timeout = self.default_timeout if timeout is None else timeout
+        existing = self.position_cache.get_positions(configid)
+        order = PendingOrder('reverse', time.monotonic() + timeout, configid=configid, ticker=ticker,
+                             direction=direction, position_id=position_id,
+                             exclude_ids=[p['id'] for p in existing])
+        order.closed = self.position_cache.get(position_id) is None
+        return self._add(order)
+
+    # ===== SUBMISSION =====
+
+    def submit_open(self, connection, configid, ticker, direction, volume,
+                    broker_id=None, platform_id=None, timeout=None):
+        """EXEC trd.sp_CreateSignal for buy/sell; returns Future of the new position (None on failure/timeout)"""
+        future = self.expect_open(configid, ticker=ticker, direction=direction, timeout=timeout)
+        sent = execute_signal_procedure(
+            connection=connection, ticker=ticker, direction=direction, volume=volume,
+            order_price=None, stop_loss=None, take_profit=None, expiry=None,
+            broker_id=broker_id, platform_id=platform_id,
+            trade_id=None, trade_type=None, strategy_configuration_id=configid
+        )
+        if not sent:
+            self._cancel(future)
+        return future
+
+    def submit_close(self, connection, configid, position, broker_id=None, platform_id=None, timeout=None):
+        """EXEC trd.sp_CreateSignal drop for a position; returns Future resolved when it is gone"""
+        future = self.expect_close(position['id'], timeout=timeout)
+        sent = execute_signal_procedure(
+            connection=connection, ticker=position['ticker'], direction='drop',
+            volume=position.get('volume', 0), order_price=None, stop_loss=None, take_profit=None,
+            expiry=None, broker_id=broker_id, platform_id=platform_id,
+            trade_id=position['id'], trade_type='POSITION', strategy_configuration_id=configid
+        )
+        if not sent:
+            self._cancel(future)
+        return future
+
+    def submit_reversal(self, connection, configid, position, direction, volume,
+                        broker_id=None, platform_id=None, timeout=None, drop_volume=0):
+        """
+        Drop position and open direction in one trd.sp_CreateSignal batch.
+        The drop is sent with drop_volume (0 as in StrategyBase, callers that
+        send the position volume on drops pass it).
+        Returns one Future of the new position, resolved when both legs are filled
+        (None on failure/timeout).
+        """
+        future = self.expect_reversal(configid, position['id'], ticker=position['ticker'],
+                                      direction=direction, timeout=timeout)
+        sent = execute_signal_batch(connection, reversal_signals(position, direction, volume, broker_id,
+                                                                 platform_id, configid, drop_volume))
+        if not sent:
+            self._cancel(future)
+        return future
+
+    def _cancel(self, future):
+        with self._condition:
+            self._pending = [order for order in self._pending if order.future is not future]
+        if not future.done():
+            future.set_result(None)
+
+    # ===== RESOLUTION =====
+
+    def _on_delta(self, added, removed, changed):
+        """PositionCache listener"""
+        resolved = []
+        with self._condition:
+            removed_ids = {position['id'] for position in removed}
+            still_pending = []
+            for order in self._pending:
+                match = None
+                if order.kind == 'open':
+                    match = next((p for p in added + changed if order.matches_open(p)), None)
+                elif order.kind == 'reverse':
+                    order.closed = order.closed or order.position_id in removed_ids
+                    order.opened = order.opened or next((p for p in added + changed if order.matches_open(p)), None)
+                    if order.closed:
+                        match = order.opened
+                elif order.position_id in removed_ids:
+                    match = next(p for p in removed if p['id'] == order.position_id)
+
+                if match is not None:
+                    resolved.append((order, match))
+                else:
+                    still_pending.append(order)
+            self._pending = still_pending
+            if resolved:
+                self._reset_backoff = True
+
+        now = time.monotonic()
+        for order, position in resolved:
+            self.filled += 1
+            self.fill_latency_total += now - order.submitted
+            REGISTRY.histogram('order_fill_seconds', kind=order.kind).observe(now - order.submitted)
+            if not order.future.done():
+                order.future.set_result(position)
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._condition:
+            expired = [order for order in self._pending if order.deadline <= now]
+            self._pending = [order for order in self._pending if order.deadline > now]
+
+        for order in expired:
+            self.timed_out += 1
+            print(f"[OrderTracker] {order.kind} order timed out "
+                  f"(config {order.configid}, position {order.position_id})")
+            if not order.future.done():
+                order.future.set_result(None)
+
+    def _poll_loop(self):
+        interval = self.initial_interval
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+                    interval = self.initial_interval
+                if self._stopped:
+                    return
+
+            try:
+                self.position_cache.refresh()
+            except Exception as e:
+                print(f"[OrderTracker] Position refresh error: {e}")
+            self._expire()
+
+            with self._condition:
+                if self._reset_backoff:
+                    self._reset_backoff = False
+                    interval = self.initial_interval
+                else:
+                    interval = min(interval * self.backoff_factor, self.max_interval)
+
+                if self._pending:
+                    next_deadline = min(order.deadline for order in self._pending)
+                    wait = max(0.0, min(interval, next_deadline - time.monotonic()))
+                    # A new submission notifies and cuts the wait short
+                    self._condition.wait(wait)
+
+    # ===== LIFECYCLE =====
+
+    def start(self):
+        """Listen to the cache and start the shared poller"""
+        if self._thread is not None:
+            return self
+        with self._condition:
+            self._stopped = False
+        self.position_cache.add_listener(self._on_delta)
+        self._thread = threading.Thread(target=self._poll_loop, name='order-tracker', daemon=True)
+        self._thread.start()
+        return self
+
+    def pending_count(self):
+        with self._condition:
+            return len(self._pending)
+
+    def stop(self):
+        """Stop polling; pending orders resolve to None"""
+        with self._condition:
+            self._stopped = True
+            pending, self._pending = self._pending, []
+            self._condition.notify_all()
+        for order in pending:
+            if not order.future.done():
+                order.future.set_result(None)
+        self.position_cache.remove_listener(self._on_delta)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def get_stats(self):
+        """Tracker statistics"""
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'filled': self.filled,
+            'timed_out': self.timed_out,
+            'avg_fill_seconds': round(self.fill_latency_total / self.filled, 3) if self.filled else None
+        }
@@ -0,0 +1,259 @@
+"""
+Position Cache - in-memory copy of open positions from trd.trades_v,
+kept in sync incrementally.
+
+Each refresh is one round trip. It returns a count/checksum fingerprint of
+the rows already known (ID <= watermark) and any rows above the watermark.
+Only when the fingerprint differs, closed or modified positions are resolved
+with a narrow ID/checksum query and a fetch of the changed rows.
+"""
+
+import threading
+
+from ANFramework import DatabaseHelper
+
+
+class PositionCache:
+    """Open positions indexed by ID, configID and ticker"""
+
+    # BINARY_CHECKSUM covers what strategies act on, plus the config mapping,
+    # which may land after the trade row
+    ROW_CHECKSUM = "BINARY_CHECKSUM(tv.ID, tv.direction, tv.volume, sp.strategy_configuration_id)"
+
+    POSITION_COLUMNS = f"""
+        tv.ID, tv.orderUUID, tv.ticker, tv.direction, tv.volume, tv.entryPrice, tv.createdTime,
+        sp.strategy_configuration_id, {ROW_CHECKSUM} AS row_checksum
+    """
+
+    FROM_POSITIONS = """
+        FROM trd.trades_v tv
+        LEFT JOIN algo.strategies_positions sp ON sp.trade_uuid = tv.orderUUID
+        WHERE tv.tradeType = 'POSITION'
+    """
+
+    def __init__(self, connection_provider=None, refresh_interval=0.5):
+        """
+        Args:
+            connection_provider: ConnectionProvider shared with the strategies (optional)
+            refresh_interval: Seconds between background refreshes
+        """
+        self.db = DatabaseHelper(connection_provider)
+        self.refresh_interval = refresh_interval
+
+        self._positions = {}  # ID -> position dict
+        self._checksums = {}  # ID -> row checksum
+        self._by_config = {}  # configID -> {ID: position}
+        self._by_ticker = {}  # ticker -> {ID: position}
+        self.watermark = 0  # highest trades_v ID seen
+        self._checksum_sum = 0
+
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.refreshes = 0
+        self.resyncs = 0
+
+    # ===== LOOKUPS =====
+
+    def get_positions(self, configid):
+        """Open positions of a strategy configuration"""
+        with self._lock:
+            return list(self._by_config.get(configid, {}).values())
+
+    def get_positions_by_ticker(self, ticker):
+        """Open positions on a ticker (all strategies and manual trades)"""
+        with self._lock:
+            return list(self._by_ticker.get(ticker, {}).values())
+
+    def get(self, position_id):
+        """Position by trades_v ID"""
+        with self._lock:
+            return self._positions.get(position_id)
+
+    def find_by_uuid(self, order_uuid):
+        """Position by orderUUID"""
+        order_uuid = str(order_uuid).upper()
+        with self._lock:
+            for position in self._positions.values():
+                if str(position['orderUUID']).upper() == order_uuid:
+                    return position
+        return None
+
+    # ===== LISTENERS =====
+
+    def add_listener(self, callback):
+        """callback(added, removed, changed) with lists of position dicts, called after each delta"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    # ===== SYNC =====
+
+    @staticmethod
+    def _position_from_row(row):
+        position_id, order_uuid, ticker, direction, volume, entry_price, created_time, configid, checksum = row
+        return {
+            'id': position_id,
+            'direction': (direction or '').strip(),
+            'volume': float(volume) if volume is not None else 0.0,
+            'orderUUID': str(order_uuid) if order_uuid is not None else None,
+            'ticker': ticker,
+            'entryPrice': float(entry_price) if entry_price is not None else None,
+            'createdTime': created_time,
+            'configID': configid
+        }, checksum
+
+    def _index(self, position, checksum):
+        position_id = position['id']
+        self._positions[position_id] = position
+        self._checksums[position_id] = checksum
+        self._checksum_sum += checksum
+        if position['configID'] is not None:
+            self._by_config.setdefault(position['configID'], {})[position_id] = position
+        self._by_ticker.setdefault(position['ticker'], {})[position_id] = position
+
+    def _unindex(self, position_id):
+        position = self._positions.pop(position_id, None)
+        if position is None:
+            return None
+        self._checksum_sum -= self._checksums.pop(position_id, 0)
+        for index, key in ((self._by_config, position['configID']), (self._by_ticker, position['ticker'])):
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.pop(position_id, None)
+                if not bucket:
+                    del index[key]
+        return position
+
+    def refresh(self):
+        """Apply changes since the last refresh; returns (added, removed, changed)"""
+        with self._refresh_lock:
+            with self._lock:
+                watermark = self.watermark
+                known_count = len(self._positions)
+                known_sum = self._checksum_sum
+
+            conn = self.db.get_connection(autocommit=True)
+            try:
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT COUNT(*), ISNULL(SUM(CAST({self.ROW_CHECKSUM} AS BIGINT)), 0)
+                    {self.FROM_POSITIONS} AND tv.ID <= ?;
+
+                    SELECT {self.POSITION_COLUMNS}
+                    {self.FROM_POSITIONS} AND tv.ID > ?;
+                """, (watermark, watermark))
+
+                count, checksum_sum = cursor.fetchone()
+                cursor.nextset()
+                new_rows = cursor.fetchall()
+
+                stale_ids, changed_rows = [], []
+                if count != known_count or checksum_sum != known_sum:
+                    stale_ids, changed_rows = self._resync_known(cursor, watermark)
+                cursor.close()
+            finally:
+                self.db.return_connection(conn)
+
+            with self._lock:
+                removed = [self._unindex(position_id) for position_id in stale_ids]
+                changed, added = [], []
+                for row in changed_rows:
+                    position, checksum = self._position_from_row(row)
+                    # Rows below the watermark may still be new (IDs committed out of order)
+                    known = self._unindex(position['id']) is not None
+                    self._index(position, checksum)
+                    (changed if known else added).append(position)
+
+                for row in new_rows:
+                    position, checksum = self._position_from_row(row)
+                    self._index(position, checksum)
+                    added.append(position)
+                    self.watermark = max(self.watermark, position['id'])
+
+                self.refreshes += 1
+                listeners = list(self._listeners)
+
+        if added or removed or changed:
+            for callback in listeners:
+                try:
+                    callback(added, removed, changed)
+                except Exception as e:
+                    print(f"[PositionCache] Listener error: {e}")
+
+        return added, removed, changed
+
+    def _resync_known(self, cursor, watermark):
+        """Diff known rows by checksum; fetch only rows that changed"""
+        self.resyncs += 1
+        cursor.execute(f"""
+            SELECT tv.ID, {self.ROW_CHECKSUM}
+            {self.FROM_POSITIONS} AND tv.ID <= ?
+        """, watermark)
+        server = {position_id: checksum for position_id, checksum in cursor.fetchall()}
+
+        with self._lock:
+            stale_ids = [position_id for position_id in self._positions if position_id not in server]
+            changed_ids = [position_id for position_id, checksum in server.items()
+                           if self._checksums.get(position_id) != checksum]
+
+        changed_rows = []
+        for start in range(0, len(changed_ids), 2000):
+            chunk = changed_ids[start:start + 2000]
+            placeholders = ", ".join(["?"] * len(chunk))
+            cursor.execute(f"""
+                SELECT {self.POSITION_COLUMNS}
+                {self.FROM_POSITIONS} AND tv.ID IN ({placeholders})
+            """, chunk)
+            changed_rows.extend(cursor.fetchall())
+
+        return stale_ids, changed_rows
+
+    # ===== LIFECYCLE =====
+
+    def _loop(self):
+        while not self._stop_event.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[PositionCache] Refresh error: {e}")
+
+    def start(self):
+        """Initial load, then refresh in a background thread"""
+        try:
+            self.refresh()
+        except Exception as e:
+            # The background loop keeps retrying
+            print(f"[PositionCache] Initial load failed: {e}")
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._loop, name='position-cache', daemon=True)
+            self._thread.start()
+        print(f"[PositionCache] Started with {len(self._positions)} open position(s), "
+              f"refresh {self.refresh_interval}s")
+        return self
+
+    def stop(self):
+        """Stop background refresh"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def get_stats(self):
+        """Cache statistics"""
+        with self._lock:
+            return {
+                'positions': len(self._positions),
+                'configs': len(self._by_config),
+                'watermark': self.watermark,
+                'refreshes': self.refreshes,
+                'resyncs': self.resyncs
+            }
@@ -0,0 +1,205 @@
+"""
+Deadline Scheduler - periodic jobs on absolute monotonic deadlines.
+
+Each job's next deadline is the previous deadline plus its period, not
+"now + period" after the work, so the period does not stretch with work time.
+Ticks missed while a job (or another one) overran are coalesced into one run
+and counted. Aligned jobs fire at wall-clock multiples of their period plus
+an offset, e.g. bar close + 2 s, and re-anchor to the wall clock every run.
+Triggered jobs (period None) run only when trigger() is called.
+
+Lateness (start - deadline) goes to the metrics registry as
+scheduler_lateness_seconds{job}, coalesced ticks as scheduler_missed_total{job}.
+
+Usage:
+    scheduler = DeadlineScheduler()
+    scheduler.add_job('termination', 0.1, check_termination)
+    scheduler.add_job('logic', 60, run_logic, offset=2.0, align=True)
+    scheduler.add_job('heartbeat', 60, send_heartbeat)
+    scheduler.run()  # until stop() or a job returns False
+"""
+
+import time
+import threading
+
+from metrics import REGISTRY
+
+
+class ScheduledJob:
+    """One periodic or triggered job"""
+
+    def __init__(self, name, period, callback, offset=0.0, align=False):
+        self.name = name
+        self.period = period
+        self.callback = callback
+        self.offset = offset
+        self.align = align
+        self.deadline = None  # time.monotonic() of the next run, None while not due
+
+        self.runs = 0
+        self.missed = 0
+        self.errors = 0
+        self.last_lateness = None
+        self.max_lateness = 0.0
+
+    def get_stats(self):
+        return {
+            'period': self.period,
+            'runs': self.runs,
+            'missed': self.missed,
+            'errors': self.errors,
+            'last_lateness': self.last_lateness,
+            'max_lateness': self.max_lateness
+        }
+
+
+class DeadlineScheduler:
+    """Runs periodic jobs on one thread at absolute deadlines"""
+
+    def __init__(self, clock=time.monotonic, wall_clock=time.time, registry=REGISTRY):
+        """
+        Args:
+            clock: Monotonic clock in seconds for deadlines
+            wall_clock: Epoch seconds, used only to align jobs to bar boundaries
+            registry: MetricsRegistry for lateness histograms (None disables)
+        """
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.registry = registry
+
+        self._jobs = {}  # name -> ScheduledJob
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+
+    def add_job(self, name, period, callback, offset=0.0, align=False, run_now=False):
+        """
+        Add or replace a job.
+
+        Args:
+            name: Job name (metrics label)
+            period: Seconds between runs; None for a job that runs only on trigger()
+            callback: Called without arguments; returning False stops the scheduler
+            offset: Seconds after the period boundary (align) or before the first run
+            align: Fire at wall-clock multiples of period + offset (bar close + offset)
+            run_now: First run immediately instead of after one period
+        """
+        job = ScheduledJob(name, period, callback, offset, align)
+        now = self.clock()
+        if period is not None:
+            if align:
+                job.deadline = self._aligned_deadline(job, now)
+            else:
+                job.deadline = now + (offset if run_now else offset + period)
+            if run_now:
+                job.deadline = min(job.deadline, now)
+        with self._lock:
+            self._jobs[name] = job
+        self._wake.set()
+        return job
+
+    def remove_job(self, name):
+        with self._lock:
+            self._jobs.pop(name, None)
+
+    def trigger(self, name):
+        """Make a job due now (thread-safe); used for bar events"""
+        with self._lock:
+            job = self._jobs.get(name)
+            if job is None:
+                return False
+            now = self.clock()
+            if job.deadline is None or job.deadline > now:
+                job.deadline = now
+        self._wake.set()
+        return True
+
+    def _aligned_deadline(self, job, now):
+        """Monotonic time of the next wall-clock multiple of period + offset"""
+        wall = self.wall_clock()
+        boundary = (wall - job.offset) // job.period * job.period + job.period + job.offset
+        return now + (boundary - wall)
+
+    def next_deadline(self):
+        with self._lock:
+            deadlines = [job.deadline for job in self._jobs.values() if job.deadline is not None]
+        return min(deadlines) if deadlines else None
+
+    def _advance(self, job, deadline):
+        """Next deadline after a run: one period on, skipping (and counting) ticks already past"""
+        now = self.clock()
+        if job.period is None:
+            return None
+        if job.align:
+            # Re-anchor to the wall clock so bar alignment survives clock adjustments
+            next_deadline = self._aligned_deadline(job, now)
+            missed = int(max(0.0, now - deadline) // job.period)
+        else:
+            next_deadline = deadline + job.period
+            missed = 0
+            if next_deadline <= now:
+                missed = int((now - next_deadline) // job.period) + 1
+                next_deadline += missed * job.period
+        if missed:
+            job.missed += missed
+            if self.registry is not None:
+                self.registry.counter('scheduler_missed_total', job=job.name).inc(missed)
+        return next_deadline
+
+    def run_pending(self):
+        """Run every due job once, earliest deadline first; returns False if a job asked to stop"""
+        now = self.clock()
+        with self._lock:
+            due = sorted((job for job in self._jobs.values() if job.deadline is not None and job.deadline <= now),
+                         key=lambda job: job.deadline)
+
+        for job in due:
+            with self._lock:
+                if self._jobs.get(job.name) is not job or job.deadline is None:
+                    continue
+                deadline = job.deadline
+                job.deadline = None  # a trigger() during the run makes it due again
+
+            lateness = max(0.0, self.clock() - deadline)
+            job.last_lateness = lateness
+            job.max_lateness = max(job.max_lateness, lateness)
+            if self.registry is not None:
+                self.registry.histogram('scheduler_lateness_seconds', job=job.name).observe(lateness)
+
+            try:
+                result = job.callback()
+            except Exception as e:
+                job.errors += 1
+                print(f"[Scheduler] Job {job.name} failed: {e}")
+                result = None
+            job.runs += 1
+
+            with self._lock:
+                next_deadline = self._advance(job, deadline)
+                if job.deadline is None:
+                    job.deadline = next_deadline
+
+            if result is False:
+                return False
+        return True
+
+    def run(self):
+        """Run jobs until stop() or a job returns False"""
+        while not self._stop_event.is_set():
+            if not self.run_pending():
+                break
+            deadline = self.next_deadline()
+            timeout = None if deadline is None else max(0.0, deadline - self.clock())
+            if timeout is None or timeout > 0:
+                self._wake.wait(timeout)
+            self._wake.clear()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def get_stats(self):
+        """Per-job runs, coalesced ticks and lateness"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {job.name: job.get_stats() for job in jobs}
@@ -0,0 +1,548 @@
+"""
+Simulated Provider - in-memory paper-trading stand-in for the SQL Server
+procedures, functions and views the framework calls.
+
+SimulatedConnectionProvider is a PooledConnectionProvider whose connections
+answer the framework's statements from a SimulatedExchange:
+algo.sp_strategyRegister, trd.sp_CreateSignal, algo.fn_GetInstancePositionIDs,
+trd.trades_v (PositionCache), algo.strategyTracker / sp_TerminateInstance
+(termination), tms.bars (BarClock, market snapshot), algo.ConfigurationSets /
+fn_GetStrategyConfiguration (hot reload) and the execution log.
+Orders fill against the bars/ticks published to a SimulatedMarket after a
+configurable latency, with slippage against the order.
+
+Usage:
+    market = SimulatedMarket()
+    market.add_ticker('XAUUSD', 13)
+    market.publish_bar(13, 1, bar_time, open_, high, low, close)
+
+    exchange = SimulatedExchange(market, latency=0.05, slippage=0.1)
+    exchange.add_config(1, ticker='XAUUSD', ticker_jid=13, open_volume=0.01)
+
+    provider = SimulatedConnectionProvider(exchange, pool_size=10)
+    strategy = MTFTrendStrategy(1, connection_provider=provider)
+
+Statements are matched by pattern, not parsed. There are no transactions:
+every statement applies immediately and commit/rollback do nothing.
+Unknown statements raise SimulationError. Cursors, connections and the
+pooled provider come from emulated_db; SimulatedExchange is the engine.
+"""
+
+import re
+import json
+import time
+import uuid
+import heapq
+import itertools
+import threading
+from collections import deque
+
+from emulated_db import (EmulationError, EmulatedConnectionProvider, SIGNAL_TYPES, utcnow, binary_checksum,
+                         parameter_values_hash, configuration_result, check_signal, terminate_instance)
+from indicator_engine import IndicatorEngine
+
+
+class SimulationError(EmulationError):
+    """Statement the simulation cannot answer"""
+
+
+def _pairs(params):
+    return [(int(params[i]), int(params[i + 1])) for i in range(0, len(params), 2)]
+
+
+# ===== MARKET DATA =====
+
+class SimulatedMarket:
+    """Bars and ticks visible to the simulated exchange"""
+
+    def __init__(self, capacity=256, indicators=True):
+        """
+        Args:
+            capacity: Bars kept per (TickerJID, timeframeID)
+            indicators: Compute EMA/RSI for market snapshots with an IndicatorEngine
+        """
+        self.capacity = capacity
+        self.indicator_engine = IndicatorEngine(capacity) if indicators else None
+
+        self.tickers = {}  # ticker_jid -> ticker
+        self.ticker_jids = {}  # ticker -> ticker_jid
+        self._bars = {}  # (ticker_jid, timeframe_id) -> deque of (bar_time, open, high, low, close)
+        self._ticks = {}  # ticker -> (tick_time, bid, ask)
+        self._scheduled = []  # heap of (time, seq, kind, args), released by advance_to()
+        self._seq = itertools.count()
+        self._lock = threading.RLock()
+
+        self.now = None  # time of the latest published bar or tick
+        self.bars_published = 0
+        self.ticks_published = 0
+
+    def add_ticker(self, ticker, ticker_jid):
+        with self._lock:
+            self.tickers[int(ticker_jid)] = ticker
+            self.ticker_jids[ticker] = int(ticker_jid)
+
+    # ===== PUBLISHING =====
+
+    def publish_bar(self, ticker_jid, timeframe_id, bar_time, open_, high, low, close):
+        """Make a closed bar visible; bars not newer than the last one are ignored"""
+        key = (int(ticker_jid), int(timeframe_id))
+        with self._lock:
+            bars = self._bars.get(key)
+            if bars is None:
+                bars = self._bars[key] = deque(maxlen=self.capacity)
+            if bars and bar_time <= bars[-1][0]:
+                return False
+            bars.append((bar_time, float(open_), float(high), float(low), float(close)))
+            self.bars_published += 1
+            if self.now is None or bar_time > self.now:
+                self.now = bar_time
+            if self.indicator_engine is not None:
+                self.indicator_engine.update(key[0], key[1], bar_time, open_, high, low, close)
+            return True
+
+    def publish_tick(self, ticker, tick_time, bid, ask):
+        with self._lock:
+            self._ticks[ticker] = (tick_time, float(bid), float(ask))
+            self.ticks_published += 1
+            if self.now is None or tick_time > self.now:
+                self.now = tick_time
+
+    def schedule_bars(self, ticker_jid, timeframe_id, bars):
+        """Queue (bar_time, open, high, low, close) rows for advance_to()"""
+        with self._lock:
+            for bar in bars:
+                heapq.heappush(self._scheduled, (bar[0], next(self._seq), 'bar',
+                                                 (ticker_jid, timeframe_id) + tuple(bar)))
+
+    def schedule_ticks(self, ticker, ticks):
+        """Queue (tick_time, bid, ask) rows for advance_to()"""
+        with self._lock:
+            for tick in ticks:
+                heapq.heappush(self._scheduled, (tick[0], next(self._seq), 'tick', (ticker,) + tuple(tick)))
+
+    def next_time(self):
+        """Time of the next scheduled bar/tick, or None"""
+        with self._lock:
+            return self._scheduled[0][0] if self._scheduled else None
+
+    def advance_to(self, until):
+        """Publish scheduled bars/ticks up to and including until; returns how many"""
+        released = 0
+        with self._lock:
+            while self._scheduled and self._scheduled[0][0] <= until:
+                _, _, kind, args = heapq.heappop(self._scheduled)
+                if kind == 'bar':
+                    self.publish_bar(*args)
+                else:
+                    self.publish_tick(*args)
+                released += 1
+        return released
+
+    # ===== QUERIES =====
+
+    def last_bar_time(self, ticker_jid, timeframe_id):
+        with self._lock:
+            bars = self._bars.get((ticker_jid, timeframe_id))
+            return bars[-1][0] if bars else None
+
+    def quote(self, ticker):
+        """(bid, ask) from the last tick, else the close of the lowest timeframe; None without data"""
+        with self._lock:
+            tick = self._ticks.get(ticker)
+            if tick is not None:
+                return tick[1], tick[2]
+            ticker_jid = self.ticker_jids.get(ticker)
+            keys = sorted(key for key in self._bars if key[0] == ticker_jid and self._bars[key])
+            if not keys:
+                return None
+            close = self._bars[keys[0]][-1][4]
+            return close, close
+
+    def snapshot_rows(self, ticker_jid, timeframe_id):
+        """Rows of the market snapshot statement: last two bars with EMA/RSI, newest first"""
+        with self._lock:
+            bars = self._bars.get((ticker_jid, timeframe_id))
+            if not bars:
+                return []
+            indicators = {}
+            if self.indicator_engine is not None:
+                series = self.indicator_engine.series(ticker_jid, timeframe_id)
+                for values in (series.current, series.previous):
+                    if values is not None:
+                        indicators[values['BarTime']] = values
+
+            rows = []
+            for bar_time, open_, high, low, close in list(bars)[-1:-3:-1]:
+                values = indicators.get(bar_time, {})
+                rows.append((ticker_jid, timeframe_id, bar_time, open_, high, low, close,
+                             values.get('EMA_20_SHORT'), values.get('EMA_50_MEDIUM'),
+                             values.get('RSI_14'), values.get('Oversold_Flag'), values.get('Overbought_Flag')))
+            return rows
+
+
+# ===== EXCHANGE =====
+
+class SimulatedExchange:
+    """Strategy registry, signal queue and open positions of the simulation"""
+
+    EVENT_TYPES = ('start', 'stop', 'error', 'termination', 'signal')  # algo.strategyEventsType
+
+    # Pattern -> handler, first match wins
+    STATEMENTS = [
+        (r"^\s*SELECT\s+1\s*;?\s*$", '_ping'),
+        (r"^\s*(?:SET\s+\w+\s+(?:ON|OFF)\s*;?\s*)+$", '_session_options'),
+        (r"algo\.sp_strategyRegister", '_register'),
+        (r"logs\.sp_LogStrategyExecution", '_log_execution'),
+        (r"algo\.sp_TerminateInstance", '_terminate_instance'),
+        (r"algo\.sp_UpdateStrategyState", '_update_state'),
+        (r"trd\.sp_CreateSignal.*;\s*EXEC\s+trd\.sp_CreateSignal", '_create_signal_batch'),
+        (r"trd\.sp_CreateSignal", '_create_signal'),
+        (r"algo\.fn_GetInstancePositionIDs", '_instance_positions'),
+        (r"algo\.fn_GetStrategyPositionIDs", '_strategy_positions'),
+        (r"FROM\s+algo\.strategyTracker", '_tracker_states'),
+        (r"COUNT\(\*\).*trd\.trades_v", '_position_sync'),
+        (r"trd\.trades_v.*tv\.ID\s+IN\s*\(", '_positions_by_id'),
+        (r"trd\.trades_v", '_position_checksums'),
+        (r"MAX\(b\.barTime\)", '_last_bar_times'),
+        (r"tms\.Indicators_Momentum", '_market_snapshot'),
+        (r"FROM\s+algo\.ConfigurationSets", '_config_hashes'),
+        (r"algo\.fn_GetStrategyConfiguration", '_strategy_configuration'),
+        (r"FROM\s+algo\.strategySignalType", '_signal_types'),
+        (r"FROM\s+algo\.strategyEventsType", '_event_types'),
+        (r"INSERT\s+INTO\s+logs\.strategyExecution", '_insert_execution'),
+        (r"UPDATE\s+logs\.strategyExecution", '_update_execution'),
+    ]
+
+    def __init__(self, market=None, latency=0.0, slippage=0.0, clock=time.monotonic):
+        """
+        Args:
+            market: SimulatedMarket the orders fill against (default: empty market)
+            latency: Seconds from sp_CreateSignal to fill, or callable() returning them
+            slippage: Price units against the order, or callable(ticker, direction, volume, price)
+            clock: Monotonic clock in seconds used for latency
+        """
+        self.market = market or SimulatedMarket()
+        self.latency = latency
+        self.slippage = slippage
+        self.clock = clock
+
+        self._statements = [(re.compile(pattern, re.IGNORECASE | re.DOTALL), getattr(self, name))
+                            for pattern, name in self.STATEMENTS]
+        self._handler_cache = {}  # sql -> handler
+        self._lock = threading.RLock()
+
+        self._configs = {}  # configid -> configuration dict
+        self._instances = {}  # configInstanceGUID -> tracker row
+        self._termination_queue = []  # {'guid', 'terminate', 'terminated_at'}
+        self._positions = {}  # trades_v ID -> position row
+        self._orders = []  # heap of (due, seq, order)
+        self._seq = itertools.count()
+        self._next_position_id = 1
+        self.closed_trades = []  # (position_id, configID, ticker, direction, volume, entry, exit, pnl)
+
+        self.statement_counts = {}  # handler name -> count
+        self.signals = 0
+        self.filled = 0
+        self.rejected = 0
+        self.realized_pnl = 0.0
+        self.executions_logged = 0
+
+    # ===== SETUP =====
+
+    def add_config(self, configid, ticker, ticker_jid=None, open_volume=0.01, timeframe_signal_id=1,
+                   timeframe_confirmation_id=3, timeframe_trend_id=5, trading_close_utc=None,
+                   trading_start_utc=None, broker_id=2, platform_id=1, **parameters):
+        """Strategy configuration returned by algo.sp_strategyRegister"""
+        if ticker_jid is None:
+            ticker_jid = self.market.ticker_jids.get(ticker)
+        elif ticker not in self.market.ticker_jids:
+            self.market.add_ticker(ticker, ticker_jid)
+
+        with self._lock:
+            self._configs[configid] = dict(
+                parameters, configID=configid, ticker=ticker, ticker_jid=ticker_jid,
+                timeframe_signal_id=timeframe_signal_id,
+                timeframe_confirmation_id=timeframe_confirmation_id,
+                timeframe_trend_id=timeframe_trend_id, open_volume=open_volume,
+                trading_close_utc=trading_close_utc, trading_start_utc=trading_start_utc,
+                broker_id=broker_id, platform_id=platform_id)
+
+    def request_termination(self, configid):
+        """algo.sp_RequestStrategyTermination for every open instance of configid"""
+        with self._lock:
+            guids = [guid for guid, row in self._instances.items()
+                     if row['configID'] == configid and row['timeClosed'] is None]
+            for guid in guids:
+                self._termination_queue.append({'guid': guid, 'terminate': 1, 'terminated_at': None})
+        return len(guids)
+
+    # ===== STATEMENTS =====
+
+    def execute(self, sql, params):
+        """Answer one statement; returns a list of result sets (lists of row tuples)"""
+        handler = self._handler_cache.get(sql)
+        if handler is None:
+            handler = next((h for pattern, h in self._statements if pattern.search(sql)), None)
+            if handler is None:
+                raise SimulationError(f"Statement not simulated: {' '.join(sql.split())[:120]}")
+            self._handler_cache[sql] = handler
+
+        with self._lock:
+            self.process_orders()
+            name = handler.__name__
+            self.statement_counts[name] = self.statement_counts.get(name, 0) + 1
+            return handler(sql, params)
+
+    def _ping(self, sql, params):
+        return [[(1,)]]
+
+    def _session_options(self, sql, params):
+        return []
+
+    def _register(self, sql, params):
+        config = self._configs.get(int(params[0]))
+        if config is None:
+            return [[('{"error": "Configuration not found"}',)]]
+
+        guid = str(uuid.uuid4()).upper()
+        self._instances[guid] = {'configID': config['configID'], 'timeOpened': utcnow(),
+                                 'timeClosed': None, 'state': None}
+        registration = dict(config, configInstanceGUID=guid)
+        return [[(json.dumps(registration, default=str),)]]
+
+    def _log_execution(self, sql, params):
+        self.executions_logged += 1
+        return []
+
+    def _termination_requests(self, guid):
+        return [entry for entry in self._termination_queue
+                if entry['guid'] == guid and entry['terminate'] == 1 and entry['terminated_at'] is None]
+
+    def _terminate(self, guid, now):
+        for entry in self._termination_requests(guid):
+            entry['terminated_at'] = now
+        instance = self._instances.get(guid)
+        if instance is not None and instance['timeClosed'] is None:
+            instance['timeClosed'] = now
+            self.executions_logged += 1  # 'termination' event
+
+    def _terminate_instance(self, sql, params):
+        return [[(terminate_instance(params[0], self._termination_requests, self._terminate),)]]
+
+    def _update_state(self, sql, params):
+        configid, state = int(params[0]), params[1]
+        for instance in self._instances.values():
+            if instance['configID'] == configid and instance['timeClosed'] is None:
+                instance['state'] = state
+        return []
+
+    def _find_position(self, trade_id, trade_type):
+        return self._positions.get(int(trade_id)) if trade_type == 'POSITION' else None
+
+    def _create_signal(self, sql, params):
+        (ticker, direction, volume, order_price, stop_loss, take_profit, expiry,
+         broker_id, platform_id, trade_id, trade_type, configid) = (list(params) + [None] * 12)[:12]
+
+        direction, _, _ = check_signal(ticker, direction, volume, trade_id, trade_type,
+                                       self._find_position, self.market.ticker_jids.get)
+
+        latency = self.latency() if callable(self.latency) else self.latency
+        order = {'ticker': ticker, 'direction': direction, 'volume': float(volume),
+                 'trade_id': int(trade_id) if trade_id is not None else None,
+                 'configID': configid, 'orderUUID': str(uuid.uuid4()).upper()}
+        heapq.heappush(self._orders, (self.clock() + latency, next(self._seq), order))
+        self.signals += 1
+        return []
+
+    def _create_signal_batch(self, sql, params):
+        """Several sp_CreateSignal calls in one batch; a rejected one cancels the others"""
+        orders, signals = list(self._orders), self.signals
+        try:
+            for start in range(0, len(params), 12):
+                self._create_signal(sql, params[start:start + 12])
+        except EmulationError:
+            self._orders, self.signals = orders, signals
+            raise
+        return []
+
+    def _config_hashes(self, sql, params):
+        """ParameterValuesHash: SHA2_256 of the parameter JSON, 32 bytes"""
+        rows = []
+        for configid in params:
+            config = self._configs.get(int(configid))
+            if config is not None:
+                rows.append((int(configid), parameter_values_hash(json.dumps(config, sort_keys=True, default=str))))
+        return [rows]
+
+    def _strategy_configuration(self, sql, params):
+        config = self._configs.get(int(params[0]))
+        if config is None:
+            return [[]]
+        return [configuration_result(config)]
+
+    def _positions_of(self, configid):
+        return [{'id': row['ID'], 'direction': row['direction'], 'volume': row['volume'],
+                 'orderUUID': row['orderUUID'], 'ticker': row['ticker']}
+                for row in self._positions.values() if row['configID'] == configid]
+
+    def _instance_positions(self, sql, params):
+        instance = self._instances.get(str(params[0]).upper())
+        if instance is None:
+            return [[('[]',)]]
+        return [[(json.dumps(self._positions_of(instance['configID'])),)]]
+
+    def _strategy_positions(self, sql, params):
+        return [[(json.dumps(self._positions_of(int(params[0]))),)]]
+
+    def _tracker_states(self, sql, params):
+        rows = []
+        for guid in params:
+            guid = str(guid).upper()
+            instance = self._instances.get(guid)
+            if instance is None:
+                continue
+            requested = any(entry['guid'] == guid and entry['terminate'] == 1 and entry['terminated_at'] is None
+                            for entry in self._termination_queue)
+            rows.append((guid, instance['timeClosed'], 1 if requested else 0))
+        return [rows]
+
+    @staticmethod
+    def _position_row(row):
+        return (row['ID'], row['orderUUID'], row['ticker'], row['direction'], row['volume'],
+                row['entryPrice'], row['createdTime'], row['configID'], row['checksum'])
+
+    def _position_sync(self, sql, params):
+        watermark = int(params[0])
+        known = [row for position_id, row in self._positions.items() if position_id <= watermark]
+        new_rows = [self._position_row(self._positions[position_id])
+                    for position_id in sorted(self._positions) if position_id > watermark]
+        return [[(len(known), sum(row['checksum'] for row in known))], new_rows]
+
+    def _positions_by_id(self, sql, params):
+        return [[self._position_row(self._positions[int(position_id)])
+                 for position_id in params if int(position_id) in self._positions]]
+
+    def _position_checksums(self, sql, params):
+        watermark = int(params[0])
+        return [[(position_id, row['checksum']) for position_id, row in self._positions.items()
+                 if position_id <= watermark]]
+
+    def _last_bar_times(self, sql, params):
+        return [[(ticker_jid, timeframe_id, self.market.last_bar_time(ticker_jid, timeframe_id))
+                 for ticker_jid, timeframe_id in _pairs(params)]]
+
+    def _market_snapshot(self, sql, params):
+        rows = []
+        for ticker_jid, timeframe_id in sorted(set(_pairs(params))):
+            rows.extend(self.market.snapshot_rows(ticker_jid, timeframe_id))
+        return [rows]
+
+    def _signal_types(self, sql, params):
+        return [[(name, type_id) for type_id, name in enumerate(SIGNAL_TYPES, 1)]]
+
+    def _event_types(self, sql, params):
+        return [[(name, type_id) for type_id, name in enumerate(self.EVENT_TYPES, 1)]]
+
+    def _insert_execution(self, sql, params):
+        self.executions_logged += 1
+        return []
+
+    def _update_execution(self, sql, params):
+        return []
+
+    # ===== FILLS =====
+
+    def _slippage(self, order, price):
+        if callable(self.slippage):
+            return self.slippage(order['ticker'], order['direction'], order['volume'], price)
+        return self.slippage
+
+    def process_orders(self):
+        """Fill orders whose latency has elapsed; returns how many were processed"""
+        processed = 0
+        with self._lock:
+            now = self.clock()
+            while self._orders and self._orders[0][0] <= now:
+                _, _, order = heapq.heappop(self._orders)
+                self._fill(order)
+                processed += 1
+        return processed
+
+    def _fill(self, order):
+        quote = self.market.quote(order['ticker'])
+        if quote is None:
+            self.rejected += 1
+            return
+        bid, ask = quote
+
+        if order['direction'] == 'DROP':
+            row = self._positions.pop(order['trade_id'], None)
+            if row is None:
+                self.rejected += 1  # closed by an earlier drop
+                return
+            if row['direction'] == 'Buy':
+                exit_price = bid - self._slippage(order, bid)
+                pnl = (exit_price - row['entryPrice']) * row['volume']
+            else:
+                exit_price = ask + self._slippage(order, ask)
+                pnl = (row['entryPrice'] - exit_price) * row['volume']
+            self.realized_pnl += pnl
+            self.closed_trades.append((row['ID'], row['configID'], row['ticker'], row['direction'],
+                                       row['volume'], row['entryPrice'], exit_price, pnl))
+        else:
+            if order['direction'] == 'BUY':
+                direction, price = 'Buy', ask + self._slippage(order, ask)
+            else:
+                direction, price = 'Sell', bid - self._slippage(order, bid)
+            position_id = self._next_position_id
+            self._next_position_id += 1
+            self._positions[position_id] = {
+                'ID': position_id, 'orderUUID': order['orderUUID'], 'ticker': order['ticker'],
+                'direction': direction, 'volume': order['volume'], 'entryPrice': price,
+                'createdTime': self.market.now or utcnow(), 'configID': order['configID'],
+                'checksum': binary_checksum(position_id, direction, order['volume'], order['configID'])
+            }
+        self.filled += 1
+
+    # ===== INSPECTION =====
+
+    def positions(self, configid=None):
+        """Open position rows, optionally of one configuration"""
+        with self._lock:
+            return [dict(row) for row in self._positions.values()
+                    if configid is None or row['configID'] == configid]
+
+    def get_stats(self):
+        """Exchange statistics"""
+        with self._lock:
+            return {
+                'instances': sum(1 for row in self._instances.values() if row['timeClosed'] is None),
+                'signals': self.signals,
+                'pending_orders': len(self._orders),
+                'filled': self.filled,
+                'rejected': self.rejected,
+                'open_positions': len(self._positions),
+                'closed_trades': len(self.closed_trades),
+                'realized_pnl': round(self.realized_pnl, 6),
+                'executions_logged': self.executions_logged,
+                'statements': sum(self.statement_counts.values())
+            }
+
+
+# ===== CONNECTIONS =====
+
+class SimulatedConnectionProvider(EmulatedConnectionProvider):
+    """PooledConnectionProvider over simulated connections: pooling, waits and metrics work as in production"""
+
+    def __init__(self, exchange=None, pool_size=20, max_overflow=10, acquire_timeout=30.0, query_latency=0.0):
+        """
+        Args:
+            exchange: SimulatedExchange shared by all connections (default: new, empty)
+            pool_size: Number of persistent connections
+            max_overflow: Additional connections if pool exhausted
+            acquire_timeout: Seconds to wait for a free connection before RuntimeError
+            query_latency: Seconds added to every statement, emulating the network round trip
+        """
+        self.exchange = exchange or SimulatedExchange()
+        super().__init__(self.exchange, pool_size=pool_size, max_overflow=max_overflow,
+                         acquire_timeout=acquire_timeout, query_latency=query_latency, name='SIMULATED')
@@ -0,0 +1,491 @@
+"""
+Strategy Host - runs many StrategyBase configurations in one process
+on a shared thread pool and a shared, bounded connection pool.
+
+By default strategy bodies run only when BarClock sees a new bar for one of
+their (TickerJID, timeframeID) pairs; termination/suspend checks run every
+control interval. Those checks are answered for all strategies at once by a
+TerminationCoordinator, one query per tick. --poll restores the fixed
+timer_interval loop.
+
+--metrics-port serves cycle/DB-call/pool latency histograms as Prometheus
+text on http://127.0.0.1:<port>/metrics; --metrics-file writes them as JSON.
+
+Parameter changes in algo.ConfigurationSets are picked up by a ConfigWatcher
+(one ParameterValuesHash query for all configs every --config-watch-interval seconds)
+and applied between cycles without a restart.
+
+--control-port starts a ControlServer (see control_channel.py): terminate,
+suspend and reload commands are pushed instead of found by polling, and the
+termination queue query drops to every --fallback-interval seconds.
+
+Usage:
+    python strategy_host.py --configIDs 1 2 3 --strategy mtfTrend:MTFTrendStrategy
+"""
+
+import sys
+import time
+import threading
+import importlib
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from ANFramework import PooledConnectionProvider, force_close_batch
+from bar_clock import BarClock
+from termination_coordinator import TerminationCoordinator
+from execution_logger import ExecutionLogger
+from position_cache import PositionCache
+from order_tracker import OrderTracker
+from metrics import REGISTRY, start_exporters
+from control_channel import ControlServer
+from config_watcher import ConfigWatcher
+
+
+def background_connections(bar_driven=True, config_watch=True):
+    """
+    Connections the host's own components can hold at the same time, on top of
+    one per running cycle: the termination coordinator's persistent connection,
+    the execution log writer, PositionCache refresh, the host loop's force-close
+    batch, and BarClock / ConfigWatcher when enabled.
+    """
+    return 4 + bool(bar_driven) + bool(config_watch)
+
+
+class StrategyHost:
+    """Single-process host for many StrategyBase instances"""
+
+    def __init__(self, strategy_class, config_ids, timer_interval=0.5,
+                 pool_size=10, max_overflow=0, max_workers=None, acquire_timeout=30.0,
+                 bar_driven=True, control_interval=1.0, bar_poll_interval=1.0, bar_grace=1.0,
+                 connection_provider=None, control_port=None, control_path=None, control_token=None,
+                 fallback_interval=10.0, config_watch_interval=30.0):
+        """
+        Args:
+            strategy_class: StrategyBase subclass accepting (configid, connection_provider=...)
+            config_ids: Configuration IDs to register through algo.sp_strategyRegister
+            timer_interval: Cycle interval in seconds for every hosted strategy
+            pool_size: Persistent connections shared by all strategies
+            max_overflow: Extra connections allowed on top of pool_size
+            max_workers: Worker threads (default pool_size, never above the pool limit)
+            acquire_timeout: Seconds a cycle waits for a pooled connection
+            bar_driven: Run strategy bodies on new bars instead of every timer_interval
+            control_interval: Seconds between termination/suspend checks in bar-driven mode
+            bar_poll_interval: Seconds between BarClock queries
+            bar_grace: Seconds to wait after a new bar before waking strategies
+            connection_provider: Provider to use instead of a new PooledConnectionProvider,
+                e.g. SimulatedConnectionProvider; it needs pool_size + background_connections()
+            control_port: Start a ControlServer on 127.0.0.1:<port> (0 picks a free port)
+            control_path: Start the ControlServer on this Unix domain socket instead
+            control_token: Shared secret for control commands (generated for TCP when omitted)
+            fallback_interval: Seconds between termination queue queries while the
+                control server is running (pushed commands refresh immediately)
+            config_watch_interval: Seconds between algo.ConfigurationSets change checks (0 disables)
+        """
+        self.strategy_class = strategy_class
+        self.config_ids = list(config_ids)
+        self.timer_interval = timer_interval
+        self.bar_driven = bar_driven
+        self.control_interval = control_interval
+
+        # One pool for the whole process instead of one pool per strategy, with
+        # a connection for each background component on top of the cycles'
+        # pool_size, so cycles never wait on them (or they on cycles)
+        self.background_connections = background_connections(bar_driven, bool(config_watch_interval))
+        if connection_provider is None:
+            # Handshakes run in parallel while the strategies register
+            connection_provider = PooledConnectionProvider(
+                pool_size=pool_size + self.background_connections, max_overflow=max_overflow,
+                acquire_timeout=acquire_timeout,
+                min_size=min(pool_size, len(self.config_ids)) + self.background_connections)
+        self.connection_provider = connection_provider
+        self.termination_coordinator = TerminationCoordinator(self.connection_provider)
+        self.execution_logger = ExecutionLogger(self.connection_provider)
+        self.position_cache = PositionCache(self.connection_provider)
+        self.order_tracker = OrderTracker(self.position_cache)
+
+        # Each running cycle holds exactly one connection, so the worker count
+        # is what keeps the pool bounded
+        limit = pool_size + max_overflow
+        self.max_workers = min(max_workers or pool_size, limit)
+
+        self.bar_clock = None
+        if bar_driven:
+            self.bar_clock = BarClock(self.connection_provider, poll_interval=bar_poll_interval,
+                                      grace_seconds=bar_grace)
+
+        self.strategies = {}  # configid -> strategy instance
+        self._in_flight = {}  # configid -> Future of the running cycle
+        self._bars_pending = set()  # configids with a new bar not yet processed
+        self._bar_callbacks = {}  # configid -> [(ticker_jid, timeframe_id, callback)]
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.executor = None
+        self._stopped = False
+
+        self.cycles_started = 0
+        self.cycles_skipped = 0  # previous cycle of the same strategy still running
+
+        # Changed configurations are reloaded by the strategy's next cycle
+        self.config_watcher = None
+        if config_watch_interval:
+            self.config_watcher = ConfigWatcher(self.connection_provider, on_change=self._on_config_changed,
+                                                interval=config_watch_interval)
+
+        # Pushed commands wake the host loop and force a termination refresh
+        self.control_server = None
+        self.fallback_interval = fallback_interval
+        self._wake = threading.Event()
+        if control_port is not None or control_path is not None:
+            self.control_server = ControlServer('host', self.config_ids, port=control_port or 0,
+                                                path=control_path, token=control_token)
+            self.control_server.register('status', lambda configid, message: self.get_stats())
+            self.control_server.register('terminate', self._on_terminate_command)
+            self.control_server.register('suspend', self._on_suspend_command)
+            self.control_server.register('reload', self._on_reload_command)
+
+        REGISTRY.add_collector('host', self.get_stats)
+
+        print(f"[StrategyHost] Initialized for {len(self.config_ids)} config(s), "
+              f"workers={self.max_workers}, pool limit={limit} + {self.background_connections} background")
+
+    def load_strategies(self):
+        """Create, register and configure a strategy instance for every config ID"""
+        for configid in self.config_ids:
+            try:
+                strategy = self.strategy_class(configid, connection_provider=self.connection_provider)
+                strategy._register_and_load_configuration()
+
+                if hasattr(strategy, '_setup_parameters'):
+                    strategy._setup_parameters()
+
+                self.strategies[configid] = strategy
+                self.termination_coordinator.register(strategy)
+                strategy.execution_logger = self.execution_logger
+                strategy.position_cache = self.position_cache
+                strategy.order_tracker = self.order_tracker
+
+                if self.bar_clock is not None:
+                    self._subscribe_bars(configid, strategy)
+                    strategy.reload_listeners.append(self._on_strategy_reloaded)
+                if self.config_watcher is not None:
+                    self.config_watcher.register(configid)
+
+            except Exception as e:
+                print(f"[StrategyHost] Failed to load config {configid}: {e}")
+
+        print(f"[StrategyHost] Loaded {len(self.strategies)} of {len(self.config_ids)} strategies")
+        return len(self.strategies)
+
+    def _subscribe_bars(self, configid, strategy):
+        """Subscribe the strategy's bar pairs, dropping subscriptions it no longer needs"""
+        callback = partial(self._on_new_bar, configid)
+        pairs = set(strategy.bar_subscriptions())
+        with self._lock:
+            current = self._bar_callbacks.get(configid, [])
+        kept = [(t, tf, cb) for t, tf, cb in current if (t, tf) in pairs]
+        for ticker_jid, timeframe_id, old_callback in current:
+            if (ticker_jid, timeframe_id) not in pairs:
+                self.bar_clock.unsubscribe(ticker_jid, timeframe_id, old_callback)
+        for ticker_jid, timeframe_id in pairs - {(t, tf) for t, tf, _ in kept}:
+            self.bar_clock.subscribe(ticker_jid, timeframe_id, callback)
+            kept.append((ticker_jid, timeframe_id, callback))
+        with self._lock:
+            self._bar_callbacks[configid] = kept
+
+    def _on_strategy_reloaded(self, strategy, changed):
+        """Reload listener (worker thread): follow ticker/timeframe changes"""
+        if self.bar_clock is not None and strategy.configid in self.strategies:
+            self._subscribe_bars(strategy.configid, strategy)
+
+    def _on_config_changed(self, configid):
+        """ConfigWatcher callback: reload before the strategy's next cycle"""
+        strategy = self.strategies.get(configid)
+        if strategy is not None:
+            strategy.request_reload()
+            self._schedule_strategy(configid)
+
+    def remove_strategy(self, configid):
+        """Stop scheduling a strategy"""
+        with self._lock:
+            strategy = self.strategies.pop(configid, None)
+            self._bars_pending.discard(configid)
+            callbacks = self._bar_callbacks.pop(configid, [])
+        for ticker_jid, timeframe_id, callback in callbacks:
+            self.bar_clock.unsubscribe(ticker_jid, timeframe_id, callback)
+        self.termination_coordinator.unregister(configid)
+        if self.config_watcher is not None:
+            self.config_watcher.unregister(configid)
+        if strategy is not None:
+            strategy._cleanup()
+            if self.control_server is not None:
+                self.control_server.set_config_ids(self.strategies)
+            print(f"[StrategyHost] Strategy {configid} removed from host")
+
+    # ===== CONTROL COMMANDS (control server threads) =====
+
+    def _on_terminate_command(self, configid, message):
+        """Confirm the queued termination now instead of at the next fallback poll"""
+        terminating = self.termination_coordinator.refresh()
+        self._wake.set()
+        if configid is not None and configid not in terminating:
+            raise ValueError(f"no pending termination for config {configid} in algo.strategy_termination_queue")
+        return {'terminating': sorted(terminating)}
+
+    def _on_suspend_command(self, configid, message):
+        if configid is None or not self.termination_coordinator.suspend(configid):
+            raise ValueError(f"config {configid} is not running in this host")
+        self._wake.set()
+        return {'suspended': configid}
+
+    def _on_reload_command(self, configid, message):
+        strategy = self.strategies.get(configid)
+        if strategy is None:
+            raise ValueError(f"config {configid} is not running in this host")
+        strategy.request_reload()
+        self._schedule_strategy(configid)
+        return {'reloading': configid}
+
+    def _run_strategy_cycle(self, strategy, process_signals):
+        """Worker: run one cycle of one strategy on a pooled connection"""
+        with strategy.lease() as conn:
+            return strategy.run_cycle(conn, process_signals=process_signals)
+
+    def _on_cycle_done(self, configid, future):
+        """Worker callback: release the in-flight slot, drop finished strategies"""
+        with self._lock:
+            self._in_flight.pop(configid, None)
+            bar_waiting = configid in self._bars_pending
+
+        try:
+            keep_running = future.result()
+        except Exception as e:
+            print(f"[StrategyHost] Error in cycle of config {configid}: {e}")
+            keep_running = False
+
+        if not keep_running:
+            self.remove_strategy(configid)
+        elif bar_waiting:
+            # A bar arrived while the previous cycle was still running
+            self._schedule_strategy(configid)
+
+    def _on_new_bar(self, configid, ticker_jid, timeframe_id, bar_time):
+        """BarClock callback: run the strategy body for the new bar"""
+        strategy = self.strategies.get(configid)
+        if strategy is None:
+            return
+        strategy.on_new_bar(ticker_jid, timeframe_id, bar_time)
+        with self._lock:
+            self._bars_pending.add(configid)
+        self._schedule_strategy(configid)
+
+    def _schedule_strategy(self, configid, process_signals=False):
+        """Submit one cycle unless the previous cycle of this strategy is still running"""
+        with self._lock:
+            strategy = self.strategies.get(configid)
+            if self._stopped or self.executor is None or strategy is None:
+                return False
+            if configid in self._in_flight:
+                self.cycles_skipped += 1
+                return False
+
+            if configid in self._bars_pending:
+                self._bars_pending.discard(configid)
+                process_signals = True
+
+            future = self.executor.submit(self._run_strategy_cycle, strategy, process_signals)
+            self._in_flight[configid] = future
+            self.cycles_started += 1
+
+        future.add_done_callback(partial(self._on_cycle_done, configid))
+        return True
+
+    def _schedule_tick(self, refresh=True):
+        """Refresh termination state for all strategies, then submit cycles"""
+        if refresh:
+            self.termination_coordinator.refresh()
+
+        stops = self.termination_coordinator.pending_stops()
+        if stops:
+            self._force_close_stops(stops)
+
+        if self.bar_driven:
+            # Strategy bodies run on bars; the tick only stops strategies that must stop
+            configids = stops
+        else:
+            with self._lock:
+                configids = list(self.strategies)
+
+        for configid in configids:
+            self._schedule_strategy(configid, process_signals=not self.bar_driven)
+
+    def _force_close_stops(self, configids):
+        """Flatten every stopping strategy in one signal batch before their stop cycles run"""
+        with self._lock:
+            strategies = [self.strategies[configid] for configid in configids
+                          if configid in self.strategies and not self.strategies[configid].force_closed]
+        if not strategies:
+            return
+
+        try:
+            self.position_cache.refresh()
+            with strategies[0].lease() as conn:
+                force_close_batch(conn, strategies)
+        except Exception as e:
+            # The strategies fall back to their own force_close
+            print(f"[StrategyHost] Force close batch error: {e}")
+
+    def run(self):
+        """Main host loop"""
+        print(f"[StrategyHost] Starting {len(self.strategies)} strategies")
+
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                           thread_name_prefix='strategy')
+        self.execution_logger.start()
+        self.position_cache.start()
+        self.order_tracker.start()
+        if self.bar_clock is not None:
+            self.bar_clock.start()
+        if self.control_server is not None:
+            self.control_server.config_ids = list(self.strategies)
+            self.control_server.start()
+        if self.config_watcher is not None:
+            self.config_watcher.start()
+        interval = self.control_interval if self.bar_driven else self.timer_interval
+        # With pushed commands the queue query is only a safety net
+        refresh_interval = self.fallback_interval if self.control_server is not None else 0
+        next_refresh = 0.0
+
+        try:
+            while not self._stop_event.is_set() and self.strategies:
+                now = time.monotonic()
+                refresh = now >= next_refresh
+                if refresh:
+                    next_refresh = now + refresh_interval
+                self._schedule_tick(refresh=refresh)
+                self._wake.wait(interval)
+                self._wake.clear()
+
+        except KeyboardInterrupt:
+            print(f"[StrategyHost] Interrupted by user")
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Stop scheduling, wait for running cycles and close the shared pool"""
+        self._stop_event.set()
+        self._wake.set()
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+
+        if self.bar_clock is not None:
+            self.bar_clock.stop()
+        if self.control_server is not None:
+            self.control_server.stop()
+        if self.config_watcher is not None:
+            self.config_watcher.stop()
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+        for configid in list(self.strategies):
+            self.remove_strategy(configid)
+
+        self.order_tracker.stop()
+        self.position_cache.stop()
+        self.termination_coordinator.close()
+        self.execution_logger.close()
+        self.connection_provider.close_all_connections()
+        REGISTRY.remove_collector('host')
+        print(f"[StrategyHost] Stopped. Cycles started: {self.cycles_started}, "
+              f"skipped (overrun): {self.cycles_skipped}")
+
+    def get_stats(self):
+        """Host statistics"""
+        with self._lock:
+            return {
+                'strategies': len(self.strategies),
+                'in_flight': len(self._in_flight),
+                'cycles_started': self.cycles_started,
+                'cycles_skipped': self.cycles_skipped,
+                'pool': self.connection_provider.get_stats(),
+                'termination': self.termination_coordinator.get_stats(),
+                'execution_log': self.execution_logger.get_stats(),
+                'positions': self.position_cache.get_stats(),
+                'orders': self.order_tracker.get_stats(),
+                'bar_clock': self.bar_clock.get_stats() if self.bar_clock is not None else None,
+                'control': self.control_server.get_stats() if self.control_server is not None else None,
+                'config_watcher': self.config_watcher.get_stats() if self.config_watcher is not None else None
+            }
+
+
+def load_strategy_class(spec):
+    """Resolve 'module:ClassName' to a class"""
+    module_name, _, class_name = spec.partition(':')
+    module = importlib.import_module(module_name)
+    return getattr(module, class_name)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Run many strategy configurations in one process')
+    parser.add_argument('--configIDs', type=int, nargs='+', required=True, dest='config_ids',
+                        help='Configuration IDs from database')
+    parser.add_argument('--strategy', default='mtfTrend:MTFTrendStrategy',
+                        help='Strategy class as module:ClassName')
+    parser.add_argument('--interval', type=float, default=0.5, help='Cycle interval in seconds')
+    parser.add_argument('--pool-size', type=int, default=10, help='Shared connection pool size')
+    parser.add_argument('--max-overflow', type=int, default=0, help='Extra connections above pool size')
+    parser.add_argument('--workers', type=int, default=None, help='Worker threads')
+    parser.add_argument('--poll', action='store_true',
+                        help='Run strategy bodies every --interval instead of on new bars')
+    parser.add_argument('--control-interval', type=float, default=1.0,
+                        help='Termination/suspend check interval in bar-driven mode')
+    parser.add_argument('--bar-grace', type=float, default=1.0,
+                        help='Seconds to wait after a new bar before running strategies')
+    parser.add_argument('--control-port', type=int, default=None,
+                        help='Accept terminate/suspend/reload commands on 127.0.0.1:<port> (0 = any free port)')
+    parser.add_argument('--control-token', default=None,
+                        help='Shared secret for control commands (default: generated and announced)')
+    parser.add_argument('--fallback-interval', type=float, default=10.0,
+                        help='Termination queue poll interval while --control-port is set')
+    parser.add_argument('--config-watch-interval', type=float, default=30.0,
+                        help='Seconds between configuration change checks (0 disables hot reload)')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve Prometheus metrics on 127.0.0.1:<port>/metrics')
+    parser.add_argument('--metrics-file', default=None, help='Write metrics as JSON to this file')
+    parser.add_argument('--metrics-interval', type=float, default=10.0,
+                        help='Seconds between --metrics-file writes')
+    args = parser.parse_args()
+
+    exporters = start_exporters(args.metrics_port, args.metrics_file, args.metrics_interval)
+
+    try:
+        host = StrategyHost(load_strategy_class(args.strategy), args.config_ids,
+                            timer_interval=args.interval, pool_size=args.pool_size,
+                            max_overflow=args.max_overflow, max_workers=args.workers,
+                            bar_driven=not args.poll, control_interval=args.control_interval,
+                            bar_grace=args.bar_grace, control_port=args.control_port,
+                            control_token=args.control_token, fallback_interval=args.fallback_interval,
+                            config_watch_interval=args.config_watch_interval)
+
+        if host.load_strategies() == 0:
+            print("No strategies loaded")
+            sys.exit(1)
+
+        host.run()
+
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        for exporter in exporters:
+            exporter.stop()
+
+
+if __name__ == "__main__":
+    main()
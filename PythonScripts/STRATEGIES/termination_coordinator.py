@@ -0,0 +1,197 @@
+"""
+Termination Coordinator - one set-based termination/suspend check for every
+strategy in a process, instead of one sp_TerminateInstance call per strategy
+per cycle.
+"""
+
+import threading
+from datetime import datetime, time as dt_time
+
+import pytz
+
+from ANFramework import PooledConnectionProvider
+
+
+class TerminationCoordinator:
+    """Batched termination and suspend checks shared by many strategies"""
+
+    # One parameter per GUID, SQL Server allows 2100 per statement
+    MAX_GUIDS_PER_QUERY = 2000
+
+    def __init__(self, connection_provider=None):
+        """
+        Args:
+            connection_provider: ConnectionProvider to borrow the persistent connection from
+        """
+        self.connection_provider = connection_provider or PooledConnectionProvider(pool_size=1, max_overflow=0)
+        self._conn = None
+
+        self._guids = {}  # configid -> configInstanceGUID (upper case)
+        self._close_times = {}  # configid -> datetime.time (UTC), only configs with a close time
+        self._terminate = set()  # configids confirmed by sp_TerminateInstance
+        self._instance_state = {}  # configid -> {'time_closed', 'terminate_requested'}
+        self._suspended = set()  # configids suspended by a pushed command
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # refresh() runs on the host loop and on pushed commands
+
+        self.refreshes = 0
+        self.terminations = 0
+
+    @staticmethod
+    def parse_close_time(close_utc):
+        """'HH:MM:SS' -> datetime.time, None for missing or '00:00:00' (no close)"""
+        if not close_utc or str(close_utc) == '00:00:00':
+            return None
+        text = str(close_utc)
+        if len(text) == 8 and text.count(':') == 2:
+            h, m, s = map(int, text.split(':'))
+            return dt_time(h, m, s)
+        return None
+
+    def register(self, strategy):
+        """Track a registered strategy; it will read its checks from this coordinator"""
+        configid = strategy.configid
+        with self._lock:
+            self._guids[configid] = str(strategy.config_instance_guid).upper()
+            close_time = self.parse_close_time((strategy.config_data or {}).get('trading_close_utc'))
+            if close_time is not None:
+                self._close_times[configid] = close_time
+            else:
+                self._close_times.pop(configid, None)
+        strategy.termination_coordinator = self
+
+    def unregister(self, configid):
+        """Stop tracking a strategy"""
+        with self._lock:
+            self._guids.pop(configid, None)
+            self._close_times.pop(configid, None)
+            self._terminate.discard(configid)
+            self._suspended.discard(configid)
+            self._instance_state.pop(configid, None)
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = self.connection_provider.get_connection(autocommit=True)
+        return self._conn
+
+    def _drop_connection(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            if hasattr(self.connection_provider, 'return_connection'):
+                self.connection_provider.return_connection(conn)
+
+    def refresh(self):
+        """
+        One query for all tracked instances; sp_TerminateInstance runs only for
+        instances that actually have a pending termination request.
+        Returns set of configids that must terminate.
+        """
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self):
+        with self._lock:
+            by_guid = {guid: configid for configid, guid in self._guids.items()
+                       if configid not in self._terminate}
+        guids = list(by_guid)
+
+        try:
+            conn = self._connection()
+            cursor = conn.cursor()
+            states = {}
+            for start in range(0, len(guids), self.MAX_GUIDS_PER_QUERY):
+                chunk = guids[start:start + self.MAX_GUIDS_PER_QUERY]
+                placeholders = ", ".join(["?"] * len(chunk))
+                cursor.execute(f"""
+                    SELECT t.configInstanceGUID,
+                           t.timeClosed,
+                           CASE WHEN EXISTS (
+                               SELECT 1
+                               FROM algo.strategy_termination_queue q
+                               WHERE q.configInstanceGUID = t.configInstanceGUID
+                                 AND q.terminate = 1
+                                 AND q.terminated_at IS NULL
+                           ) THEN 1 ELSE 0 END AS terminate_requested
+                    FROM algo.strategyTracker t
+                    WHERE t.configInstanceGUID IN ({placeholders})
+                """, chunk)
+
+                for guid, time_closed, terminate_requested in cursor.fetchall():
+                    configid = by_guid.get(str(guid).upper())
+                    if configid is not None:
+                        states[configid] = {'time_closed': time_closed,
+                                            'terminate_requested': bool(terminate_requested)}
+
+            # Confirm through the procedure: it marks the queue, closes the tracker and logs
+            confirmed = set()
+            for configid, state in states.items():
+                if state['terminate_requested']:
+                    cursor.execute("EXEC algo.sp_TerminateInstance ?", self._guids[configid])
+                    result = cursor.fetchone()
+                    if result and result[0]:
+                        confirmed.add(configid)
+            cursor.close()
+
+        except Exception as e:
+            print(f"[TerminationCoordinator] Refresh error: {e}")
+            self._drop_connection()
+            with self._lock:
+                return set(self._terminate)
+
+        with self._lock:
+            self._instance_state.update(states)
+            self._terminate |= {configid for configid in confirmed if configid in self._guids}
+            self.terminations += len(confirmed)
+            self.refreshes += 1
+            return set(self._terminate)
+
+    def should_terminate(self, configid):
+        """In-memory result of the last refresh"""
+        with self._lock:
+            return configid in self._terminate
+
+    def suspend(self, configid):
+        """Stop trading for a config now, as if its close time was reached"""
+        with self._lock:
+            if configid not in self._guids:
+                return False
+            self._suspended.add(configid)
+            return True
+
+    def should_suspend(self, configid, now=None):
+        """Trading close time reached (UTC) or suspended by a pushed command"""
+        if configid in self._suspended:
+            return True
+        close_time = self._close_times.get(configid)
+        if close_time is None:
+            return False
+        now = now or datetime.now(pytz.UTC).time()
+        return now >= close_time
+
+    def pending_stops(self):
+        """Configids that must stop now: terminated or past their close time"""
+        now = datetime.now(pytz.UTC).time()
+        with self._lock:
+            suspended = {configid for configid, close_time in self._close_times.items() if now >= close_time}
+            return self._terminate | suspended | self._suspended
+
+    def get_instance_state(self, configid):
+        """Last seen tracker state for a config"""
+        with self._lock:
+            return self._instance_state.get(configid)
+
+    def close(self):
+        """Release the persistent connection"""
+        self._drop_connection()
+
+    def get_stats(self):
+        """Coordinator statistics"""
+        with self._lock:
+            return {
+                'tracked': len(self._guids),
+                'with_close_time': len(self._close_times),
+                'terminating': len(self._terminate),
+                'suspended': len(self._suspended),
+                'refreshes': self.refreshes,
+                'terminations': self.terminations
+            }
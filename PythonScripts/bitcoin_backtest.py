@@ -2,13 +2,48 @@
 Bitcoin EMA+RSI Scalping Strategy - Backtest
 Fixed position size: 0.01 BTC
 Close all positions at 23:59 UTC daily
+
+Usage:
+    python bitcoin_backtest.py            # interactive, day by day
+    python bitcoin_backtest.py --batch    # vectorized, no prompts
 """
 
 import pyodbc
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 import os
 import sys
+import time
+
+
+def resolve_positions(entry_mask, exit_mask):
+    """
+    Walk the long/flat state machine over boolean arrays.
+
+    Only transitions are visited: from flat the next entry is the first
+    entry bar at or after the cursor, from long the next exit is the first
+    exit bar after the entry. Returns (entry_idx, exit_idx) arrays; a trade
+    still open at the last bar has exit index -1.
+    """
+    entries = np.flatnonzero(entry_mask)
+    exits = np.flatnonzero(exit_mask)
+    entry_idx, exit_idx = [], []
+    cursor = 0
+    while True:
+        k = np.searchsorted(entries, cursor)
+        if k == len(entries):
+            break
+        entry = entries[k]
+        k = np.searchsorted(exits, entry, side='right')
+        entry_idx.append(entry)
+        if k == len(exits):
+            exit_idx.append(-1)
+            break
+        exit_idx.append(exits[k])
+        # The exit bar itself cannot open a new position
+        cursor = exits[k] + 1
+    return np.asarray(entry_idx, dtype=np.int64), np.asarray(exit_idx, dtype=np.int64)
 
 
 class BitcoinScalpingBacktest:
@@ -482,6 +517,140 @@ class BitcoinScalpingBacktest:
                 color = "\033[92m" if day['total_profit'] > 0 else "\033[91m" if day['total_profit'] < 0 else "\033[93m"
                 print(f"  {day['date']}: {day['trades']} trades, {color}${day['total_profit']:,.2f} ({day['return_pct']:.2f}%)\033[0m")
 
+    def indicator_arrays(self, df):
+        """Return price, EMA5, EMA20 and RSI14 as float arrays, preferring locally filled columns"""
+        suffix = '_final' if 'EMA_5_final' in df.columns else ''
+        return (df['Price'].to_numpy(dtype=float),
+                df['EMA_5' + suffix].to_numpy(dtype=float),
+                df['EMA_20' + suffix].to_numpy(dtype=float),
+                df['RSI_14' + suffix].to_numpy(dtype=float))
+
+    def build_signal_masks(self, df):
+        """
+        Evaluate check_buy_signal / check_close_long_signal over whole arrays.
+
+        Mirrors run_backtest: bars without indicators are skipped, 23:59 bars
+        only force-close, and "RSI rising" compares against the previous bar
+        that was actually processed (not the previous row).
+        """
+        price, ema_5, ema_20, rsi = self.indicator_arrays(df)
+        bar_time = df['BarTime']
+        valid = ~(np.isnan(ema_5) | np.isnan(ema_20) | np.isnan(rsi))
+        end_of_day = ((bar_time.dt.hour == 23) & (bar_time.dt.minute == 59)).to_numpy()
+        processed = valid & ~end_of_day
+
+        # RSI of the previous processed bar; the first processed bar has none
+        processed_idx = np.flatnonzero(processed)
+        prev_rsi = np.full(len(df), np.nan)
+        prev_rsi[processed_idx[1:]] = rsi[processed_idx[:-1]]
+        rising = np.ones(len(df), dtype=bool)
+        rising[processed_idx[1:]] = rsi[processed_idx[1:]] > prev_rsi[processed_idx[1:]]
+
+        with np.errstate(invalid='ignore'):
+            buy = processed & (price > ema_20) & (ema_5 > ema_20) & (rsi < 75) & rising
+            close = processed & (rsi > 75)
+
+        return {
+            'buy': buy,
+            'close': close,
+            'end_of_day': valid & end_of_day,
+            'prev_rsi': prev_rsi,
+        }
+
+    def run_batch_backtest(self, df=None):
+        """
+        Non-interactive backtest over the whole history.
+
+        Produces the same trades, daily results and statistics as
+        run_backtest in auto mode without per-bar output or input() prompts.
+        """
+        if df is None:
+            if not self.connect():
+                return None
+            try:
+                df = self.load_historical_data()
+            finally:
+                self.cursor.close()
+                self.conn.close()
+        if df.empty:
+            print("No data for backtest")
+            return None
+
+        started = time.perf_counter()
+        self.capital = self.initial_capital
+        self.position = None
+        self.trades = []
+        self.daily_results = []
+
+        price, ema_5, ema_20, rsi = self.indicator_arrays(df)
+        masks = self.build_signal_masks(df)
+        entry_idx, exit_idx = resolve_positions(masks['buy'], masks['close'] | masks['end_of_day'])
+
+        # An open position at the end is closed on the last row, as in run_backtest
+        forced = exit_idx < 0
+        exit_idx = np.where(forced, len(df) - 1, exit_idx)
+
+        entry_times = df['BarTime'].iloc[entry_idx].tolist()
+        exit_times = df['BarTime'].iloc[exit_idx].tolist()
+        volume_btc = self.position_size_btc
+        entry_price = price[entry_idx]
+        exit_price = price[exit_idx]
+        profit_usd = volume_btc * (exit_price - entry_price)
+        profit_pct = (exit_price - entry_price) / entry_price * 100
+
+        for n, (entry, exit_) in enumerate(zip(entry_idx, exit_idx)):
+            prev_rsi = masks['prev_rsi'][entry]
+            conditions = [f"Price ${price[entry]:,.2f} > EMA20 ${ema_20[entry]:,.2f}",
+                          f"EMA5 ${ema_5[entry]:,.2f} > EMA20 ${ema_20[entry]:,.2f}",
+                          f"RSI_14={rsi[entry]:.1f} < 75"]
+            if not np.isnan(prev_rsi):
+                conditions.append(f"RSI rising: {prev_rsi:.1f} → {rsi[entry]:.1f}")
+            if forced[n]:
+                conditions.append("End of backtest forced close")
+            elif masks['end_of_day'][exit_]:
+                conditions.append("End of trading day (23:59 UTC)")
+            else:
+                conditions.append(f"RSI_14={rsi[exit_]:.1f} > 75 (overbought)")
+
+            entry_time, exit_time = entry_times[n], exit_times[n]
+            self.trades.append({
+                'entry_time': entry_time,
+                'exit_time': exit_time,
+                'entry_price': float(entry_price[n]),
+                'exit_price': float(exit_price[n]),
+                'volume_btc': volume_btc,
+                'profit_usd': float(profit_usd[n]),
+                'profit_pct': float(profit_pct[n]),
+                'duration_minutes': (exit_time - entry_time).total_seconds() / 60,
+                'conditions': conditions
+            })
+
+        # Daily results group trades by the day they were closed; the final
+        # forced close happens after the day loop and belongs to no day
+        capital = self.initial_capital
+        day_trades = {}
+        for trade, is_forced in zip(self.trades, forced):
+            if not is_forced:
+                day_trades.setdefault(trade['exit_time'].date(), []).append(trade)
+        for day_date, trades in day_trades.items():
+            total_profit = sum(t['profit_usd'] for t in trades)
+            self.daily_results.append({
+                'date': day_date,
+                'trades': len(trades),
+                'profitable': len([t for t in trades if t['profit_usd'] > 0]),
+                'total_profit': total_profit,
+                'start_capital': capital,
+                'end_capital': capital + total_profit,
+                'return_pct': total_profit / capital * 100
+            })
+            capital += total_profit
+
+        self.capital = self.initial_capital + sum(t['profit_usd'] for t in self.trades)
+        elapsed = time.perf_counter() - started
+        print(f"\nBatch backtest: {len(df)} bars, {len(self.trades)} trades in {elapsed * 1000:.1f} ms")
+        self.show_statistics()
+        return self.trades
+
     def clear_screen(self):
         """Clear console screen"""
         os.system('cls' if os.name == 'nt' else 'clear')
@@ -646,6 +815,11 @@ class BitcoinScalpingBacktest:
 
 def main():
     """Main function"""
+    # --batch: non-interactive vectorized run, usable without a terminal
+    if '--batch' in sys.argv:
+        BitcoinScalpingBacktest().run_batch_backtest()
+        return
+
     print("\033[96m" + "=" * 70)
     print("BITCOIN EMA+RSI SCALPING STRATEGY - BACKTEST")
     print("=" * 70 + "\033[0m")
@@ -8,6 +8,13 @@ import json
 import time        # FUNCTION: Sleep and timing operations
 import sys         # FUNCTION: System-specific parameters and functions
 import os          # MODULE: Operating system interfaces
+
+# Startup timing; fast start (--fast-start or ANFUND_FAST_START=1) keeps cached
+# bytecode, skips the forced module reloads and pre-warms the connection pool
+STARTUP_STARTED = time.perf_counter()
+FAST_START = '--fast-start' in sys.argv or os.getenv('ANFUND_FAST_START') == '1'
+PREWARM_CONNECTIONS = 4  # configuration, execution log, position cache, cycle
+
 import pyodbc      # MODULE: Database connection for SQL Server
 import pytz        # MODULE: Timezone handling
 from datetime import datetime, time as time_type, timedelta  # CLASS: Date and time manipulation
@@ -16,6 +23,16 @@ import importlib   # MODULE: Module reloading
 # ===== IMPORT ANFRAMEWORK =====
 import ANFramework
 from ANFramework import EnvironmentConfig, LocalConnectionProvider, DatabaseHelper
+# Execution log, position cache and order tracking live with the new framework modules
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'STRATEGIES'))
+from execution_logger import ExecutionLogger
+from position_cache import PositionCache
+from order_tracker import OrderTracker
+from metrics import REGISTRY, instrument_connection, start_exporters
+from scheduler import DeadlineScheduler
+from async_db import AsyncDatabase
+from control_channel import ControlServer
+from config_watcher import ConfigWatcher
 # ===== CLEAN CACHE ON START =====
 
 
@@ -43,12 +60,18 @@ def clean_pycache():
         print(f"[CACHE] Cleanup warning: {e}")
 
 # Execute cache cleanup before imports
-clean_pycache()
+if not FAST_START:
+    clean_pycache()
 
 
 # ===== SAFE IMPORT WITH RELOAD =====
 def safe_import_modules():
     """Safely import modules with forced reload"""
+    if FAST_START:
+        from sp_create_signal import execute_signal_procedure
+        from strategy_termination import StrategyTerminationService
+        return execute_signal_procedure, StrategyTerminationService
+
     try:
         # First import modules
         import sp_create_signal
@@ -75,6 +98,7 @@ def safe_import_modules():
 
 # Import modules with reload
 execute_signal_procedure, StrategyTerminationService = safe_import_modules()
+IMPORTS_DONE = time.perf_counter()
 
 
 class MTFRSIEMAStrategy(StrategyBase):
@@ -83,9 +107,10 @@ class MTFRSIEMAStrategy(StrategyBase):
     Loads configuration from database and operates according to Technical Specification
     """
 
-    def __init__(self, configuration_id: int):
+    def __init__(self, configuration_id: int, control_port=None):
         # Clean cache again at strategy instance creation
-        clean_pycache()
+        if not FAST_START:
+            clean_pycache()
 
         print(f"[STRATEGY] Starting strategy for config_id: {configuration_id}")
         print(f"[STRATEGY] Python executable: {sys.executable}")
@@ -94,29 +119,56 @@ class MTFRSIEMAStrategy(StrategyBase):
         self.configuration_id = configuration_id
         # Вызов родительского конструктора с временным timeframe_id=1
         # timeframe_id будет обновлён в _setup_parameters
-        super().__init__(configuration_id, timeframe_id=1, timer_interval=0.5)
+        # Fast start: pool handshakes run in the background while the configuration loads
+        connection_provider = LocalConnectionProvider(min_size=PREWARM_CONNECTIONS) if FAST_START else None
+        super().__init__(configuration_id, timeframe_id=1, timer_interval=0.5,
+                         connection_provider=connection_provider)
 
         self.last_signal_bar_time = None
         self.last_confirmation_bar_time = None
         self.last_trend_bar_time = None
         self.last_heartbeat_time = None
+        # Seconds after a signal bar closes before the logic runs (bar and indicator rows land first)
+        self.bar_offset_seconds = 2.0
+        self.scheduler = None
+        # Pushed terminate/suspend/reload commands (control_channel.py); DB polling becomes a fallback
+        self.control_server = None
+        self._suspend_requested = False
 
         try:
             self.config = self._load_configuration_from_db()
             self._setup_parameters()
-
-            # Используем self.db из родительского класса StrategyBase
-            init_conn = self.db.get_connection()
-            try:
-                self._update_tracker_state(init_conn, 'start')
-            finally:
-                self.db.return_connection(init_conn)
+            self.startup_marks = {'imports': IMPORTS_DONE, 'configuration': time.perf_counter()}
+
+            # Execution logs and tracker states are written behind by a background worker
+            self.execution_logger = ExecutionLogger(self.connection_provider).start()
+            # Open positions are synced in the background; lookups do not hit the DB
+            self.position_cache = PositionCache(self.connection_provider).start()
+            # Fills are awaited as futures resolved from position cache deltas
+            self.order_tracker = OrderTracker(self.position_cache, default_timeout=5.0).start()
+            # Independent per-cycle reads run concurrently, one pooled connection each
+            self.async_db = AsyncDatabase(self.connection_provider, max_workers=2, instrument=True)
+            REGISTRY.add_collector('pool', self.connection_provider.get_stats)
+            REGISTRY.add_collector('async_db', self.async_db.get_stats)
+            REGISTRY.add_collector('positions', self.position_cache.get_stats)
+            REGISTRY.add_collector('orders', self.order_tracker.get_stats)
+            REGISTRY.add_collector('execution_log', self.execution_logger.get_stats)
+            self._update_tracker_state(None, 'start')
 
             # Получаем строку подключения для termination service
             connection_string = self.connection_provider.connection_string
             self.termination_service = StrategyTerminationService(connection_string)
 
-            print(f"[CONFIG] Strategy interval set to {self.strategy_interval_seconds} seconds")
+            if control_port is not None:
+                self.control_server = ControlServer('mtf_rsi_ema_v3', [self.configuration_id], port=control_port,
+                                                    token=os.getenv('ANFUND_CONTROL_TOKEN'))
+                self.control_server.register('status', lambda config_id, message: self.scheduler.get_stats()
+                                             if self.scheduler is not None else {})
+                self.control_server.register('terminate', self._on_terminate_command)
+                self.control_server.register('suspend', self._on_suspend_command)
+                self.control_server.register('reload', self._on_reload_command)
+
+            print(f"[CONFIG] Strategy logic at signal bar close + {self.bar_offset_seconds} seconds")
 
         except Exception as e:
             print(f"Error: {e}")
@@ -198,47 +250,61 @@ class MTFRSIEMAStrategy(StrategyBase):
         Get current trading signal from SQL function
         Returns: 'buy', 'sell', or None
         """
+        conn = self.db_helper.get_connection()
         try:
-            conn = self.db_helper.get_connection()
-            cursor = conn.cursor()
+            return self.fetch_current_signals(instrument_connection(conn))
+        finally:
+            self.db_helper.return_connection(conn)
 
-            cursor.execute("""
-                SELECT trading_signal
-                FROM algo.fn_GetCurrentSignals(?, ?, ?, ?)
-            """, (self.ticker_jid, self.timeframe_signal_id,
-                  self.timeframe_confirmation_id, self.timeframe_trend_id))
+    def fetch_current_signals(self, connection):
+        """
+        algo.fn_GetCurrentSignals on the given connection
+        Returns: 'buy', 'sell', or None
+        """
+        cursor = connection.cursor()
 
-            row = cursor.fetchone()
-            cursor.close()
+        cursor.execute("""
+            SELECT trading_signal
+            FROM algo.fn_GetCurrentSignals(?, ?, ?, ?)
+        """, (self.ticker_jid, self.timeframe_signal_id,
+              self.timeframe_confirmation_id, self.timeframe_trend_id))
 
-            if row and row.trading_signal:
-                return row.trading_signal.lower()  # 'buy' or 'sell'
-            return None
+        row = cursor.fetchone()
+        cursor.close()
 
-        finally:
-            self.db_helper.return_connection(conn)
+        if row and row.trading_signal:
+            return row.trading_signal.lower()  # 'buy' or 'sell'
+        return None
+
+    async def read_cycle_inputs(self):
+        """
+        Price and trading signal, each on its own pooled connection, concurrently
+        Returns: (price_info, trading_signal)
+        """
+        return await self.async_db.gather(
+            self.async_db.call(self.get_current_price, self.ticker_jid, 1),
+            self.async_db.call(self.fetch_current_signals))
 
     def log_strategy_execution(self, connection, config_id, signal_type, volume, price=None, trade_uuid=None):
+        """
+        Queue the log row; returns a LogEvent handle for set_trade_uuid().
+        The connection is not used - the row is written by ExecutionLogger.
+        """
         try:
-            cursor = connection.cursor()
-            cursor.execute("EXEC logs.sp_LogStrategyExecution @configID=?, @signalType=?, @volume=?, @price=?, @trade_uuid=?",
-                           (config_id, signal_type, volume, price, trade_uuid))
-            row = cursor.fetchone()
-
-            connection.commit()
-            cursor.close()
-
-            execution_id = row.executionID if row else None
-            return execution_id
-
+            return self.execution_logger.log_execution(config_id, signal_type=signal_type, volume=volume,
+                                                       price=price, trade_uuid=trade_uuid)
         except Exception as e:
             print(f"Error logging strategy execution: {e}")
             return None
 
     def get_open_positions(self, connection):
         """
-        Returns list of open positions for current strategy using function
+        Returns list of open positions for current strategy.
+        Served from PositionCache; falls back to algo.fn_GetStrategyPositionIDs.
         """
+        if getattr(self, 'position_cache', None) is not None:
+            return self.position_cache.get_positions(self.configuration_id)
+
         positions = []
         try:
             cursor = connection.cursor()
@@ -277,9 +343,10 @@ class MTFRSIEMAStrategy(StrategyBase):
 
         return positions
 
-    def get_market_info(self, connection, ticker, ticker_jid, close_time_utc):
+    def get_market_info(self, connection, ticker, ticker_jid, close_time_utc, price_info=None):
         """
         Gets market information for display
+        price_info: already fetched get_current_price() result (optional)
         """
         info = {
             'price': 'N/A',
@@ -297,7 +364,8 @@ class MTFRSIEMAStrategy(StrategyBase):
             current_utc = datetime.now(pytz.UTC)
 
             # Get current price
-            price_info = self.get_current_price(connection, ticker_jid, 1)
+            if price_info is None:
+                price_info = self.get_current_price(connection, ticker_jid, 1)
             if price_info:
                 info['price'] = f"{price_info['price']:.2f}"
                 info['price_time'] = price_info['time']
@@ -341,11 +409,16 @@ class MTFRSIEMAStrategy(StrategyBase):
             # Keep only the latest position, close others
             latest_position = max(positions, key=lambda x: x['id'])
 
+            closing = []
             for pos in positions:
                 if pos['id'] != latest_position['id']:
                     print(f"Closing duplicate position ID={pos['id']}")
                     self.close_position(connection, pos['id'])
-                    time.sleep(1)  # Wait for close
+                    closing.append(self.order_tracker.expect_close(pos['id']))
+
+            # Wait for all closes together
+            for future in closing:
+                future.result()
 
             return [latest_position]
 
@@ -357,16 +430,13 @@ class MTFRSIEMAStrategy(StrategyBase):
         """
         print(f"Waiting for position confirmation...")
 
-        for check in range(max_checks):
-            time.sleep(check_interval_seconds)
-
-            positions = self.get_open_positions(connection)
-            if positions:
-                pos = positions[0]
-                print(f"Position confirmed: ID={pos['id']}, Direction={pos['direction']}")
-                return positions[0]
-
-            # print(f"  Check {check + 1}/{max_checks}: Position not yet confirmed...")
+        # Resolves on the cache refresh that shows the fill, not on a fixed sleep
+        pos = self.order_tracker.expect_open(self.configuration_id, ticker=ticker, direction=expected_direction,
+                                             timeout=max_checks * check_interval_seconds,
+                                             accept_existing=True).result()
+        if pos:
+            print(f"Position confirmed: ID={pos['id']}, Direction={pos['direction']}")
+            return pos
 
         print("Warning: Position not confirmed after maximum checks")
         return None
@@ -422,7 +492,7 @@ class MTFRSIEMAStrategy(StrategyBase):
         )
 
         if execution_id:
-            print(f"Strategy execution logged: ID={execution_id}")
+            print(f"Strategy execution queued: {execution_id}")
 
         # 3. Use existing method but with FAST parameters
         position = self.wait_for_position_confirmation(
@@ -439,15 +509,8 @@ class MTFRSIEMAStrategy(StrategyBase):
 
             # 4. Update log with UUID if we have log_id
             if execution_id:
-                cursor = connection.cursor()
-                cursor.execute("""
-                    UPDATE logs.strategyExecution 
-                    SET trade_uuid = ? 
-                    WHERE ID = ?
-                """, (position['orderUUID'], execution_id))
-                connection.commit()
-                cursor.close()
-                print(f"DEBUG: Updated log ID={execution_id} with UUID={position['orderUUID']}")
+                self.execution_logger.set_trade_uuid(execution_id, position['orderUUID'])
+                print(f"DEBUG: Updated log {execution_id} with UUID={position['orderUUID']}")
 
             return position
         else:
@@ -459,12 +522,18 @@ class MTFRSIEMAStrategy(StrategyBase):
             print(f"\n  === EXECUTING REVERSAL ===")
             print(f"  Current: {current_position['direction']}, New: {new_direction.upper()}")
 
-            # Close current position
-            print(f"  Closing position ID={current_position['id']}")
-            self.close_position(connection, current_position['id'])
+            # Drop and new order go out as one signal batch; one future tracks both legs
+            print(f"  Closing position ID={current_position['id']}, opening {new_direction.upper()} position")
+            reversed_position = self.order_tracker.submit_reversal(
+                connection, self.configuration_id, current_position, new_direction, self.open_volume,
+                broker_id=self.broker_id, platform_id=self.platform_id,
+                drop_volume=current_position['volume'])
+            if reversed_position.done() and reversed_position.result() is None:
+                print(f"  Reversal signals were not sent")
+                return False
 
-            # LOG: Drop signal IMMEDIATELY
-            drop_log_id = self.log_strategy_execution(
+            # LOG: Both legs IMMEDIATELY
+            self.log_strategy_execution(
                 connection=connection,
                 config_id=self.configuration_id,
                 signal_type='drop',
@@ -472,26 +541,6 @@ class MTFRSIEMAStrategy(StrategyBase):
                 price=None,
                 trade_uuid=current_position['orderUUID']
             )
-
-            # Open new position
-            print(f"  Opening {new_direction.upper()} position")
-            execute_signal_procedure(
-                connection=connection,
-                ticker=self.symbol,
-                direction=new_direction,
-                volume=self.open_volume,
-                order_price=None,
-                stop_loss=None,
-                take_profit=None,
-                expiry=None,
-                broker_id=self.broker_id,
-                platform_id=self.platform_id,
-                trade_id=None,
-                trade_type=None,
-                strategy_configuration_id=self.configuration_id
-            )
-
-            # LOG: New position signal IMMEDIATELY
             new_log_id = self.log_strategy_execution(
                 connection=connection,
                 config_id=self.configuration_id,
@@ -501,21 +550,13 @@ class MTFRSIEMAStrategy(StrategyBase):
                 trade_uuid=None  # Will be None initially
             )
 
-            # Fast wait for new position
-            time.sleep(0.5)
-            positions = self.get_open_positions(connection)
-            new_position_uuid = positions[0]['orderUUID'] if positions else None
+            # Wait for both fills
+            new_position = reversed_position.result()
+            new_position_uuid = new_position['orderUUID'] if new_position else None
 
             # Update new position log with UUID
             if new_log_id and new_position_uuid:
-                cursor = connection.cursor()
-                cursor.execute("""
-                    UPDATE logs.strategyExecution 
-                    SET trade_uuid = ? 
-                    WHERE ID = ?
-                """, (new_position_uuid, new_log_id))
-                connection.commit()
-                cursor.close()
+                self.execution_logger.set_trade_uuid(new_log_id, new_position_uuid)
 
             return True
 
@@ -544,7 +585,7 @@ class MTFRSIEMAStrategy(StrategyBase):
                 self.close_position(connection, pos['id'])
 
                 # Wait for close confirmation
-                time.sleep(1)
+                self.order_tracker.expect_close(pos['id']).result()
 
                 # Verify position closed
                 positions_after = self.get_open_positions(connection)
@@ -640,7 +681,7 @@ class MTFRSIEMAStrategy(StrategyBase):
                 trade_uuid=position_uuid  # Use actual position UUID
             )
 
-            print(f"[DEBUG] Drop logged with ID={log_id}, UUID={position_uuid}")
+            print(f"[DEBUG] Drop queued: {log_id}, UUID={position_uuid}")
 
             # Явный коммит после обеих операций
             connection.commit()
@@ -686,32 +727,13 @@ class MTFRSIEMAStrategy(StrategyBase):
             print(f"\n  === EXECUTING REVERSAL ===")
             print(f"  Current: {current_dir.upper()}, New: {final_signal.upper()}")
 
-            # Close current position
-            print(f"  Closing position ID={pos['id']}")
-            self.close_position(connection, pos['id'])
+            # Drop and new order in one signal batch, confirmed together
+            print(f"  Closing position ID={pos['id']}, opening {final_signal.upper()} position")
+            reversed_position = self.order_tracker.submit_reversal(
+                connection, strategy_configuration_id, dict(pos, ticker=ticker), final_signal, open_volume,
+                broker_id=broker_id, platform_id=platform_id, drop_volume=pos['volume'])
 
-            # Wait for close confirmation
-            time.sleep(1)
-
-            # Open new position
-            print(f"  Opening {final_signal.upper()} position")
-            execute_signal_procedure(
-                connection=connection,
-                ticker=ticker,
-                direction=final_signal,
-                volume=open_volume,
-                order_price=None,
-                stop_loss=None,
-                take_profit=None,
-                expiry=None,
-                broker_id=broker_id,
-                platform_id=platform_id,
-                trade_id=None,
-                trade_type=None,
-                strategy_configuration_id=strategy_configuration_id
-            )
-
-            return True
+            return reversed_position.result() is not None
 
         return False
 
@@ -726,12 +748,11 @@ class MTFRSIEMAStrategy(StrategyBase):
                                   self.platform_id, self.configuration_id):
             return True
 
-        # 2. Get market info for display
-        market_info = self.get_market_info(connection, self.symbol,
-                                           self.ticker_jid, self.trading_close_utc)
-
-        # 3. Get current trading signal from SQL function
-        trading_signal = self.get_current_signals()
+        # 2-3. Price and trading signal are independent reads: run them concurrently
+        # (positions for the market info come from PositionCache, not the DB)
+        price_info, trading_signal = self.async_db.run(self.read_cycle_inputs())
+        market_info = self.get_market_info(connection, self.symbol, self.ticker_jid,
+                                           self.trading_close_utc, price_info=price_info)
 
         # 4. Get trend for display (отдельно для отображения)
         trend_display = self.get_trend_for_display() if hasattr(self, 'get_trend_for_display') else None
@@ -755,8 +776,7 @@ class MTFRSIEMAStrategy(StrategyBase):
             if current_dir != trading_signal:
                 # Execute reversal
                 if self.execute_reversal(connection, pos, trading_signal):
-                    # After trading, show updated info
-                    time.sleep(1)
+                    # After trading, show updated info (the reversal already waited for the fills)
                     updated_info = self.get_market_info(connection, self.symbol,
                                                         self.ticker_jid, self.trading_close_utc)
                     self.show_minute_info(self.symbol, updated_info,
@@ -774,7 +794,7 @@ class MTFRSIEMAStrategy(StrategyBase):
         print(f"Config ID: {self.configuration_id}")
         print(f"Ticker: {self.symbol}")
         print(f"Volume: {self.open_volume} lots")
-        print(f"Strategy interval: {self.strategy_interval_seconds} seconds")
+        print(f"Strategy logic: signal bar close + {self.bar_offset_seconds} seconds")
 
         if self.trading_close_utc and self.trading_close_utc != time_type(0, 0, 0):
             print(f"Daily Close: {self.trading_close_utc} UTC")
@@ -825,86 +845,32 @@ class MTFRSIEMAStrategy(StrategyBase):
         finally:
             self.db_helper.return_connection(init_conn)
 
+        logic_seconds = self.TIMEFRAME_MAP.get(self.timeframe_signal_id, 60)
         print("\n" + "=" * 70)
-        print(f"Strategy monitoring started (30-second cycle)")
+        print(f"Strategy monitoring started (logic at {logic_seconds}s bar close + {self.bar_offset_seconds}s)")
         print("=" * 70)
 
-        last_strategy_run = None
-        last_heartbeat_sent = None
+        # Absolute deadlines: termination 100 ms (5 s fallback when commands are pushed),
+        # logic on signal bar boundaries, heartbeat 60 s; reload runs only when pushed
+        termination_seconds = 5.0 if self.control_server is not None else 0.1
+        self.scheduler = DeadlineScheduler()
+        self.scheduler.add_job('termination', termination_seconds, self._termination_job, run_now=True)
+        self.scheduler.add_job('logic', logic_seconds, self._strategy_job,
+                               offset=self.bar_offset_seconds, align=True)
+        self.scheduler.add_job('heartbeat', 60, self._heartbeat_job, run_now=True)
+        self.scheduler.add_job('reload', None, self._reload_job)
+        # algo.ConfigurationSets changes are applied without a restart
+        self.config_watcher = ConfigWatcher(self.connection_provider,
+                                            on_change=lambda config_id: self.scheduler.trigger('reload'))
+        self.config_watcher.register(self.configuration_id)
+        self.scheduler.add_job('config', 30, self.config_watcher.poll, run_now=True)
+        REGISTRY.add_collector('scheduler', self.scheduler.get_stats)
+        if self.control_server is not None:
+            self.control_server.start()
+        self.report_startup()
 
         try:
-            while True:
-                # ===== FAST TERMINATION CHECK (every 100ms) =====
-                termination = self.termination_service.check_my_termination(self.configuration_id)
-                if termination:
-                    # Close all open positions
-                    term_conn = self.db_helper.get_connection()
-                    try:
-                        positions = self.get_open_positions(term_conn)
-                        if positions:
-                            print(f"[Termination] Closing {len(positions)} open position(s)...")
-                            for pos in positions:
-                                print(f"  Closing position ID={pos['id']} (Direction: {pos['direction']})")
-                                self.close_position(connection=term_conn, trade_id=pos['id'])
-
-                        # Update tracker state with termination connection
-                        self._update_tracker_state(term_conn, 'terminated')
-                    finally:
-                        self.db_helper.return_connection(term_conn)
-
-                    self.termination_service.mark_completed(termination['termination_id'])
-                    self.termination_service.clear_cache()
-
-                    print(f"\n{'=' * 70}")
-                    print(f"[Termination] Strategy {self.configuration_id} terminated successfully")
-                    print(f"Exiting program...")
-                    print(f"{'=' * 70}")
-                    break
-
-                now = datetime.now(pytz.UTC)
-
-                # ===== STRATEGY LOGIC (every 30 seconds) =====
-                if last_strategy_run is None or (now - last_strategy_run).total_seconds() >= self.strategy_interval_seconds:
-                    try:
-                        print(f"[CYCLE] Strategy execution at {now.strftime('%H:%M:%S')} UTC")
-
-                        # Create connection for strategy cycle
-                        strategy_conn = self.db_helper.get_connection()
-                        try:
-                            should_terminate = self.run_strategy(strategy_conn)
-
-                            if should_terminate:
-                                print(f"\n{'=' * 70}")
-                                print(f"Strategy {self.configuration_id} completed (force close executed)")
-                                print(f"{'=' * 70}")
-                                self._update_tracker_state(strategy_conn, 'terminated')
-                                break
-
-                            last_strategy_run = now
-
-                            # Log next execution time
-                            next_run = now + timedelta(seconds=self.strategy_interval_seconds)
-                            print(f"[CYCLE] Next execution at {next_run.strftime('%H:%M:%S')} UTC")
-
-                        finally:
-                            self.db_helper.return_connection(strategy_conn)
-
-                    except Exception as e:
-                        print(f"Error in strategy execution: {e}")
-                        # Wait a bit before retry
-                        time.sleep(5)
-
-                # ===== HEARTBEAT (every 60 seconds) =====
-                if last_heartbeat_sent is None or (now - last_heartbeat_sent).total_seconds() >= 60:
-                    heartbeat_conn = self.db_helper.get_connection()
-                    try:
-                        self.send_heartbeat(heartbeat_conn, self.configuration_id)
-                        last_heartbeat_sent = now
-                    finally:
-                        self.db_helper.return_connection(heartbeat_conn)
-
-                # ===== SHORT PAUSE FOR FAST TERMINATION =====
-                time.sleep(0.1)
+            self.scheduler.run()
 
         except KeyboardInterrupt:
             print("\n\n" + "=" * 70)
@@ -933,18 +899,161 @@ class MTFRSIEMAStrategy(StrategyBase):
             print(f"\nUnexpected error: {e}")
             raise
 
-    def _update_tracker_state(self, connection, state: str):
+    # ===== CONTROL COMMANDS (control server thread) =====
+
+    def _trigger(self, job):
+        if self.scheduler is None or not self.scheduler.trigger(job):
+            raise ValueError("strategy is not running yet")
+
+    def _on_terminate_command(self, config_id, message):
+        """Check the termination queue now instead of at the next fallback poll"""
+        self.termination_service.clear_cache()
+        self._trigger('termination')
+        return {'config_id': self.configuration_id}
+
+    def _on_suspend_command(self, config_id, message):
+        """Close positions and stop without a termination request"""
+        self._suspend_requested = True
+        self._trigger('termination')
+        return {'config_id': self.configuration_id}
+
+    def _on_reload_command(self, config_id, message):
+        self._trigger('reload')
+        return {'config_id': self.configuration_id}
+
+    def _reload_job(self):
         """
-        Update strategy state in algo.strategyTracker table
+        Triggered job: re-read algo.fn_GetStrategyConfiguration between cycles.
+        The new configuration replaces the old one as a whole; the logic job is
+        re-aligned only when the signal timeframe changed.
         """
+        previous = self.config
+        config = self._load_configuration_from_db()
+        changed = sorted(key for key, value in config.items() if previous.get(key) != value)
+        if not changed:
+            return
+
+        self.config = config
         try:
-            cursor = connection.cursor()  # Используем переданное соединение
+            self._setup_parameters()
+        except Exception:
+            self.config = previous
+            self._setup_parameters()
+            raise
 
-            cursor.execute("""
-                EXEC algo.sp_UpdateStrategyState @configID = ?, @currentState = ?
-            """, (self.configuration_id, state))
-            connection.commit()
-            cursor.close()
+        if 'timeframe_signal_id' in changed:
+            logic_seconds = self.TIMEFRAME_MAP.get(self.timeframe_signal_id, 60)
+            self.scheduler.add_job('logic', logic_seconds, self._strategy_job,
+                                   offset=self.bar_offset_seconds, align=True)
+        print(f"[Control] Configuration {self.configuration_id} reloaded: {', '.join(changed)}")
+
+    def report_startup(self):
+        """Print and record time from process start to the first scheduled job"""
+        self.startup_marks['ready'] = time.perf_counter()
+        previous = STARTUP_STARTED
+        phases = []
+        for phase, mark in self.startup_marks.items():
+            REGISTRY.histogram('startup_seconds', phase=phase).observe(mark - previous)
+            phases.append(f"{phase} {(mark - previous) * 1000:.0f} ms")
+            previous = mark
+        total = self.startup_marks['ready'] - STARTUP_STARTED
+        print(f"[STARTUP] Ready in {total * 1000:.0f} ms ({', '.join(phases)}; "
+              f"fast start {'on' if FAST_START else 'off'})")
+        return total
+
+    def _termination_job(self):
+        """
+        Scheduler job (100 ms, or 5 s with the control server): close positions and
+        stop when termination is requested or a suspend command was pushed
+        """
+        if self._suspend_requested:
+            suspend_conn = self.db_helper.get_connection()
+            try:
+                for pos in self.get_open_positions(suspend_conn):
+                    print(f"[Suspend] Closing position ID={pos['id']} (Direction: {pos['direction']})")
+                    self.close_position(connection=suspend_conn, trade_id=pos['id'])
+                self._update_tracker_state(suspend_conn, 'stop')
+            finally:
+                self.db_helper.return_connection(suspend_conn)
+            print(f"[Suspend] Strategy {self.configuration_id} suspended")
+            return False
+
+        termination = self.termination_service.check_my_termination(self.configuration_id)
+        if not termination:
+            return True
+
+        # Close all open positions
+        term_conn = self.db_helper.get_connection()
+        try:
+            positions = self.get_open_positions(term_conn)
+            if positions:
+                print(f"[Termination] Closing {len(positions)} open position(s)...")
+                for pos in positions:
+                    print(f"  Closing position ID={pos['id']} (Direction: {pos['direction']})")
+                    self.close_position(connection=term_conn, trade_id=pos['id'])
+
+            # Update tracker state with termination connection
+            self._update_tracker_state(term_conn, 'terminated')
+        finally:
+            self.db_helper.return_connection(term_conn)
+
+        self.termination_service.mark_completed(termination['termination_id'])
+        self.termination_service.clear_cache()
+
+        print(f"\n{'=' * 70}")
+        print(f"[Termination] Strategy {self.configuration_id} terminated successfully")
+        print(f"Exiting program...")
+        print(f"{'=' * 70}")
+        return False
+
+    def _strategy_job(self):
+        """
+        Scheduler job (signal bar close + offset): one strategy cycle
+        """
+        now = datetime.now(pytz.UTC)
+        print(f"[CYCLE] Strategy execution at {now.strftime('%H:%M:%S')} UTC")
+
+        # Create connection for strategy cycle
+        strategy_conn = self.db_helper.get_connection()
+        try:
+            with REGISTRY.cycle(type(self).__name__):
+                should_terminate = self.run_strategy(instrument_connection(strategy_conn))
+
+            if should_terminate:
+                print(f"\n{'=' * 70}")
+                print(f"Strategy {self.configuration_id} completed (force close executed)")
+                print(f"{'=' * 70}")
+                self._update_tracker_state(strategy_conn, 'terminated')
+                return False
+
+            job = self.scheduler.get_stats()['logic']
+            print(f"[CYCLE] Lateness {job['last_lateness'] * 1000:.0f} ms, missed ticks {job['missed']}")
+            return True
+
+        except Exception as e:
+            # Retried at the next bar boundary
+            print(f"Error in strategy execution: {e}")
+            return True
+        finally:
+            self.db_helper.return_connection(strategy_conn)
+
+    def _heartbeat_job(self):
+        """
+        Scheduler job (60 s): heartbeat to algo.strategyTracker
+        """
+        heartbeat_conn = self.db_helper.get_connection()
+        try:
+            self.send_heartbeat(heartbeat_conn, self.configuration_id)
+        finally:
+            self.db_helper.return_connection(heartbeat_conn)
+
+    def _update_tracker_state(self, connection, state: str):
+        """
+        Update strategy state in algo.strategyTracker table (queued, heartbeats coalesced).
+        The connection argument is kept for existing callers and is not used.
+        """
+        try:
+            self.execution_logger.update_state(self.configuration_id, state)
         except Exception as e:
             print(f"Error updating tracker state: {e}")
 
@@ -1001,18 +1110,39 @@ class MTFRSIEMAStrategy(StrategyBase):
 
 if __name__ == "__main__":
     # Clean cache at main entry point
-    clean_pycache()
+    if not FAST_START:
+        clean_pycache()
 
     print(f"[MAIN] Script started at: {datetime.now()}")
     print(f"[MAIN] Command line args: {sys.argv}")
 
     parser = argparse.ArgumentParser(description='MTF RSI EMA Trading Strategy')
     parser.add_argument('--config-id', type=int, required=True, help='Configuration ID from database')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve Prometheus metrics on 127.0.0.1:<port>/metrics')
+    parser.add_argument('--metrics-file', default=None, help='Write metrics as JSON to this file')
+    parser.add_argument('--fast-start', action='store_true',
+                        help='Keep cached bytecode, skip module reloads and pre-warm the connection pool')
+    parser.add_argument('--control-port', type=int, default=None,
+                        help='Accept terminate/suspend/reload commands on 127.0.0.1:<port> (0 = any free port)')
     args = parser.parse_args()
 
+    exporters = start_exporters(args.metrics_port, args.metrics_file)
+
     try:
-        strategy = MTFRSIEMAStrategy(args.config_id)
-        strategy.run()
+        strategy = MTFRSIEMAStrategy(args.config_id, control_port=args.control_port)
+        try:
+            strategy.run()
+        finally:
+            # Write out queued logs and the final tracker state
+            strategy.order_tracker.stop()
+            strategy.position_cache.stop()
+            strategy.execution_logger.close()
+            strategy.async_db.close()
+            if strategy.control_server is not None:
+                strategy.control_server.stop()
+            for exporter in exporters:
+                exporter.stop()
     except Exception as e:
         print(f"Error: {e}")
         import traceback
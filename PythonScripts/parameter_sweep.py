@@ -0,0 +1,263 @@
+"""
+Parameter sweep - runs the testing_strategies strategies over parameter grids.
+
+Every (symbol, strategy, parameters) combination is scored with
+calculate_metrics on a process pool. Each symbol's dates and closes are
+placed in shared memory once; workers attach to them by name instead of
+receiving pickled DataFrames. Results stream to a Parquet file one row
+group per finished chunk (CSV when pyarrow is not installed).
+
+Usage:
+    python parameter_sweep.py --output sweep.parquet
+    python parameter_sweep.py --symbols EURUSD AAPL --strategies RSI --processes 8
+    python parameter_sweep.py --grid my_grid.json
+"""
+
+import os
+import sys
+import json
+import time
+import itertools
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from testing_strategies import SYMBOLS, STRATEGIES, load_data, calculate_metrics
+
+HISTORICAL_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'OLTP', 'historicalData')
+
+# Parameter grids per strategy; keys are the keyword arguments of the strategy function
+DEFAULT_GRIDS = {
+    'MA_Crossover': {
+        'fast_period': list(range(5, 55, 5)),
+        'slow_period': list(range(20, 210, 10)),
+    },
+    'RSI': {
+        'rsi_period': [7, 10, 14, 21, 28],
+        'oversold': [20, 25, 30, 35],
+        'overbought': [65, 70, 75, 80],
+    },
+    'Bollinger_Bands': {
+        'period': list(range(10, 55, 5)),
+        'std_dev': [1.0, 1.5, 2.0, 2.5, 3.0],
+    },
+}
+
+METRIC_COLUMNS = ['total_return', 'annual_return', 'sharpe_ratio', 'max_drawdown', 'volatility', 'win_rate']
+
+CHUNK_SIZE = 64
+
+
+def param_columns(grids):
+    """Sorted parameter names of all grids, one result column each"""
+    return sorted({name for grid in grids.values() for name in grid})
+
+
+def result_columns(params):
+    """Result file column order for the given parameter columns"""
+    return ['symbol', 'asset_type', 'strategy'] + list(params) + METRIC_COLUMNS + ['trades', 'bars']
+
+
+def expand_grid(strategy, grid):
+    """All parameter dicts of a grid; combinations with fast >= slow or oversold >= overbought are dropped"""
+    names = sorted(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(zip(names, values))
+        if strategy == 'MA_Crossover' and params['fast_period'] >= params['slow_period']:
+            continue
+        if strategy == 'RSI' and params['oversold'] >= params['overbought']:
+            continue
+        yield params
+
+
+# ===== SHARED PRICE ARRAYS =====
+
+class SharedSeries:
+    """Dates (int64 ns) and closes (float64) of one symbol in a shared memory block"""
+
+    def __init__(self, dates, closes):
+        self.length = len(closes)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, self.length * 16))
+        view = np.ndarray((2, self.length), dtype=np.float64, buffer=self.shm.buf)
+        view[0] = np.asarray(dates, dtype='datetime64[ns]').view(np.int64).view(np.float64)
+        view[1] = closes
+
+    @property
+    def descriptor(self):
+        """Picklable handle a worker attaches to"""
+        return self.shm.name, self.length
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+_attached = {}
+_frames = {}
+
+
+def _attach(symbol, descriptor):
+    """Per-worker DataFrame over the shared arrays, built on first use and cached"""
+    if symbol not in _frames:
+        name, length = descriptor
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13 has no track argument
+            shm = shared_memory.SharedMemory(name=name)
+        _attached[symbol] = shm
+        view = np.ndarray((2, length), dtype=np.float64, buffer=shm.buf)
+        _frames[symbol] = pd.DataFrame({
+            'Date': pd.to_datetime(view[0].view(np.int64)),
+            'Close': view[1],
+        })
+    return _frames[symbol]
+
+
+def _run_chunk(chunk):
+    """Worker: score a list of (symbol, asset_type, descriptor, strategy, params)"""
+    rows = []
+    for symbol, asset_type, descriptor, strategy, params in chunk:
+        df = _attach(symbol, descriptor)
+        # Columns missing from a row (other strategies' parameters, metrics of a failed run) are written empty
+        row = dict(symbol=symbol, asset_type=asset_type, strategy=strategy, bars=len(df))
+        row.update(params)
+        try:
+            returns, trades = STRATEGIES[strategy](df, **params)
+            metrics = calculate_metrics(returns, trades if not trades.empty else None)
+            row.update({k: float(v) for k, v in metrics.items()})
+            row['trades'] = len(trades)
+        except Exception as e:
+            print(f"[SWEEP] {symbol} {strategy} {params}: {e}")
+        rows.append(row)
+    return rows
+
+
+# ===== RESULT WRITER =====
+
+class ColumnarWriter:
+    """Appends result rows to a Parquet file as row groups; falls back to CSV without pyarrow"""
+
+    def __init__(self, path, params):
+        """
+        Args:
+            path: Output file; .parquet becomes .csv without pyarrow
+            params: Parameter column names, e.g. param_columns(grids)
+        """
+        self.path = path
+        self.columns = result_columns(params)
+        self.rows_written = 0
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            self._pa = None
+            if self.path.endswith('.parquet'):
+                self.path = self.path[:-len('.parquet')] + '.csv'
+            print(f"[SWEEP] pyarrow not installed, writing CSV to {self.path}")
+            return
+        self._pa = pa
+        fields = [pa.field(column, pa.string()) for column in ('symbol', 'asset_type', 'strategy')]
+        fields += [pa.field(column, pa.float64()) for column in list(params) + METRIC_COLUMNS]
+        fields += [pa.field('trades', pa.int64()), pa.field('bars', pa.int64())]
+        self.schema = pa.schema(fields)
+        self._writer = pq.ParquetWriter(self.path, self.schema)
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self._pa is None:
+            pd.DataFrame(rows, columns=self.columns).to_csv(
+                self.path, mode='a' if self.rows_written else 'w', header=self.rows_written == 0, index=False)
+        else:
+            table = self._pa.Table.from_pylist(rows, schema=self.schema)
+            self._writer.write_table(table)
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self._pa is not None:
+            self._writer.close()
+
+
+# ===== SWEEP =====
+
+def run_sweep(output_path, grids=None, symbols=None, strategies=None, processes=None,
+              data_path=HISTORICAL_DATA_PATH, chunk_size=CHUNK_SIZE):
+    """
+    Score every grid combination for every symbol and stream rows to output_path.
+
+    Returns the number of rows written.
+    """
+    grids = grids or DEFAULT_GRIDS
+    strategies = strategies or list(STRATEGIES)
+    symbols = symbols or [(asset_type, symbol) for asset_type, names in SYMBOLS.items() for symbol in names]
+
+    shared = {}
+    chunks = []
+    combinations = 0
+    started = time.perf_counter()
+    try:
+        for asset_type, symbol in symbols:
+            try:
+                df = load_data(symbol, asset_type, data_path)
+            except Exception as e:
+                print(f"[SWEEP] {symbol}: cannot load data: {e}")
+                continue
+            shared[symbol] = SharedSeries(df['Date'].to_numpy(), df['Close'].to_numpy(dtype=float))
+            tasks = [(symbol, asset_type, shared[symbol].descriptor, strategy, params)
+                     for strategy in strategies
+                     for params in expand_grid(strategy, grids.get(strategy, {}))]
+            # Chunks stay within one symbol so a worker attaches to few segments
+            chunks.extend(tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size))
+            combinations += len(tasks)
+
+        print(f"[SWEEP] {combinations} combinations over {len(shared)} symbols in {len(chunks)} chunks")
+
+        # Parameter columns of the grids actually swept, custom --grid parameters included
+        writer = ColumnarWriter(output_path, param_columns({strategy: grids.get(strategy, {})
+                                                            for strategy in strategies}))
+        try:
+            with Pool(processes=processes) as pool:
+                for rows in pool.imap_unordered(_run_chunk, chunks):
+                    writer.write(rows)
+                    print(f"[SWEEP] {writer.rows_written}/{combinations} "
+                          f"({time.perf_counter() - started:.1f}s)")
+        finally:
+            writer.close()
+    finally:
+        for series in shared.values():
+            series.close()
+
+    print(f"[SWEEP] Done: {writer.rows_written} rows -> {writer.path} in {time.perf_counter() - started:.1f}s")
+    return writer.rows_written
+
+
+def _symbol_list(names):
+    """Map bare symbol names to (asset_type, symbol) using SYMBOLS"""
+    asset_types = {symbol: asset_type for asset_type, symbols in SYMBOLS.items() for symbol in symbols}
+    unknown = [name for name in names if name not in asset_types]
+    if unknown:
+        sys.exit(f"Unknown symbols: {', '.join(unknown)}")
+    return [(asset_types[name], name) for name in names]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Parameter sweep over testing_strategies')
+    parser.add_argument('--output', default='sweep_results.parquet', help='Parquet (or CSV) results file')
+    parser.add_argument('--grid', help='JSON file {strategy: {param: [values]}} replacing the default grids')
+    parser.add_argument('--symbols', nargs='+', help='Symbols to sweep (default: all in SYMBOLS)')
+    parser.add_argument('--strategies', nargs='+', choices=list(STRATEGIES))
+    parser.add_argument('--processes', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--data-path', default=HISTORICAL_DATA_PATH)
+    args = parser.parse_args()
+
+    grids = None
+    if args.grid:
+        with open(args.grid) as f:
+            grids = json.load(f)
+
+    run_sweep(args.output, grids=grids,
+              symbols=_symbol_list(args.symbols) if args.symbols else None,
+              strategies=args.strategies, processes=args.processes, data_path=args.data_path)
@@ -72,3 +72,88 @@ def execute_signal_procedure(
         return False
 
 
+
+SIGNAL_PARAMETERS = ('ticker', 'direction', 'volume', 'order_price', 'stop_loss', 'take_profit', 'expiry',
+                     'broker_id', 'platform_id', 'trade_id', 'trade_type', 'strategy_configuration_id')
+# SQL Server accepts at most 2100 parameters per request
+MAX_BATCH_SIGNALS = 2000 // len(SIGNAL_PARAMETERS)
+# Session options are kept by pooled connections, so every batch restores the defaults
+BATCH_SET_OPTIONS = "SET NOCOUNT ON; SET XACT_ABORT ON;\n"
+BATCH_RESET_OPTIONS = "\nSET XACT_ABORT OFF; SET NOCOUNT OFF;"
+
+
+def execute_signal_batch(connection, signals):
+    """
+    Execute several trd.sp_CreateSignal calls as one batch and one transaction
+
+    Signals are sent MAX_BATCH_SIGNALS per round trip with XACT_ABORT on and
+    committed once, so either every signal is created or none is (e.g. the
+    drop and the new order of a reversal reach the cBot together). The options
+    are switched off again at the end of each batch, and after a failure,
+    so the pooled connection goes back with the session defaults.
+
+    Parameters:
+    connection (pyodbc.Connection): Active database connection (autocommit off)
+    signals (list of dict): execute_signal_procedure keyword arguments per signal
+
+    Returns:
+    bool: True if all signals were sent, False otherwise (nothing was sent)
+    """
+    if not signals:
+        return True
+    try:
+        cursor = connection.cursor()
+
+        for start in range(0, len(signals), MAX_BATCH_SIGNALS):
+            chunk = signals[start:start + MAX_BATCH_SIGNALS]
+            sql = BATCH_SET_OPTIONS + "\n".join(
+                ["EXEC trd.sp_CreateSignal ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?;"] * len(chunk)) + BATCH_RESET_OPTIONS
+            params = [signal.get(name) for signal in chunk for name in SIGNAL_PARAMETERS]
+
+            cursor.execute(sql, params)
+            # Errors of later statements in the batch surface while walking the result sets
+            while cursor.nextset():
+                pass
+        connection.commit()
+        cursor.close()
+
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for signal in signals:
+            print(f"[{current_time}] Signal SENT: {signal['ticker']} {signal['direction']} "
+                  f"volume={signal['volume']}, Trade ID: {signal.get('trade_id')}, Type: {signal.get('trade_type')}")
+        return True
+
+    except Exception as e:
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        print(f"[{current_time}] Error sending signal batch: {e}")
+        try:
+            connection.rollback()
+            # XACT_ABORT ends the batch at the error, before its reset statement
+            reset = connection.cursor()
+            reset.execute(BATCH_RESET_OPTIONS.strip())
+            reset.close()
+        except Exception:
+            pass
+        return False
+
+
+def drop_signals(positions, broker_id, platform_id, strategy_configuration_id=None, volume=0):
+    """
+    Drop signal per position dict ({'id', 'ticker', ...}), for execute_signal_batch
+
+    volume is sent with every drop; StrategyBase sends 0 as its single drops do.
+    """
+    return [dict(ticker=position['ticker'], direction='drop', volume=volume,
+                 broker_id=broker_id, platform_id=platform_id, trade_id=position['id'],
+                 trade_type='POSITION', strategy_configuration_id=strategy_configuration_id)
+            for position in positions]
+
+
+def reversal_signals(position, direction, volume, broker_id, platform_id, strategy_configuration_id=None,
+                     drop_volume=0):
+    """Drop of position (sent with drop_volume) followed by a new direction order, for execute_signal_batch"""
+    return drop_signals([position], broker_id, platform_id, strategy_configuration_id, drop_volume) + [
+        dict(ticker=position['ticker'], direction=direction, volume=volume,
+             broker_id=broker_id, platform_id=platform_id,
+             strategy_configuration_id=strategy_configuration_id)
+    ]
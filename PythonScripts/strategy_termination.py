@@ -26,6 +26,7 @@ class StrategyTerminationService:
             self.cache_time = None
             self.cache_ttl = 0.1  # 100 milliseconds
             self._lock = threading.Lock()
+            self._conn = None  # persistent connection, reopened after errors
             self._initialized = True
 
     def get_terminations(self) -> Dict[int, dict]:
@@ -43,31 +44,43 @@ class StrategyTerminationService:
             self.cache_time = now
             return self.cache.copy()
 
+    def _get_connection(self):
+        """Persistent autocommit connection"""
+        if self._conn is None:
+            self._conn = pyodbc.connect(self.connection_string, autocommit=True)
+        return self._conn
+
+    def _drop_connection(self):
+        """Close a broken connection so the next call reconnects"""
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
     def _fetch_from_db(self) -> Dict[int, dict]:
         """Fetch terminations from database using VIEW"""
         terminations = {}
 
         try:
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-
-            cursor.execute("SELECT * FROM algo.strategy_termination_queue_v")
+            cursor = self._get_connection().cursor()
 
-            rows = cursor.fetchall()
-            for row in rows:
-                print(f"[Termination DB] Config {row.config_id}: ID {row.termination_id}, Requested {row.requested_at}")
+            cursor.execute("SELECT config_id, termination_id, requested_at FROM algo.strategy_termination_queue_v")
 
+            for config_id, termination_id, requested_at in cursor.fetchall():
                 # Only keep latest for each config
-                if row.config_id not in terminations:
-                    terminations[row.config_id] = {
-                        'termination_id': row.termination_id,
-                        'requested_at': row.requested_at
+                if config_id not in terminations:
+                    terminations[config_id] = {
+                        'termination_id': termination_id,
+                        'requested_at': requested_at
                     }
 
-            conn.close()
+            cursor.close()
 
         except Exception as e:
             print(f"[Termination] Fetch error: {e}")
+            self._drop_connection()
 
         return terminations
 
@@ -88,13 +101,10 @@ class StrategyTerminationService:
     def mark_completed(self, termination_id: int):
         """Mark termination as completed using stored procedure"""
         try:
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
-
-            cursor.execute("EXEC algo.sp_MarkTerminationCompleted ?", (termination_id,))
-
-            conn.commit()
-            conn.close()
+            with self._lock:
+                cursor = self._get_connection().cursor()
+                cursor.execute("EXEC algo.sp_MarkTerminationCompleted ?", (termination_id,))
+                cursor.close()
 
             # Invalidate cache - CLEAR COMPLETELY
             with self._lock:
@@ -104,6 +114,8 @@ class StrategyTerminationService:
 
         except Exception as e:
             print(f"[Termination] Mark error: {e}")
+            with self._lock:
+                self._drop_connection()
 
     def clear_cache(self):
         """Explicitly clear termination cache"""
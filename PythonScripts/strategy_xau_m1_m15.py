@@ -2,10 +2,15 @@ import pyodbc
 from datetime import datetime, time
 import pytz
 import time as sleep_time
+import os
 import sys
 import argparse
 from strategy_termination import StrategyTerminationService
 from sp_create_signal import execute_signal_procedure
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'STRATEGIES'))
+from order_tracker import poll_with_backoff
+from market_snapshot import fetch_market_snapshot
+from indicator_engine import IndicatorEngine
 
 # Configuration
 CONNECTION_STRING = (
@@ -224,21 +229,29 @@ def wait_for_position_confirmation(connection_string, ticker, expected_direction
     """Waits for position to appear in the database after opening"""
     print(f"Waiting for position confirmation...")
 
-    for check in range(max_checks):
-        sleep_time.sleep(check_interval_seconds)
-
-        positions = get_open_positions(connection_string, ticker)
-        if positions:
-            pos = positions[0]
-            print(f"Position confirmed: ID={pos['id']}, Direction={pos['direction']}")
-            return positions[0]
-
-        print(f"  Check {check + 1}/{max_checks}: Position not yet confirmed...")
+    # Short first checks, backing off to check_interval_seconds, same overall limit
+    positions = poll_with_backoff(lambda: get_open_positions(connection_string, ticker),
+                                  timeout=max_checks * check_interval_seconds,
+                                  max_interval=check_interval_seconds)
+    if positions:
+        pos = positions[0]
+        print(f"Position confirmed: ID={pos['id']}, Direction={pos['direction']}")
+        return pos
 
     print("Warning: Position not confirmed after maximum checks")
     return None
 
 
+def wait_for_positions_closed(connection_string, ticker, position_ids, timeout=5.0):
+    """Waits until none of position_ids is open; returns False on timeout"""
+    position_ids = set(position_ids)
+
+    def closed():
+        return not any(pos['id'] in position_ids for pos in get_open_positions(connection_string, ticker))
+
+    return bool(poll_with_backoff(closed, timeout=timeout))
+
+
 def open_initial_position(connection_string, ticker, open_volume, broker_id, platform_id, strategy_configuration_id, max_checks=10, check_interval_seconds=10):
     """Opens initial BUY position on startup with confirmation"""
     print(f"\nOpening initial BUY position for {ticker}")
@@ -282,6 +295,7 @@ def ensure_single_position(connection_string, ticker, broker_id, platform_id, st
         # Keep only the latest position, close others
         latest_position = max(positions, key=lambda x: x['id'])
 
+        closing = []
         for pos in positions:
             if pos['id'] != latest_position['id']:
                 print(f"Closing duplicate position ID={pos['id']}")
@@ -300,178 +314,117 @@ def ensure_single_position(connection_string, ticker, broker_id, platform_id, st
                     trade_type='POSITION',
                     strategy_configuration_id=strategy_configuration_id
                 )
-                sleep_time.sleep(1)  # Wait for close
+                closing.append(pos['id'])
+
+        # Wait for all closes together
+        wait_for_positions_closed(connection_string, ticker, closing)
 
         return [latest_position]
 
     return positions
 
 
-def get_latest_bar_data(connection_string, ticker_jid, timeframe_id, timeframe_name="Unknown"):
-    """Gets latest candle and indicator data"""
-    try:
-        conn = pyodbc.connect(connection_string)
-        cursor = conn.cursor()
-
-        # Get latest candle
-        sql_bar = """
-        SELECT TOP 1 barTime, openValue, highValue, lowValue, closeValue
-        FROM tms.bars
-        WHERE TickerJID = ? AND timeframeID = ?
-        ORDER BY barTime DESC
-        """
-        cursor.execute(sql_bar, (ticker_jid, timeframe_id))
-        bar = cursor.fetchone()
-
-        if not bar:
-            return None
+# Persistent connection for market snapshots, reopened after an error
+_snapshot_connection = None
 
-        # Get EMA for this candle
-        sql_ema = """
-        SELECT TOP 1 BarTime, EMA_50_MEDIUM, EMA_20_SHORT
-        FROM tms.EMA
-        WHERE TickerJID = ? AND TimeFrameID = ? AND BarTime = ?
-        ORDER BY BarTime DESC
-        """
-        cursor.execute(sql_ema, (ticker_jid, timeframe_id, bar.barTime))
-        ema = cursor.fetchone()
-
-        # Get RSI for this and previous candle
-        sql_rsi = """
-        SELECT TOP 2 BarTime, RSI_14, Oversold_Flag, Overbought_Flag
-        FROM tms.Indicators_Momentum
-        WHERE TickerJID = ? AND TimeFrameID = ?
-        ORDER BY BarTime DESC
-        """
-        cursor.execute(sql_rsi, (ticker_jid, timeframe_id))
-        rsi_rows = cursor.fetchall()
+# Set by --local-indicators: EMA/RSI computed in process from new bars,
+# instead of reading tms.EMA / tms.Indicators_Momentum
+indicator_engine = None
 
-        cursor.close()
-        conn.close()
 
-        current_rsi = rsi_rows[0] if len(rsi_rows) > 0 else None
-        prev_rsi = rsi_rows[1] if len(rsi_rows) > 1 else None
+def get_market_snapshot(connection_string, ticker_jid, timeframe_ids):
+    """Latest and previous bar with EMA/RSI for several timeframes in one query.
+    Returns dict timeframe_id -> MarketSnapshot(current, previous)"""
+    global _snapshot_connection
+    try:
+        if _snapshot_connection is None:
+            _snapshot_connection = pyodbc.connect(connection_string, autocommit=True)
 
-        return {
-            'bar': bar,
-            'ema': ema,
-            'current_rsi': current_rsi,
-            'prev_rsi': prev_rsi,
-            'timeframe_name': timeframe_name
-        }
+        pairs = [(ticker_jid, tf) for tf in timeframe_ids]
+        if indicator_engine is not None:
+            indicator_engine.sync(_snapshot_connection, pairs)
+            snapshot = indicator_engine.get_market_snapshot(pairs)
+        else:
+            snapshot = fetch_market_snapshot(_snapshot_connection, pairs)
+        return {timeframe_id: data for (_, timeframe_id), data in snapshot.items()}
 
     except Exception as e:
-        print(f"Error getting data TF={timeframe_name}: {e}")
-        return None
+        print(f"Error getting market snapshot: {e}")
+        if _snapshot_connection is not None:
+            try:
+                _snapshot_connection.close()
+            except Exception:
+                pass
+            _snapshot_connection = None
+        return {}
 
 
-def check_trend_h1(connection_string, ticker_jid, timeframe_h1):
+def check_trend_h1(data):
     """Checks trend on H1"""
     global last_h1_bar_time
 
-    data = get_latest_bar_data(connection_string, ticker_jid, timeframe_h1, "H1")
-
-    if not data or not data['bar'] or not data['ema']:
+    if not data or data.current.ema_50 is None:
         return None
 
-    current_bar_time = data['bar'].barTime
+    bar = data.current
 
-    if last_h1_bar_time and last_h1_bar_time == current_bar_time:
+    if last_h1_bar_time and last_h1_bar_time == bar.bar_time:
         return 'cached'
 
-    last_h1_bar_time = current_bar_time
-
-    close_h1 = float(data['bar'].closeValue)
-
-    if hasattr(data['ema'].EMA_50_MEDIUM, 'as_tuple'):
-        ema50_h1 = float(data['ema'].EMA_50_MEDIUM)
-    else:
-        ema50_h1 = data['ema'].EMA_50_MEDIUM
+    last_h1_bar_time = bar.bar_time
 
-    if close_h1 > ema50_h1:
+    if bar.close > bar.ema_50:
         return 'bullish'
-    elif close_h1 < ema50_h1:
+    elif bar.close < bar.ema_50:
         return 'bearish'
     else:
         return None
 
 
-def check_signal_m1(connection_string, ticker_jid, timeframe_m1):
-    """Checks signal on M1"""
-    global last_m1_bar_time
-
-    data = get_latest_bar_data(connection_string, ticker_jid, timeframe_m1, "M1")
+def check_rsi_ema_signal(data):
+    """Bar touched EMA20 while RSI leaves the oversold/overbought zone"""
+    bar, prev = data.current, data.previous
 
-    if not data or not data['bar'] or not data['ema']:
+    if prev is None or bar.rsi_14 is None or prev.rsi_14 is None:
         return None
 
-    current_bar_time = data['bar'].barTime
+    if bar.low <= bar.ema_20 and prev.oversold and not bar.oversold:
+        return 'buy'
 
-    if last_m1_bar_time and last_m1_bar_time == current_bar_time:
-        return None
+    if bar.high >= bar.ema_20 and prev.overbought and not bar.overbought:
+        return 'sell'
 
-    last_m1_bar_time = current_bar_time
+    return None
 
-    low_m1 = float(data['bar'].lowValue)
-    high_m1 = float(data['bar'].highValue)
 
-    if hasattr(data['ema'].EMA_20_SHORT, 'as_tuple'):
-        ema20_m1 = float(data['ema'].EMA_20_SHORT)
-    else:
-        ema20_m1 = data['ema'].EMA_20_SHORT
+def check_signal_m1(data):
+    """Checks signal on M1"""
+    global last_m1_bar_time
 
-    if data['prev_rsi'] and data['current_rsi']:
-        prev_oversold = bool(data['prev_rsi'].Oversold_Flag)
-        curr_oversold = bool(data['current_rsi'].Oversold_Flag)
-        prev_overbought = bool(data['prev_rsi'].Overbought_Flag)
-        curr_overbought = bool(data['current_rsi'].Overbought_Flag)
+    if not data or data.current.ema_20 is None:
+        return None
 
-        if low_m1 <= ema20_m1 and prev_oversold and not curr_oversold:
-            return 'buy'
+    if last_m1_bar_time and last_m1_bar_time == data.current.bar_time:
+        return None
 
-        if high_m1 >= ema20_m1 and prev_overbought and not curr_overbought:
-            return 'sell'
+    last_m1_bar_time = data.current.bar_time
 
-    return None
+    return check_rsi_ema_signal(data)
 
 
-def check_signal_m15(connection_string, ticker_jid, timeframe_m15):
+def check_signal_m15(data):
     """Checks signal on M15"""
     global last_m15_bar_time
 
-    data = get_latest_bar_data(connection_string, ticker_jid, timeframe_m15, "M15")
-
-    if not data or not data['bar'] or not data['ema']:
+    if not data or data.current.ema_20 is None:
         return None
 
-    current_bar_time = data['bar'].barTime
-
-    if last_m15_bar_time and last_m15_bar_time == current_bar_time:
+    if last_m15_bar_time and last_m15_bar_time == data.current.bar_time:
         return None
 
-    last_m15_bar_time = current_bar_time
-
-    low_m15 = float(data['bar'].lowValue)
-    high_m15 = float(data['bar'].highValue)
-
-    if hasattr(data['ema'].EMA_20_SHORT, 'as_tuple'):
-        ema20_m15 = float(data['ema'].EMA_20_SHORT)
-    else:
-        ema20_m15 = data['ema'].EMA_20_SHORT
-
-    if data['prev_rsi'] and data['current_rsi']:
-        prev_oversold = bool(data['prev_rsi'].Oversold_Flag)
-        curr_oversold = bool(data['current_rsi'].Oversold_Flag)
-        prev_overbought = bool(data['prev_rsi'].Overbought_Flag)
-        curr_overbought = bool(data['current_rsi'].Overbought_Flag)
-
-        if low_m15 <= ema20_m15 and prev_oversold and not curr_oversold:
-            return 'buy'
+    last_m15_bar_time = data.current.bar_time
 
-        if high_m15 >= ema20_m15 and prev_overbought and not curr_overbought:
-            return 'sell'
-
-    return None
+    return check_rsi_ema_signal(data)
 
 
 def check_force_close(connection_string, ticker, close_time_utc, broker_id, platform_id, strategy_configuration_id):
@@ -504,11 +457,7 @@ def check_force_close(connection_string, ticker, close_time_utc, broker_id, plat
             )
 
             # Wait for close confirmation
-            sleep_time.sleep(1)
-
-            # Verify position closed
-            positions_after = get_open_positions(connection_string, ticker)
-            if not positions_after:
+            if wait_for_positions_closed(connection_string, ticker, [pos['id']]):
                 print("✓ Position successfully closed")
             else:
                 print("✗ Position still open, trying again...")
@@ -518,10 +467,8 @@ def check_force_close(connection_string, ticker, close_time_utc, broker_id, plat
     return False
 
 
-def process_trading_signal(connection_string, ticker, open_volume, broker_id, platform_id, strategy_configuration_id,
-                          m1_signal, m15_signal, h1_trend, positions):
-    """Process trading signal if conditions are met"""
-    # Determine final signal
+def combine_signals(m1_signal, m15_signal, h1_trend):
+    """Final 'buy' / 'sell' from the M1 and M15 signals filtered by the H1 trend, or None"""
     signal = None
 
     if m1_signal and m15_signal:
@@ -531,12 +478,22 @@ def process_trading_signal(connection_string, ticker, open_volume, broker_id, pl
         signal = m1_signal
 
     if not signal:
-        return False
+        return None
 
     # Filter signal by H1 trend if available
     if h1_trend and h1_trend != 'cached':
         if (h1_trend == 'bullish' and signal != 'buy') or (h1_trend == 'bearish' and signal != 'sell'):
-            return False
+            return None
+
+    return signal
+
+
+def process_trading_signal(connection_string, ticker, open_volume, broker_id, platform_id, strategy_configuration_id,
+                          m1_signal, m15_signal, h1_trend, positions):
+    """Process trading signal if conditions are met"""
+    signal = combine_signals(m1_signal, m15_signal, h1_trend)
+    if not signal:
+        return False
 
     # Position management
     if not positions:
@@ -569,7 +526,7 @@ def process_trading_signal(connection_string, ticker, open_volume, broker_id, pl
         )
 
         # Wait for close confirmation
-        sleep_time.sleep(1)
+        wait_for_positions_closed(connection_string, ticker, [pos['id']])
 
         # Open new position
         print(f"  Opening {signal.upper()} position")
@@ -642,7 +599,7 @@ def run_strategy(connection_string, ticker, ticker_jid, open_volume, close_time_
                 )
 
             # Подождать и проверить, что позиции закрылись
-            sleep_time.sleep(1)
+            wait_for_positions_closed(connection_string, ticker, [pos_id for pos_id, _, _ in positions_to_close])
 
             # Проверить, остались ли открытые позиции
             remaining_positions = get_open_positions(connection_string, ticker)
@@ -667,7 +624,7 @@ def run_strategy(connection_string, ticker, ticker_jid, open_volume, close_time_
                         strategy_configuration_id=strategy_configuration_id
                     )
 
-                sleep_time.sleep(1)
+                wait_for_positions_closed(connection_string, ticker, [pos['id'] for pos in remaining_positions])
 
                 # Финальная проверка
                 final_positions = get_open_positions(connection_string, ticker)
@@ -707,16 +664,25 @@ def run_strategy(connection_string, ticker, ticker_jid, open_volume, close_time_
     # 2. Get market info
     market_info = get_market_info(connection_string, ticker, ticker_jid, close_time_utc)
 
-    # 3. Check signals
-    m1_signal = check_signal_m1(connection_string, ticker_jid, timeframe_m1)
+    # 3. Check signals - one snapshot query for every timeframe due this minute
+    check_m15 = current_minute % 15 == 0
+    check_h1 = current_minute % 5 == 0
+    timeframes = [timeframe_m1]
+    if check_m15:
+        timeframes.append(timeframe_m15)
+    if check_h1:
+        timeframes.append(timeframe_h1)
+    snapshot = get_market_snapshot(connection_string, ticker_jid, timeframes)
+
+    m1_signal = check_signal_m1(snapshot.get(timeframe_m1))
 
     m15_signal = None
-    if current_minute % 15 == 0:
-        m15_signal = check_signal_m15(connection_string, ticker_jid, timeframe_m15)
+    if check_m15:
+        m15_signal = check_signal_m15(snapshot.get(timeframe_m15))
 
     h1_trend = None
-    if current_minute % 5 == 0:
-        h1_trend = check_trend_h1(connection_string, ticker_jid, timeframe_h1)
+    if check_h1:
+        h1_trend = check_trend_h1(snapshot.get(timeframe_h1))
 
     # 4. Show info every minute
     show_minute_info(ticker, market_info, m1_signal, m15_signal, h1_trend)
@@ -731,8 +697,7 @@ def run_strategy(connection_string, ticker, ticker_jid, open_volume, close_time_
             m1_signal, m15_signal, h1_trend, positions
         )
         if trade_executed:
-            # After trading, show updated info
-            sleep_time.sleep(1)
+            # After trading, show updated info (the close was already confirmed)
             updated_info = get_market_info(connection_string, ticker, ticker_jid, close_time_utc)
             show_minute_info(ticker, updated_info, 'TRADED', 'TRADED', h1_trend)
 
@@ -742,8 +707,15 @@ def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Trading Strategy')
     parser.add_argument('--config-id', type=int, help='Configuration ID from database')
+    parser.add_argument('--local-indicators', action='store_true',
+                        help='Compute EMA/RSI in process instead of reading the CLR indicator tables')
     args = parser.parse_args()
 
+    if args.local_indicators:
+        global indicator_engine
+        indicator_engine = IndicatorEngine()
+        print("=== Indicators computed locally ===")
+
     # Set variables based on config-id
     if args.config_id:
         print(f"=== Using config ID: {args.config_id} ===")
@@ -0,0 +1,271 @@
+"""
+Offline replay of strategy_xau_m1_m15 on historical M1 / M15 / H1 bars.
+
+The decision functions are the live ones (check_signal_m1, check_signal_m15,
+check_trend_h1, combine_signals); only the market snapshot and order
+execution are replaced. The replay steps through the M1 bars as the live
+loop steps through minutes:
+
+    - the decision time is the close of an M1 bar (BarTime is the bar open)
+    - M15 / H1 snapshots are the last bars closed at that time, so a bar is
+      never seen before it is complete
+    - M15 is checked when the minute is a multiple of 15, H1 every 5 minutes
+    - each UTC day opens the initial BUY at --session-start, reverses on
+      signals against the position and force-closes at --close-time
+    - fills are at the decision bar's close, without spread
+
+Prices, EMA20/50, RSI14 and the oversold/overbought flags come from
+indicator_engine.batch_indicators: the streaming IndicatorSeries formulas
+(CLR batch functions) and input conversion applied to whole arrays, so one
+year of M1 bars replays in seconds.
+
+Usage:
+    python strategy_xau_replay.py --m1 XAUUSD_1min.csv --output trades.csv
+    python strategy_xau_replay.py --m1 m1.csv --m15 m15.csv --h1 h1.csv --close-time 21:45
+    python strategy_xau_replay.py --ticker-jid 13 --start 2025-01-01 --end 2026-01-01
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, time as dt_time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'STRATEGIES'))
+import strategy_xau_m1_m15 as live
+from market_snapshot import BarSnapshot, MarketSnapshot
+from indicator_engine import batch_indicators
+
+M15_MINUTES = 15
+H1_MINUTES = 60
+
+
+# ===== BARS =====
+
+def load_bars_csv(path):
+    """BarTime/Open/High/Low/Close frame from a historicalData style CSV (DateTime or Date column)"""
+    df = pd.read_csv(path)
+    stamp = 'DateTime' if 'DateTime' in df.columns else 'Date'
+    df = df.rename(columns={stamp: 'BarTime'})
+    df['BarTime'] = pd.to_datetime(df['BarTime'])
+    return df[['BarTime', 'Open', 'High', 'Low', 'Close']].sort_values('BarTime').reset_index(drop=True)
+
+
+def load_bars_db(connection_string, ticker_jid, timeframe_id, start, end):
+    """Same frame from tms.bars"""
+    import pyodbc
+    conn = pyodbc.connect(connection_string)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT barTime, openValue, highValue, lowValue, closeValue
+            FROM tms.bars
+            WHERE TickerJID = ? AND timeframeID = ? AND barTime >= ? AND barTime < ?
+            ORDER BY barTime
+        """, (ticker_jid, timeframe_id, start, end))
+        rows = [tuple(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+    df = pd.DataFrame.from_records(rows, columns=['BarTime', 'Open', 'High', 'Low', 'Close'])
+    df['BarTime'] = pd.to_datetime(df['BarTime'])
+    return df.dropna()
+
+
+def resample_bars(m1, minutes):
+    """Higher timeframe bars from M1, labelled by their open time like tms.bars"""
+    bars = m1.set_index('BarTime').resample(f'{minutes}min', label='left', closed='left').agg(
+        {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last'})
+    return bars.dropna().reset_index()
+
+
+# ===== INDICATORS =====
+
+class TimeframeArrays:
+    """Bars of one timeframe with the snapshot indicators, as plain lists for fast snapshot building"""
+
+    def __init__(self, bars, minutes):
+        values = batch_indicators(*(bars[column].to_numpy(dtype=float) for column in ('Open', 'High', 'Low', 'Close')))
+
+        self.open_times = bars['BarTime'].to_numpy(dtype='datetime64[ns]')
+        self.close_times = self.open_times + np.timedelta64(minutes, 'm')
+        self.bar_time = pd.to_datetime(self.open_times).to_pydatetime().tolist()
+        self.open = values['openValue'].tolist()
+        self.high = values['highValue'].tolist()
+        self.low = values['lowValue'].tolist()
+        self.close = values['closeValue'].tolist()
+        self.ema_20 = values['EMA_20_SHORT'].tolist()
+        self.ema_50 = values['EMA_50_MEDIUM'].tolist()
+        self.rsi_14 = values['RSI_14'].tolist()
+        self.oversold = values['Oversold_Flag'].tolist()
+        self.overbought = values['Overbought_Flag'].tolist()
+
+    def __len__(self):
+        return len(self.close)
+
+    def last_closed(self, decision_times):
+        """Index of the last bar closed at each decision time, -1 where none is"""
+        return np.searchsorted(self.close_times, decision_times, side='right') - 1
+
+    def _bar(self, i):
+        return BarSnapshot(self.bar_time[i], self.open[i], self.high[i], self.low[i], self.close[i],
+                           self.ema_20[i], self.ema_50[i], self.rsi_14[i], self.oversold[i], self.overbought[i])
+
+    def snapshot(self, i):
+        """MarketSnapshot of bar i and the one before, None before the first bar"""
+        if i < 0:
+            return None
+        return MarketSnapshot(self._bar(i), self._bar(i - 1) if i > 0 else None)
+
+
+# ===== REPLAY =====
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def replay(m1, m15=None, h1=None, close_time_utc=dt_time(21, 45), session_start_utc=dt_time(0, 0),
+           open_volume=0.01):
+    """
+    Run the live decision logic over historical bars.
+
+    Args:
+        m1, m15, h1: BarTime/Open/High/Low/Close frames; missing M15 / H1 are resampled from M1
+        close_time_utc: Daily force-close time (live CLOSE_TIME_UTC)
+        session_start_utc: Time of day the initial BUY is opened
+        open_volume: Lots per position
+
+    Returns:
+        list of trade dicts (entry/exit time and price, direction, reasons, points)
+    """
+    m15 = m15 if m15 is not None else resample_bars(m1, M15_MINUTES)
+    h1 = h1 if h1 is not None else resample_bars(m1, H1_MINUTES)
+    m1_arrays = TimeframeArrays(m1, 1)
+    m15_arrays = TimeframeArrays(m15, M15_MINUTES)
+    h1_arrays = TimeframeArrays(h1, H1_MINUTES)
+
+    decision_times = m1_arrays.close_times
+    m15_index = m15_arrays.last_closed(decision_times).tolist()
+    h1_index = h1_arrays.last_closed(decision_times).tolist()
+    minute_of_day = ((decision_times.astype('datetime64[m]').astype(np.int64)) % 1440).tolist()
+    day = decision_times.astype('datetime64[D]').astype(np.int64).tolist()
+    decision_dt = pd.to_datetime(decision_times).to_pydatetime().tolist()
+
+    # The decision functions keep the last bar seen in module globals
+    live.last_m1_bar_time = live.last_m15_bar_time = live.last_h1_bar_time = None
+
+    close_minute = _minutes(close_time_utc)
+    start_minute = _minutes(session_start_utc)
+    trades = []
+    position = None
+    current_day = None
+    session_open = session_done = False
+
+    def open_position(i, direction, reason):
+        return {'direction': direction, 'entry_time': decision_dt[i], 'entry_price': m1_arrays.close[i],
+                'entry_reason': reason, 'volume': open_volume}
+
+    def close_position(i, reason):
+        exit_price = m1_arrays.close[i]
+        sign = 1 if position['direction'] == 'buy' else -1
+        points = sign * (exit_price - position['entry_price'])
+        trades.append({**position, 'exit_time': decision_dt[i], 'exit_price': exit_price, 'exit_reason': reason,
+                       'points': points, 'return_pct': points / position['entry_price'] * 100})
+
+    for i in range(len(m1_arrays)):
+        if day[i] != current_day:
+            current_day = day[i]
+            session_open = session_done = False
+        if session_done:
+            continue
+
+        minute = minute_of_day[i]
+        if not session_open:
+            if minute < start_minute:
+                continue
+            # main(): initial BUY before the first run_strategy call
+            position = open_position(i, 'buy', 'initial')
+            session_open = True
+
+        # run_strategy(): force close first
+        if minute >= close_minute:
+            close_position(i, 'force_close')
+            position = None
+            session_done = True
+            continue
+
+        m1_signal = live.check_signal_m1(m1_arrays.snapshot(i))
+        m15_signal = None
+        if minute % 15 == 0:
+            m15_signal = live.check_signal_m15(m15_arrays.snapshot(m15_index[i]))
+        h1_trend = None
+        if minute % 5 == 0:
+            h1_trend = live.check_trend_h1(h1_arrays.snapshot(h1_index[i]))
+
+        signal = live.combine_signals(m1_signal, m15_signal, h1_trend)
+        if signal and signal != position['direction']:
+            close_position(i, 'reversal')
+            position = open_position(i, signal, 'reversal')
+
+    if position is not None and session_open and not session_done:
+        close_position(len(m1_arrays) - 1, 'end_of_data')
+
+    return trades
+
+
+def print_summary(trades, bars, elapsed):
+    print("=" * 70)
+    print(f"Replayed {bars} M1 bars in {elapsed:.2f}s ({bars / max(elapsed, 1e-9):,.0f} bars/s)")
+    if not trades:
+        print("No trades")
+        return
+    points = np.array([t['points'] for t in trades])
+    print(f"Trades:       {len(trades)}")
+    print(f"Win rate:     {(points > 0).mean() * 100:.1f}%")
+    print(f"Total points: {points.sum():,.2f}")
+    print(f"Avg points:   {points.mean():,.4f}")
+    reasons = pd.Series([t['exit_reason'] for t in trades]).value_counts()
+    for reason, count in reasons.items():
+        print(f"  {reason:<12} {count}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Replay strategy_xau_m1_m15 on historical bars')
+    parser.add_argument('--m1', help='M1 bars CSV')
+    parser.add_argument('--m15', help='M15 bars CSV (default: resampled from M1)')
+    parser.add_argument('--h1', help='H1 bars CSV (default: resampled from M1)')
+    parser.add_argument('--ticker-jid', type=int, help='Load bars from tms.bars instead of CSV')
+    parser.add_argument('--start', help='First bar time for --ticker-jid (YYYY-MM-DD)')
+    parser.add_argument('--end', help='End bar time for --ticker-jid (YYYY-MM-DD, exclusive)')
+    parser.add_argument('--close-time', default='21:45', help='Daily force close HH:MM UTC')
+    parser.add_argument('--session-start', default='00:00', help='Initial position HH:MM UTC')
+    parser.add_argument('--volume', type=float, default=live.OPEN_VOLUME)
+    parser.add_argument('--output', default='xau_replay_trades.csv', help='Trade log CSV')
+    args = parser.parse_args()
+
+    if args.ticker_jid:
+        start = datetime.fromisoformat(args.start) if args.start else datetime(1900, 1, 1)
+        end = datetime.fromisoformat(args.end) if args.end else datetime.now()
+        m1_bars = load_bars_db(live.CONNECTION_STRING, args.ticker_jid, live.TIMEFRAME_M1, start, end)
+        m15_bars = load_bars_db(live.CONNECTION_STRING, args.ticker_jid, live.TIMEFRAME_M15, start, end)
+        h1_bars = load_bars_db(live.CONNECTION_STRING, args.ticker_jid, live.TIMEFRAME_H1, start, end)
+    elif args.m1:
+        m1_bars = load_bars_csv(args.m1)
+        m15_bars = load_bars_csv(args.m15) if args.m15 else None
+        h1_bars = load_bars_csv(args.h1) if args.h1 else None
+    else:
+        parser.error('--m1 or --ticker-jid is required')
+
+    started = time.perf_counter()
+    trade_log = replay(m1_bars, m15_bars, h1_bars,
+                       close_time_utc=dt_time.fromisoformat(args.close_time),
+                       session_start_utc=dt_time.fromisoformat(args.session_start),
+                       open_volume=args.volume)
+    elapsed = time.perf_counter() - started
+
+    pd.DataFrame(trade_log).to_csv(args.output, index=False)
+    print_summary(trade_log, len(m1_bars), elapsed)
+    print(f"Trade log: {args.output}")
@@ -4,10 +4,12 @@ import numpy as np
 import os
 from datetime import datetime
 
+DATA_PATH = r"D:\TradingSystems\OLTP\historicalData"
 
-def load_data(symbol, asset_type='forex'):
+
+def load_data(symbol, asset_type='forex', data_path=DATA_PATH):
     """Загрузить данные для символа"""
-    path = f"D:\\TradingSystems\\OLTP\\historicalData\\{asset_type}\\{symbol}.csv"
+    path = os.path.join(data_path, asset_type, f"{symbol}.csv")
     df = pd.read_csv(path, parse_dates=['Date'])
     return df
 
@@ -137,19 +139,23 @@ def bollinger_bands_strategy(df, period=20, std_dev=2):
     return df['Strategy_Return'], pd.DataFrame()
 
 
+SYMBOLS = {
+    'forex': ['EURUSD', 'GBPUSD', 'USDJPY'],
+    'stocks': ['AAPL', 'SPY']
+}
+
+STRATEGIES = {
+    'MA_Crossover': moving_average_crossover,
+    'RSI': rsi_strategy,
+    'Bollinger_Bands': bollinger_bands_strategy
+}
+
+
 def test_all_strategies():
     """Протестировать все стратегии на всех активах"""
 
-    symbols = {
-        'forex': ['EURUSD', 'GBPUSD', 'USDJPY'],
-        'stocks': ['AAPL', 'SPY']
-    }
-
-    strategies = {
-        'MA_Crossover': moving_average_crossover,
-        'RSI': rsi_strategy,
-        'Bollinger_Bands': bollinger_bands_strategy
-    }
+    symbols = SYMBOLS
+    strategies = STRATEGIES
 
     results = {}
 
@@ -182,7 +188,7 @@ def test_all_strategies():
                     returns, trades = strategy_func(df.copy())
 
                     if len(returns) > 0:
-                        metrics = calculate_metrics(returns, trades)
+                        metrics = calculate_metrics(returns, trades if not trades.empty else None)
 
                         print(f"\n  {strategy_name}:")
                         print(f"    Доходность: {metrics['total_return'] * 100:6.2f}%")
@@ -0,0 +1,276 @@
+"""
+Tick Simulator - fills orders on a bid/ask tick stream instead of the bar close.
+
+Market orders arrive after a latency and fill on the first tick at or after
+the arrival time, on the opposite side of the spread (buy at the ask, sell at
+the bid). Stop loss and take profit rest at the broker: they trigger on the
+first tick whose exit side (bid for longs, ask for shorts) crosses the level
+and fill at that tick's price, so gaps fill through the level.
+
+Tick times are one sorted int64 array; order arrival ticks come from
+np.searchsorted, and stop/take-profit triggers are found by scanning the
+price arrays in growing vectorized chunks from the entry tick.
+
+Inputs are the tick CSVs of OLTP/historicalData (DateTime, Bid, Ask, Volume)
+or tickData_loader output (timestamp, bid, ask, volume). Trades are any list
+of dicts / DataFrame with entry_time, exit_time and optionally direction,
+stop_loss and take_profit. Times must be decision times, i.e. when the
+order could first be sent: the strategy_xau_replay trade log is stamped at
+bar close and can be used as is. Trades stamped at the bar open (the
+bitcoin_backtest trade list uses BarTime) need --bar-length set to their
+timeframe, otherwise they fill on ticks from before the bar closed.
+
+Usage:
+    python tick_simulator.py --ticks ../OLTP/historicalData/metals/XAGUSD_tick.csv --trades trades.csv
+    python tick_simulator.py --ticks ticks.csv --trades trades.csv --latency-ms 150 --stop 0.05 --take-profit 0.10
+    python tick_simulator.py --ticks ticks.csv --trades btc_trades.csv --bar-length 1min
+    python tick_simulator.py --ticks ticks.csv --benchmark
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+LONG, SHORT = 1, -1
+DIRECTIONS = {'buy': LONG, 'long': LONG, '1': LONG, 'sell': SHORT, 'short': SHORT, '-1': SHORT}
+
+# First trigger scan window in ticks; doubled until a trigger or the exit is found
+SCAN_CHUNK = 4096
+
+
+def _ns(values):
+    """Timestamps (datetime, str, Timestamp, datetime64) -> int64 nanoseconds"""
+    return pd.to_datetime(pd.Series(values)).to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+def direction_sign(value):
+    """'buy' / 'Buy' / 'LONG' / 1 -> 1, 'sell' / 'SHORT' / -1 -> -1; missing means long"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return LONG
+    if isinstance(value, (int, float, np.number)):
+        return LONG if value > 0 else SHORT
+    sign = DIRECTIONS.get(str(value).strip().lower())
+    if sign is None:
+        raise ValueError(f"Unknown direction: {value}")
+    return sign
+
+
+class TickStream:
+    """Sorted tick times (int64 ns) with bid and ask prices"""
+
+    def __init__(self, times, bid, ask):
+        order = np.argsort(times, kind='stable')
+        self.times = np.asarray(times, dtype=np.int64)[order]
+        self.bid = np.asarray(bid, dtype=float)[order]
+        self.ask = np.asarray(ask, dtype=float)[order]
+
+    def __len__(self):
+        return len(self.times)
+
+    @classmethod
+    def from_csv(cls, path):
+        """historicalData *_tick.csv or tickData_loader output"""
+        df = pd.read_csv(path)
+        columns = {col.lower(): col for col in df.columns}
+        stamp = columns.get('datetime') or columns.get('timestamp')
+        if stamp is None:
+            raise ValueError(f"{path}: no DateTime / timestamp column")
+        df = df.dropna(subset=[columns['bid'], columns['ask']])
+        return cls(_ns(df[stamp]), df[columns['bid']].to_numpy(), df[columns['ask']].to_numpy())
+
+    def arrival_index(self, order_ns):
+        """Index of the first tick at or after each arrival time; len(self) where there is none"""
+        return np.searchsorted(self.times, order_ns, side='left')
+
+    def time_at(self, i):
+        return pd.Timestamp(int(self.times[i]))
+
+
+class TickFillSimulator:
+    """Market order, stop loss and take profit fills on a TickStream"""
+
+    def __init__(self, ticks, latency_ms=0.0, stop_distance=None, take_profit_distance=None, bar_length=None):
+        """
+        Args:
+            ticks: TickStream
+            latency_ms: Delay between the order decision and its arrival at the broker
+            stop_distance: Default stop loss distance from the entry fill, in price units
+            take_profit_distance: Default take profit distance from the entry fill, in price units
+            bar_length: Timedelta or string ('1min', '1h') added to trade times stamped
+                at the bar open, so orders go out at the bar close; None for decision times
+        """
+        self.ticks = ticks
+        self.latency_ns = int(latency_ms * 1_000_000)
+        self.bar_length_ns = pd.Timedelta(bar_length).value if bar_length is not None else 0
+        self.stop_distance = stop_distance
+        self.take_profit_distance = take_profit_distance
+        self.ticks_scanned = 0
+
+    def fill_prices(self, index, sign, closing=False):
+        """Price of a market order at tick index: buys take the ask, sells hit the bid"""
+        buying = (sign == LONG) != closing
+        return np.where(buying, self.ticks.ask[index], self.ticks.bid[index])
+
+    def _first_trigger(self, start, end, sign, stop, take_profit):
+        """First tick in [start, end) crossing stop or take profit on the exit side, -1 if none"""
+        prices = self.ticks.bid if sign == LONG else self.ticks.ask
+        chunk = SCAN_CHUNK
+        while start < end:
+            stop_at = min(end, start + chunk)
+            window = prices[start:stop_at]
+            if sign == LONG:
+                hit = (window <= stop) | (window >= take_profit)
+            else:
+                hit = (window >= stop) | (window <= take_profit)
+            self.ticks_scanned += stop_at - start
+            if hit.any():
+                return start + int(hit.argmax())
+            start = stop_at
+            chunk *= 2
+        return -1
+
+    def simulate(self, trades):
+        """
+        Fill a list of trades on the tick stream.
+
+        Args:
+            trades: DataFrame or list of dicts with entry_time, exit_time (decision
+                times, or bar open times with bar_length set) and optionally
+                direction (or type), stop_loss, take_profit as price levels
+
+        Returns:
+            DataFrame of the input trades with entry/exit fill time, price,
+            exit_reason ('stop_loss', 'take_profit', 'exit_signal', 'end_of_data',
+            'no_ticks'), points and spread_cost
+        """
+        trades = pd.DataFrame(trades).reset_index(drop=True)
+        n_ticks = len(self.ticks)
+        if trades.empty:
+            return trades
+        if n_ticks == 0:
+            raise ValueError("Tick stream is empty")
+
+        direction_column = 'direction' if 'direction' in trades else 'type' if 'type' in trades else None
+        signs = np.array([direction_sign(v) for v in trades[direction_column]] if direction_column
+                         else [LONG] * len(trades))
+        delay = self.bar_length_ns + self.latency_ns
+        entry_idx = self.ticks.arrival_index(_ns(trades['entry_time']) + delay)
+        # An exit cannot fill before its entry
+        exit_idx = np.maximum(self.ticks.arrival_index(_ns(trades['exit_time']) + delay), entry_idx)
+
+        filled = entry_idx < n_ticks
+        safe_entry = np.minimum(entry_idx, n_ticks - 1)
+        entry_price = self.fill_prices(safe_entry, signs)
+
+        stops = self._levels(trades, 'stop_loss', entry_price, signs, -1, self.stop_distance)
+        targets = self._levels(trades, 'take_profit', entry_price, signs, 1, self.take_profit_distance)
+
+        out_idx = np.full(len(trades), -1, dtype=np.int64)
+        out_price = np.full(len(trades), np.nan)
+        reasons = []
+        for i in range(len(trades)):
+            if not filled[i]:
+                reasons.append('no_ticks')
+                continue
+            sign = int(signs[i])
+            end = min(int(exit_idx[i]), n_ticks)
+            trigger = -1
+            if not (np.isnan(stops[i]) and np.isnan(targets[i])):
+                # Protective orders are placed once the entry is filled
+                trigger = self._first_trigger(int(entry_idx[i]) + 1, end, sign,
+                                              np.nan_to_num(stops[i], nan=-sign * np.inf),
+                                              np.nan_to_num(targets[i], nan=sign * np.inf))
+            if trigger >= 0:
+                price = self.ticks.bid[trigger] if sign == LONG else self.ticks.ask[trigger]
+                hit_stop = price <= stops[i] if sign == LONG else price >= stops[i]
+                reasons.append('stop_loss' if hit_stop else 'take_profit')
+                out_idx[i], out_price[i] = trigger, price
+            elif exit_idx[i] < n_ticks:
+                reasons.append('exit_signal')
+                out_idx[i] = exit_idx[i]
+                out_price[i] = self.fill_prices(exit_idx[i], sign, closing=True)
+            else:
+                reasons.append('end_of_data')
+                out_idx[i] = n_ticks - 1
+                out_price[i] = self.fill_prices(n_ticks - 1, sign, closing=True)
+
+        safe_exit = np.maximum(out_idx, 0)
+        spread = self.ticks.ask - self.ticks.bid
+        result = trades.copy()
+        result['entry_fill_time'] = [self.ticks.time_at(j) if ok else pd.NaT for j, ok in zip(entry_idx, filled)]
+        result['entry_fill_price'] = np.where(filled, entry_price, np.nan)
+        result['exit_fill_time'] = [self.ticks.time_at(j) if j >= 0 else pd.NaT for j in out_idx]
+        result['exit_fill_price'] = out_price
+        result['exit_reason'] = reasons
+        result['stop_level'] = stops
+        result['take_profit_level'] = targets
+        result['points'] = signs * (out_price - result['entry_fill_price'].to_numpy())
+        result['spread_cost'] = np.where(filled, (spread[safe_entry] + spread[safe_exit]) / 2, np.nan)
+        return result
+
+    @staticmethod
+    def _levels(trades, column, entry_price, signs, side, default_distance):
+        """Per-trade price levels: the trade's own column, else entry +/- the default distance"""
+        levels = np.full(len(trades), np.nan)
+        if default_distance is not None:
+            levels = entry_price + side * signs * default_distance
+        if column in trades:
+            own = pd.to_numeric(trades[column], errors='coerce').to_numpy(dtype=float)
+            levels = np.where(np.isnan(own), levels, own)
+        return levels
+
+
+def benchmark(ticks, trades=1000, seed=0):
+    """Random trades over the whole stream with wide stops; returns ticks scanned per second"""
+    rng = np.random.default_rng(seed)
+    starts = np.sort(rng.integers(0, max(1, len(ticks) - 1), trades))
+    ends = np.minimum(starts + rng.integers(1, max(2, len(ticks) // 10), trades), len(ticks) - 1)
+    mid = (ticks.bid + ticks.ask) / 2
+    width = float(np.nanstd(mid)) * 10 or 1.0
+    simulator = TickFillSimulator(ticks, stop_distance=width, take_profit_distance=width)
+    started = time.perf_counter()
+    simulator.simulate({
+        'entry_time': pd.to_datetime(ticks.times[starts]),
+        'exit_time': pd.to_datetime(ticks.times[ends]),
+        'direction': np.where(rng.random(trades) < 0.5, 'buy', 'sell'),
+    })
+    elapsed = time.perf_counter() - started
+    return simulator.ticks_scanned, elapsed
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Fill backtest trades on bid/ask ticks')
+    parser.add_argument('--ticks', required=True, help='Tick CSV with bid/ask')
+    parser.add_argument('--trades', help='Trade CSV with entry_time, exit_time[, direction, stop_loss, take_profit]')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--bar-length', help="Timeframe of trades stamped at the bar open, e.g. 1min or 1h "
+                                             "(default: trade times are decision times)")
+    parser.add_argument('--stop', type=float, help='Stop loss distance from the entry fill (price units)')
+    parser.add_argument('--take-profit', type=float, help='Take profit distance from the entry fill (price units)')
+    parser.add_argument('--output', default='tick_fills.csv')
+    parser.add_argument('--benchmark', action='store_true', help='Measure trigger scan speed on random trades')
+    args = parser.parse_args()
+
+    loaded = time.perf_counter()
+    stream = TickStream.from_csv(args.ticks)
+    print(f"Loaded {len(stream):,} ticks in {time.perf_counter() - loaded:.2f}s")
+
+    if args.benchmark:
+        scanned, seconds = benchmark(stream)
+        print(f"Scanned {scanned:,} ticks in {seconds:.3f}s ({scanned / max(seconds, 1e-9):,.0f} ticks/s)")
+    elif args.trades:
+        sim = TickFillSimulator(stream, latency_ms=args.latency_ms, stop_distance=args.stop,
+                                take_profit_distance=args.take_profit, bar_length=args.bar_length)
+        started = time.perf_counter()
+        fills = sim.simulate(pd.read_csv(args.trades))
+        seconds = time.perf_counter() - started
+        fills.to_csv(args.output, index=False)
+        print(f"{len(fills)} trades filled in {seconds:.3f}s, {sim.ticks_scanned:,} ticks scanned")
+        if not fills.empty:
+            print(fills['exit_reason'].value_counts().to_string())
+            print(f"Total points: {fills['points'].sum():,.4f}, spread cost: {fills['spread_cost'].sum():,.4f}")
+        print(f"Fills: {args.output}")
+    else:
+        parser.error('--trades or --benchmark is required')
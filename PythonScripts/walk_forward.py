@@ -0,0 +1,240 @@
+"""
+Walk-forward optimization - out-of-sample validation of the testing_strategies strategies.
+
+Each series is split into rolling windows: parameters are chosen on a train
+window by Sharpe ratio and then traded on the following test window. The
+test windows are stitched into one out-of-sample equity curve per
+(series, strategy), and the per-window choices show how stable the
+parameters are.
+
+The strategies are causal (signals are shifted one bar), so every grid
+combination is computed once over the full series and windows only slice the
+result. Window statistics come from prefix sums over the (combination x bar)
+return matrix, which scores all overlapping train windows in one pass.
+(series, strategy) pairs run in parallel on a process pool.
+
+Outputs in --output-dir:
+    walk_forward_windows.csv   one row per window: chosen parameters, train/test Sharpe
+    walk_forward_equity.csv    stitched out-of-sample returns and equity
+    walk_forward_summary.json  out-of-sample metrics and parameter stability
+
+Usage:
+    python walk_forward.py
+    python walk_forward.py --train 240 --test 40 --series metals/XAUUSD_1h forex/EURUSD
+"""
+
+import os
+import json
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from testing_strategies import STRATEGIES, calculate_metrics
+from parameter_sweep import DEFAULT_GRIDS, HISTORICAL_DATA_PATH, expand_grid
+
+TRAIN_BARS = 120
+TEST_BARS = 20
+ANNUALIZATION = np.sqrt(252)     # Same scaling as calculate_metrics
+
+
+def discover_series(data_path=HISTORICAL_DATA_PATH):
+    """Relative names ('metals/XAUUSD_1h') of all bar CSVs under historicalData; tick files are skipped"""
+    names = []
+    for root, _, files in os.walk(data_path):
+        for file_name in sorted(files):
+            if not file_name.endswith('.csv') or file_name.endswith('_tick.csv'):
+                continue
+            rel = os.path.relpath(os.path.join(root, file_name), data_path)
+            names.append(rel[:-len('.csv')].replace(os.sep, '/'))
+    return sorted(names)
+
+
+def load_series(name, data_path=HISTORICAL_DATA_PATH):
+    """Bars of a series with the Date/Close columns the strategies expect"""
+    df = pd.read_csv(os.path.join(data_path, *name.split('/')) + '.csv')
+    if 'DateTime' in df.columns:
+        df = df.rename(columns={'DateTime': 'Date'})
+    df['Date'] = pd.to_datetime(df['Date'])
+    return df.sort_values('Date').reset_index(drop=True)
+
+
+def return_matrix(df, strategy, grid):
+    """(combinations x bars) strategy returns over the full series, NaN during warm-up"""
+    combos = list(expand_grid(strategy, grid))
+    matrix = np.full((len(combos), len(df)), np.nan)
+    for i, params in enumerate(combos):
+        returns, _ = STRATEGIES[strategy](df, **params)
+        matrix[i, returns.index.to_numpy()] = returns.to_numpy(dtype=float)
+    return combos, matrix
+
+
+def window_sharpe(prefix, starts, ends, min_count):
+    """
+    Sharpe of every combination over every [start, end) window.
+
+    prefix holds cumulative count, sum and sum of squares with a leading zero
+    column; windows with fewer than min_count returns score -inf.
+    """
+    count = prefix[0][:, ends] - prefix[0][:, starts]
+    total = prefix[1][:, ends] - prefix[1][:, starts]
+    squares = prefix[2][:, ends] - prefix[2][:, starts]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        var = (squares - count * mean ** 2) / (count - 1)
+        std = np.sqrt(np.maximum(var, 0))
+        sharpe = np.where(std > 1e-12, mean / std * ANNUALIZATION, 0.0)
+    return np.where(count >= min_count, sharpe, -np.inf)
+
+
+def walk_forward(df, strategy, grid, train_bars=TRAIN_BARS, test_bars=TEST_BARS):
+    """
+    Walk-forward one strategy over one series.
+
+    Returns (windows, oos_returns): a list of per-window dicts and a Series of
+    stitched out-of-sample returns indexed by Date.
+    """
+    combos, matrix = return_matrix(df, strategy, grid)
+    n = matrix.shape[1]
+    starts = np.arange(0, n - train_bars - test_bars + 1, test_bars)
+    if not combos or len(starts) == 0:
+        return [], pd.Series(dtype=float)
+
+    valid = ~np.isnan(matrix)
+    values = np.where(valid, matrix, 0.0)
+    zero = np.zeros((len(combos), 1))
+    prefix = (np.hstack([zero, np.cumsum(valid, axis=1)]),
+              np.hstack([zero, np.cumsum(values, axis=1)]),
+              np.hstack([zero, np.cumsum(values ** 2, axis=1)]))
+
+    train_ends = starts + train_bars
+    test_ends = train_ends + test_bars
+    train_scores = window_sharpe(prefix, starts, train_ends, min_count=train_bars // 2)
+    test_scores = window_sharpe(prefix, train_ends, test_ends, min_count=2)
+    best = np.argmax(train_scores, axis=0)
+
+    dates = df['Date']
+    windows, oos = [], []
+    for w, (start, train_end, test_end) in enumerate(zip(starts, train_ends, test_ends)):
+        b = best[w]
+        if not np.isfinite(train_scores[b, w]):
+            continue  # Every combination still warming up
+        test_returns = values[b, train_end:test_end]
+        oos.append(pd.Series(test_returns, index=dates.iloc[train_end:test_end].to_numpy()))
+        windows.append({
+            'window': w,
+            'train_start': dates.iloc[start],
+            'test_start': dates.iloc[train_end],
+            'test_end': dates.iloc[test_end - 1],
+            'params': combos[b],
+            'train_sharpe': float(train_scores[b, w]),
+            'test_sharpe': float(test_scores[b, w]) if np.isfinite(test_scores[b, w]) else 0.0,
+            'test_return': float(np.prod(1 + test_returns) - 1),
+        })
+    return windows, (pd.concat(oos) if oos else pd.Series(dtype=float))
+
+
+def parameter_stability(windows):
+    """How often the chosen parameters change between windows and how much each one varies"""
+    if not windows:
+        return {}
+    keys = [tuple(sorted(w['params'].items())) for w in windows]
+    changes = sum(1 for a, b in zip(keys, keys[1:]) if a != b)
+    modal = max(set(keys), key=keys.count)
+    stability = {
+        'windows': len(windows),
+        'change_rate': changes / (len(keys) - 1) if len(keys) > 1 else 0.0,
+        'modal_params': dict(modal),
+        'modal_share': keys.count(modal) / len(keys),
+        'params': {},
+    }
+    for name in windows[0]['params']:
+        values = np.array([w['params'][name] for w in windows], dtype=float)
+        mean = values.mean()
+        stability['params'][name] = {
+            'mean': float(mean),
+            'std': float(values.std()),
+            'cv': float(values.std() / mean) if mean else 0.0,
+        }
+    return stability
+
+
+def _run_task(task):
+    """Worker: walk-forward one (series, strategy) pair"""
+    name, strategy, grid, train_bars, test_bars, data_path = task
+    started = time.perf_counter()
+    try:
+        df = load_series(name, data_path)
+        windows, oos = walk_forward(df, strategy, grid, train_bars, test_bars)
+    except Exception as e:
+        print(f"[WF] {name} {strategy}: {e}")
+        return name, strategy, [], pd.Series(dtype=float), 0.0
+    return name, strategy, windows, oos, time.perf_counter() - started
+
+
+def run_walk_forward(output_dir, series=None, strategies=None, grids=None, train_bars=TRAIN_BARS,
+                     test_bars=TEST_BARS, processes=None, data_path=HISTORICAL_DATA_PATH):
+    """Walk-forward every (series, strategy) pair and write windows, equity and summary files"""
+    series = series or discover_series(data_path)
+    strategies = strategies or list(STRATEGIES)
+    grids = grids or DEFAULT_GRIDS
+    tasks = [(name, strategy, grids.get(strategy, {}), train_bars, test_bars, data_path)
+             for name in series for strategy in strategies]
+
+    started = time.perf_counter()
+    window_rows, equity_frames, summary = [], [], {}
+    with Pool(processes=processes) as pool:
+        for name, strategy, windows, oos, elapsed in pool.imap_unordered(_run_task, tasks):
+            key = f"{name}_{strategy}"
+            print(f"[WF] {key}: {len(windows)} windows in {elapsed:.1f}s")
+            if not windows:
+                continue
+            for w in windows:
+                row = {'series': name, 'strategy': strategy, **{k: v for k, v in w.items() if k != 'params'}}
+                row.update(w['params'])
+                window_rows.append(row)
+            equity_frames.append(pd.DataFrame({
+                'series': name, 'strategy': strategy, 'Date': oos.index,
+                'return': oos.to_numpy(), 'equity': np.cumprod(1 + oos.to_numpy()),
+            }))
+            metrics = calculate_metrics(oos)
+            summary[key] = {
+                'series': name,
+                'strategy': strategy,
+                'oos_metrics': {k: float(v) for k, v in metrics.items()},
+                'stability': parameter_stability(windows),
+            }
+
+    os.makedirs(output_dir, exist_ok=True)
+    pd.DataFrame(window_rows).to_csv(os.path.join(output_dir, 'walk_forward_windows.csv'), index=False)
+    if equity_frames:
+        pd.concat(equity_frames).to_csv(os.path.join(output_dir, 'walk_forward_equity.csv'), index=False)
+    with open(os.path.join(output_dir, 'walk_forward_summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2, default=str)
+
+    print(f"[WF] {len(tasks)} series/strategy pairs in {time.perf_counter() - started:.1f}s -> {output_dir}")
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Walk-forward optimization over historicalData')
+    parser.add_argument('--output-dir', default='walk_forward')
+    parser.add_argument('--series', nargs='+', help="Series like metals/XAUUSD_1h (default: all bar CSVs)")
+    parser.add_argument('--strategies', nargs='+', choices=list(STRATEGIES))
+    parser.add_argument('--grid', help='JSON file {strategy: {param: [values]}} replacing the default grids')
+    parser.add_argument('--train', type=int, default=TRAIN_BARS, help='Bars per train window')
+    parser.add_argument('--test', type=int, default=TEST_BARS, help='Bars per test window (also the step)')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--data-path', default=HISTORICAL_DATA_PATH)
+    args = parser.parse_args()
+
+    grids = None
+    if args.grid:
+        with open(args.grid) as f:
+            grids = json.load(f)
+
+    run_walk_forward(args.output_dir, series=args.series, strategies=args.strategies, grids=grids,
+                     train_bars=args.train, test_bars=args.test, processes=args.processes,
+                     data_path=args.data_path)